@@ -0,0 +1,165 @@
+import math
+import threading
+from typing import Any, Dict, Iterable, Optional
+
+from .stores import StoreListener
+
+BILL_CATEGORIES = ('electricity_bill', 'water_bill', 'internet_bill', 'phone_bill')
+
+
+class DDSketch:
+    """
+    Quantile sketch with relative-error guarantees (DDSketch, Masson et al.).
+
+    Values are counted in logarithmically sized buckets, so any quantile is
+    reported within `relative_accuracy` of the true value using a number of
+    buckets that depends on the value range, not on how many values were
+    added. Bucket counts are plain integers, which makes sketches mergeable
+    and lets a value be removed again by decrementing its bucket.
+    """
+
+    # Magnitudes below this are counted as zero
+    MIN_INDEXABLE = 1e-9
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError('relative_accuracy must be between 0 and 1')
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self._positive: Dict[int, int] = {}
+        self._negative: Dict[int, int] = {}
+        self._zero = 0
+        self.count = 0
+
+    def _bucket(self, magnitude: float) -> int:
+        return math.ceil(math.log(magnitude) / self._log_gamma)
+
+    def _value(self, bucket: int) -> float:
+        # Midpoint (in relative terms) of (gamma^(bucket-1), gamma^bucket]
+        return 2 * self._gamma ** bucket / (self._gamma + 1)
+
+    @staticmethod
+    def _bump(buckets: Dict[int, int], bucket: int, weight: int) -> None:
+        count = buckets.get(bucket, 0) + weight
+        if count:
+            buckets[bucket] = count
+        else:
+            del buckets[bucket]
+
+    def add(self, value: float, weight: int = 1) -> None:
+        if value > self.MIN_INDEXABLE:
+            self._bump(self._positive, self._bucket(value), weight)
+        elif value < -self.MIN_INDEXABLE:
+            self._bump(self._negative, self._bucket(-value), weight)
+        else:
+            self._zero += weight
+        self.count += weight
+
+    def remove(self, value: float) -> None:
+        self.add(value, -1)
+
+    def merge(self, other: 'DDSketch') -> None:
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError('Only sketches with the same relative accuracy can be merged')
+        for bucket, count in other._positive.items():
+            self._bump(self._positive, bucket, count)
+        for bucket, count in other._negative.items():
+            self._bump(self._negative, bucket, count)
+        self._zero += other._zero
+        self.count += other.count
+
+    def quantile(self, q: float) -> Optional[float]:
+        if self.count <= 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = 0
+        # Most negative values have the largest negative buckets
+        for bucket in sorted(self._negative, reverse=True):
+            seen += self._negative[bucket]
+            if seen > rank:
+                return -self._value(bucket)
+        seen += self._zero
+        if seen > rank:
+            return 0.0
+        for bucket in sorted(self._positive):
+            seen += self._positive[bucket]
+            if seen > rank:
+                return self._value(bucket)
+        return self._value(max(self._positive)) if self._positive else 0.0
+
+
+def _cents(amount: Any) -> int:
+    # Amounts are stored as two-decimal strings; integer cents keep totals exact under add/subtract
+    return int(round(float(amount) * 100))
+
+
+class BillAggregates(StoreListener):
+    """
+    Running per-category totals and quantile sketches over every stored
+    bill. Subscribed to the bills store, it adds new bills, swaps the old
+    amounts for the new ones when a user's bill is replaced and subtracts
+    removed bills, so stats() never scans the bills.
+    """
+
+    QUANTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+
+    def __init__(self, relative_accuracy: float = 0.01, categories: Iterable[str] = BILL_CATEGORIES):
+        self.relative_accuracy = relative_accuracy
+        self.categories = tuple(categories)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self.users = 0
+        self._totals = {category: 0 for category in self.categories}
+        self._sketches = {category: DDSketch(self.relative_accuracy) for category in self.categories}
+        self._version = 0
+        self._cached: Optional[Dict[str, Any]] = None
+
+    def _apply(self, bill: dict, sign: int) -> None:
+        self.users += sign
+        for category in self.categories:
+            cents = _cents(bill.get(category, 0))
+            self._totals[category] += sign * cents
+            self._sketches[category].add(cents / 100, sign)
+        self._version += 1
+
+    def on_set(self, key, value):
+        with self._lock:
+            self._apply(value, 1)
+
+    def on_replace(self, key, old, new):
+        with self._lock:
+            self._apply(old, -1)
+            self._apply(new, 1)
+
+    def on_delete(self, key, value):
+        with self._lock:
+            self._apply(value, -1)
+
+    def on_clear(self):
+        with self._lock:
+            self._reset()
+
+    def stats(self) -> Dict[str, Any]:
+        """Totals, means and quantiles per category; cost depends on sketch size only"""
+        with self._lock:
+            if self._cached is not None and self._cached['version'] == self._version:
+                return self._cached['stats']
+            categories = {}
+            for category in self.categories:
+                total = self._totals[category] / 100
+                sketch = self._sketches[category]
+                summary = {
+                    'count': self.users,
+                    'total': round(total, 2),
+                    'mean': round(total / self.users, 2) if self.users else None,
+                }
+                for name, q in self.QUANTILES:
+                    value = sketch.quantile(q)
+                    summary[name] = round(value, 2) if value is not None else None
+                categories[category] = summary
+            stats = {'users': self.users, 'relative_accuracy': self.relative_accuracy, 'categories': categories}
+            self._cached = {'version': self._version, 'stats': stats}
+            return stats
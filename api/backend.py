@@ -0,0 +1,71 @@
+from typing import Any, Callable, Dict, Iterable, List
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from .metrics import registry
+from .repositories import InMemoryRepository, Repository, build_repository
+
+# Storage backend, see settings.REPOSITORY
+repository = build_repository(getattr(settings, 'REPOSITORY', {}))
+
+# In-memory repositories (empty unless the in-memory backend is configured)
+_memory = repository if isinstance(repository, InMemoryRepository) else InMemoryRepository()
+bills_repository: Dict[str, dict] = _memory.bills
+intents_repository: Dict[int, dict] = _memory.intents
+grouped_intents_repository: Dict[str, dict] = _memory.grouped_intents
+interaction_events_repository: Dict[int, List[dict]] = _memory.interaction_events
+# Normalized intent text -> id of the grouped intent it was assigned to
+intent_assignments_repository: Dict[str, str] = _memory.assignments
+
+# Prometheus metrics of the repository and its retention, served at /api/metrics/
+registry.gauge(
+    'luma_repository_items', 'Items stored in the repository, by collection',
+    lambda: {(collection,): size for collection, size in repository.sizes().items()}, ['collection'],
+)
+
+def _retention_figures(field: str, collections: Iterable[str] = ('intents', 'interaction_events')) -> Dict[tuple, Any]:
+    stats = repository.retention_stats()
+    return {(collection,): stats[collection][field] for collection in collections if collection in stats}
+
+def _retention_evictions() -> Dict[tuple, int]:
+    stats = repository.retention_stats()
+    counts = {('intents', reason): count for reason, count in stats.get('intents', {}).get('evictions', {}).items()}
+    if 'interaction_events' in stats:
+        # Event chunks are evicted by a clock sweep, an approximation of LRU
+        counts['interaction_events', 'lru'] = stats['interaction_events']['evictions']
+    return counts
+
+def _spill_figure(field: str) -> int:
+    return repository.retention_stats().get('spill', {}).get(field, 0)
+
+registry.gauge(
+    'luma_retention_resident_bytes', 'Estimated bytes of bounded collections held in memory, by collection',
+    lambda: _retention_figures('resident_bytes'), ['collection'],
+)
+registry.gauge(
+    'luma_retention_spilled', 'Intents, and interaction event chunks, currently spilled to disk, by collection',
+    lambda: {**_retention_figures('spilled', ['intents']), **_retention_figures('spilled_chunks', ['interaction_events'])},
+    ['collection'],
+)
+registry.counter_func(
+    'luma_retention_evictions_total', 'Entries spilled to disk, by collection and reason', _retention_evictions,
+    ['collection', 'reason'],
+)
+registry.counter_func(
+    'luma_retention_reloads_total', 'Spilled entries read back into memory, by collection',
+    lambda: _retention_figures('reloads'), ['collection'],
+)
+registry.counter_func(
+    'luma_spill_io_bytes_total', 'Bytes written to and read from the spill segments, by direction',
+    lambda: {(direction,): _spill_figure(f"bytes_{direction}") for direction in ('written', 'read')}, ['direction'],
+)
+registry.gauge('luma_spill_disk_bytes', 'Size of the spill segment files', lambda: _spill_figure('disk_bytes'))
+
+def never_blocks(repository: Repository) -> bool:
+    # Persistent writes wait for fsync and bounded stores read spilled entries from disk
+    return type(repository) is InMemoryRepository and repository.spill is None
+
+async def call_repository(func: Callable, *args) -> Any:
+    """Run func inline for the plain in-memory backend, otherwise in a thread since other backends block on I/O"""
+    if never_blocks(repository):
+        return func(*args)
+    return await sync_to_async(func)(*args)
@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Collects items submitted from many threads and hands them to
+    `process_batch` together, once `max_batch_size` items are pending or
+    the oldest pending item has waited `window` seconds. `process_batch`
+    must return one result per item, in order; each submitter receives
+    its own result through a Future.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], window: float = 0.02,
+                 max_batch_size: int = 32, name: str = 'batcher'):
+        self.process_batch = process_batch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.name = name
+        self._pending: List[Tuple[Any, Future, float]] = []
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        # Statistics used to tune the window and batch size
+        self.batches = 0
+        self.items = 0
+        self.max_observed_batch = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def _ensure_started(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=f"{self.name}-dispatcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        future: Future = Future()
+        with self._condition:
+            self._ensure_started()
+            self._pending.append((item, future, time.monotonic()))
+            self._condition.notify()
+        return future
+
+    def _next_batch(self) -> List[Tuple[Any, Future, float]]:
+        with self._condition:
+            while not self._pending:
+                self._condition.wait()
+            deadline = self._pending[0][2] + self.window
+            while len(self._pending) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            now = time.monotonic()
+            waits = [now - submitted_at for _, _, submitted_at in batch]
+            with self._condition:
+                self.batches += 1
+                self.items += len(batch)
+                self.max_observed_batch = max(self.max_observed_batch, len(batch))
+                self.total_wait += sum(waits)
+                self.max_wait = max(self.max_wait, max(waits))
+            try:
+                results = self.process_batch([item for item, _, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+            except Exception as e:
+                logger.error("Batch of %d failed in %s: %s", len(batch), self.name, e)
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), result in zip(batch, results):
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        with self._condition:
+            return {
+                'batches': self.batches,
+                'items': self.items,
+                'pending': len(self._pending),
+                'mean_batch_size': self.items / self.batches if self.batches else 0.0,
+                'max_batch_size': self.max_observed_batch,
+                'mean_wait_seconds': self.total_wait / self.items if self.items else 0.0,
+                'max_wait_seconds': self.max_wait,
+            }
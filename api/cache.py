@@ -0,0 +1,214 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+MISSING = object()
+
+
+class LRUTTLCache:
+    """
+    Thread-safe, per-process cache bounded both by entry count (least
+    recently used entries are evicted first) and by age.
+    """
+
+    def __init__(self, max_entries: int = 4096, ttl: float = 3600, clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._clock = clock
+        self._entries: 'OrderedDict[str, Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Any:
+        """Return the cached value or MISSING"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return MISSING
+            expires_at, value = entry
+            if expires_at <= self._clock():
+                del self._entries[key]
+                self.evictions += 1
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (self._clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'backend': 'memory',
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class SQLiteCache:
+    """
+    LRU+TTL cache stored in a local SQLite file so every worker process on
+    the host shares the same entries. Values must be JSON serializable.
+    Hit/miss/eviction counters are kept per process.
+
+    Hits do not write: their access times are buffered and written in one
+    batch every `touch_batch` hits, and before entries are evicted. The
+    entry count is kept running and re-read from the table only every
+    `recount_every` sets (other processes write too) or when it says the
+    cache is over max_entries.
+    """
+
+    def __init__(self, path: str, max_entries: int = 4096, ttl: float = 3600, touch_batch: int = 64,
+                 recount_every: int = 256):
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.touch_batch = touch_batch
+        self.recount_every = recount_every
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # Access times of hits not written yet, and the running entry count
+        self._touched: Dict[str, float] = {}
+        self._entries: Optional[int] = None
+        self._sets_since_count = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS llm_cache ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, '
+                'expires_at REAL NOT NULL, accessed_at REAL NOT NULL)'
+            )
+            connection.execute('CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed_at)')
+            self._local.connection = connection
+        return connection
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def __len__(self) -> int:
+        return self._connection().execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0]
+
+    def get(self, key: str) -> Any:
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute('SELECT value, expires_at FROM llm_cache WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            self._count('misses')
+            return MISSING
+        value, expires_at = row
+        if expires_at <= now:
+            connection.execute('DELETE FROM llm_cache WHERE key = ?', (key,))
+            self._count('evictions')
+            self._count('misses')
+            return MISSING
+        with self._lock:
+            self.hits += 1
+            self._touched[key] = now
+            flush = len(self._touched) >= self.touch_batch
+        if flush:
+            self._flush_touched(connection)
+        return json.loads(value)
+
+    def _flush_touched(self, connection: sqlite3.Connection) -> None:
+        with self._lock:
+            touched, self._touched = self._touched, {}
+        if touched:
+            connection.executemany(
+                'UPDATE llm_cache SET accessed_at = ? WHERE key = ?', [(at, key) for key, at in touched.items()]
+            )
+
+    def set(self, key: str, value: Any) -> None:
+        connection = self._connection()
+        now = time.time()
+        payload = json.dumps(value)
+        added = connection.execute(
+            'INSERT OR IGNORE INTO llm_cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)',
+            (key, payload, now + self.ttl, now)
+        ).rowcount
+        if not added:
+            connection.execute(
+                'UPDATE llm_cache SET value = ?, expires_at = ?, accessed_at = ? WHERE key = ?',
+                (payload, now + self.ttl, now, key)
+            )
+        with self._lock:
+            self._sets_since_count += 1
+            recount = self._entries is None or self._sets_since_count >= self.recount_every
+            if not recount:
+                self._entries += added
+                recount = self._entries > self.max_entries
+        if not recount:
+            return
+        entries = len(self)
+        overflow = entries - self.max_entries
+        if overflow > 0:
+            self._flush_touched(connection)
+            cursor = connection.execute(
+                'DELETE FROM llm_cache WHERE key IN '
+                '(SELECT key FROM llm_cache ORDER BY accessed_at LIMIT ?)',
+                (overflow,)
+            )
+            self._count('evictions', cursor.rowcount)
+            entries -= cursor.rowcount
+        with self._lock:
+            self._entries = entries
+            self._sets_since_count = 0
+
+    def clear(self) -> None:
+        self._connection().execute('DELETE FROM llm_cache')
+        with self._lock:
+            self._touched.clear()
+            self._entries = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'backend': 'sqlite',
+            'entries': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+def build_cache(config: Dict[str, Any]):
+    """Create a cache from a settings dict such as settings.LLM_CACHE"""
+    backend = config.get('BACKEND', 'memory')
+    max_entries = config.get('MAX_ENTRIES', 4096)
+    ttl = config.get('TTL', 3600)
+    if backend == 'memory':
+        return LRUTTLCache(max_entries=max_entries, ttl=ttl)
+    if backend == 'sqlite':
+        return SQLiteCache(config['PATH'], max_entries=max_entries, ttl=ttl)
+    raise ValueError(f"Unknown cache backend: {backend}")
@@ -0,0 +1,169 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Embeddings of the texts being clustered, set in pool workers by _init_worker
+_vectors: Optional[np.ndarray] = None
+
+
+class UnionFind:
+    """Disjoint sets over 0..size-1 with path halving and union by size"""
+
+    def __init__(self, size: int):
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, item: int) -> int:
+        parent = self.parent
+        while parent[item] != item:
+            parent[item] = parent[parent[item]]
+            item = parent[item]
+        return item
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the sets of a and b; False when they already were one"""
+        a, b = self.find(a), self.find(b)
+        if a == b:
+            return False
+        if self.size[a] < self.size[b]:
+            a, b = b, a
+        self.parent[b] = a
+        self.size[a] += self.size[b]
+        return True
+
+
+def _embed_chunk(embedder: Any, texts: Sequence[str]) -> np.ndarray:
+    return np.stack([embedder.embed(text) for text in texts]) if texts else np.zeros((0, embedder.dim), np.float32)
+
+
+def _init_worker(vectors: np.ndarray) -> None:
+    global _vectors
+    _vectors = vectors
+
+
+def _block_pairs(blocks: Sequence[np.ndarray], threshold: float, vectors: Optional[np.ndarray] = None
+                 ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+    """
+    (left, right, similarity, compared): index pairs (left < right) within
+    each block whose cosine similarity reaches threshold, and the number
+    of pairs compared
+    """
+    vectors = _vectors if vectors is None else vectors
+    lefts, rights, similarities, compared = [], [], [], 0
+    for block in blocks:
+        block = np.sort(block)
+        scores = vectors[block] @ vectors[block].T
+        left, right = np.nonzero(np.triu(scores >= threshold, 1))
+        lefts.append(block[left])
+        rights.append(block[right])
+        similarities.append(scores[left, right])
+        compared += len(block) * (len(block) - 1) // 2
+    if not lefts:
+        return np.zeros(0, np.int64), np.zeros(0, np.int64), np.zeros(0, np.float32), 0
+    return np.concatenate(lefts), np.concatenate(rights), np.concatenate(similarities), compared
+
+
+def _chunks(items: Sequence[Any], size: int) -> Iterator[Sequence[Any]]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class TextClusterer:
+    """
+    Finds pairs of similar texts (or other embedded items) without
+    comparing every one to every other one, using a process pool for the
+    CPU-bound steps.
+
+    Texts are embedded (in chunks, in parallel) and blocked with random
+    hyperplane LSH: each of `bands` bands hashes the signs of `rows`
+    projections, and only texts sharing a band hash are compared. With the
+    defaults a pair at cosine 0.75 shares at least one band about 90% of
+    the time, a pair at 0.9 almost always, while unrelated texts rarely
+    meet. Blocks are compared exactly (one matrix product each) in
+    parallel, and blocks larger than max_block are cut into slices so one
+    degenerate bucket cannot go quadratic.
+    """
+
+    def __init__(self, embedder: Any, threshold: float = 0.75, workers: Optional[int] = None,
+                 bands: int = 30, rows: int = 10, max_block: int = 2000, seed: int = 0):
+        self.embedder = embedder
+        self.threshold = threshold
+        self.workers = workers or os.cpu_count() or 1
+        self.bands = bands
+        self.rows = rows
+        self.max_block = max_block
+        self.seed = seed
+        self.compared = 0
+
+    def _map(self, function, tasks: List[tuple], initargs: tuple = ()) -> list:
+        if self.workers == 1 or len(tasks) < 2:
+            if initargs:
+                return [function(*task, *initargs) for task in tasks]
+            return [function(*task) for task in tasks]
+        # Workers are forked, so the vectors passed to the initializer are inherited rather than pickled
+        initializer = _init_worker if initargs else None
+        with ProcessPoolExecutor(self.workers, initializer=initializer, initargs=initargs) as pool:
+            futures = [pool.submit(function, *task) for task in tasks]
+            return [future.result() for future in futures]
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        size = max(1, min(5000, -(-len(texts) // (self.workers * 4))))
+        results = self._map(_embed_chunk, [(self.embedder, chunk) for chunk in _chunks(texts, size)])
+        return np.concatenate(results) if results else np.zeros((0, self.embedder.dim), np.float32)
+
+    def blocks(self, vectors: np.ndarray) -> List[np.ndarray]:
+        """Groups of row indexes that share a band hash"""
+        rng = np.random.default_rng(self.seed)
+        planes = rng.standard_normal((vectors.shape[1], self.bands * self.rows)).astype(np.float32)
+        bits = (vectors @ planes) > 0
+        weights = 1 << np.arange(self.rows, dtype=np.int64)
+        blocks = []
+        for band in range(self.bands):
+            keys = bits[:, band * self.rows:(band + 1) * self.rows] @ weights
+            order = np.argsort(keys, kind='stable')
+            boundaries = np.flatnonzero(np.diff(keys[order])) + 1
+            for members in np.split(order, boundaries):
+                for block in _chunks(members, self.max_block):
+                    if len(block) > 1:
+                        blocks.append(block)
+        return blocks
+
+    def similar_pairs(self, vectors: np.ndarray) -> Iterator[Tuple[int, int, float]]:
+        """(i, j, similarity) for rows i < j whose cosine similarity reaches the threshold, possibly repeated"""
+        blocks = self.blocks(vectors)
+        # Batches of roughly equal work, a few per worker
+        budget = max(1, sum(len(block) ** 2 for block in blocks) // (self.workers * 4))
+        batches, batch, cost = [], [], 0
+        for block in blocks:
+            batch.append(block)
+            cost += len(block) ** 2
+            if cost >= budget:
+                batches.append((batch, self.threshold))
+                batch, cost = [], 0
+        if batch:
+            batches.append((batch, self.threshold))
+        self.compared = 0
+        for left, right, similarity, compared in self._map(_block_pairs, batches, initargs=(vectors,)):
+            self.compared += compared
+            yield from zip(left.tolist(), right.tolist(), similarity.tolist())
+
+    def leaders(self, vectors: np.ndarray) -> List[int]:
+        """
+        Greedy leader clustering in row order: each row joins the most
+        similar earlier row that leads a cluster, or leads a new one. Unlike
+        connected components, a chain of pairwise similar rows cannot pull
+        dissimilar ones together, since every member is similar to its
+        leader. Returns the leader of every row.
+        """
+        candidates: List[List[Tuple[float, int]]] = [[] for _ in range(len(vectors))]
+        for i, j, similarity in self.similar_pairs(vectors):
+            candidates[j].append((similarity, i))
+        leaders = list(range(len(vectors)))
+        for j, earlier in enumerate(candidates):
+            for _, i in sorted(earlier, reverse=True):
+                if leaders[i] == i:
+                    leaders[j] = i
+                    break
+        return leaders
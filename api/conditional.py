@@ -0,0 +1,73 @@
+import hashlib
+import secrets
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Optional
+
+from .stores import AtomicCounter, StoreListener
+
+# Versions are drawn from one process-wide sequence, so a version number is
+# never reused for a key, not even after its store was cleared
+_sequence = AtomicCounter()
+# The sequence restarts with the process while persisted data does not, so
+# tags also carry a random epoch per boot: no tag issued before a restart
+# matches one issued after it
+_epoch = secrets.token_hex(4)
+
+
+class VersionTracker(StoreListener):
+    """
+    Version number per key of a store, bumped on every write the store
+    reports and by explicit bump() calls for in-place changes (such as
+    grouped intent count increments) that listeners are not told about.
+    """
+
+    def __init__(self):
+        self._versions: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self._generation = _sequence.next()
+
+    def bump(self, key: Any) -> int:
+        version = _sequence.next()
+        with self._lock:
+            self._versions[key] = version
+        return version
+
+    def version(self, key: Any) -> int:
+        # Keys never written since the last clear share the generation version
+        return self._versions.get(key, self._generation)
+
+    def on_set(self, key, value):
+        self.bump(key)
+
+    def on_delete(self, key, value):
+        self.bump(key)
+
+    def on_clear(self):
+        with self._lock:
+            self._versions.clear()
+            self._generation = _sequence.next()
+
+
+def _variant(params: Iterable) -> str:
+    # Responses that depend on query parameters (pagination) get their own tag
+    return format(zlib.crc32(repr(sorted(params)).encode()), '08x')
+
+
+def version_etag(namespace: str, key: Any, version: int, params: Iterable = ()) -> str:
+    """Strong ETag for the representation of key at version"""
+    return f'"{namespace}-{key}-{_epoch}.{version}-{_variant(params)}"'
+
+
+def content_etag(content: bytes) -> str:
+    """Strong ETag derived from the encoded response itself"""
+    return f'"{hashlib.blake2b(content, digest_size=16).hexdigest()}"'
+
+
+def if_none_match(header: Optional[str], etag: str) -> bool:
+    """True when the If-None-Match header lists etag (or is '*')"""
+    if not header:
+        return False
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return '*' in candidates or etag in candidates or f"W/{etag}" in candidates
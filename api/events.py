@@ -0,0 +1,491 @@
+import json
+import struct
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence as SequenceType, Tuple, Union
+
+# Columns of an interaction event, see api.models.InteractionEvent
+INT_FIELDS = ('timestamp', 'view_id')
+STRING_FIELDS = ('view_resource_name', 'screen_name', 'action_type')
+FIELDS = INT_FIELDS + STRING_FIELDS
+
+_INT64_MIN, _INT64_MAX = -2 ** 63, 2 ** 63 - 1
+# Bit set in a row's presence mask when the event is kept verbatim in the overflow
+_OVERFLOW = 1 << len(FIELDS)
+
+
+class StringInterner:
+    """Dictionary encoding for repetitive strings: each distinct value is stored once and referenced by id"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._strings: List[str] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+    def intern(self, value: str) -> int:
+        string_id = self._ids.get(value)
+        if string_id is None:
+            with self._lock:
+                string_id = self._ids.get(value)
+                if string_id is None:
+                    string_id = len(self._strings)
+                    self._strings.append(value)
+                    self._ids[value] = string_id
+        return string_id
+
+    def lookup(self, string_id: int) -> str:
+        return self._strings[string_id]
+
+    def strings(self, count: Optional[int] = None) -> List[str]:
+        """The first count interned strings (all by default), in id order"""
+        return self._strings[:count]
+
+    def load(self, strings: Iterable[str]) -> None:
+        """Replace the contents with strings, which get ids in order"""
+        with self._lock:
+            self._strings = list(strings)
+            self._ids = {value: string_id for string_id, value in enumerate(self._strings)}
+
+
+class _Chunk:
+    """Fixed-capacity struct-of-arrays block of rows"""
+
+    __slots__ = ('present', 'ints', 'strings', 'overflow', 'referenced', 'location')
+
+    def __init__(self):
+        # Bit i of present[row] is set when FIELDS[i] exists in the row
+        self.present = array('B')
+        self.ints = [array('q') for _ in INT_FIELDS]
+        self.strings = [array('I') for _ in STRING_FIELDS]
+        # Rows that do not fit the columns (extra keys, unexpected types, events that are not dicts)
+        self.overflow: Optional[Dict[int, Any]] = None
+        # Set on every read, cleared by the eviction sweep
+        self.referenced = False
+        # Where the columns were spilled; sealed chunks never change, so they are written once
+        self.location = -1
+
+    def __len__(self) -> int:
+        return len(self.present)
+
+    def columns(self) -> list:
+        return [self.present, *self.ints, *self.strings]
+
+    def nbytes(self) -> int:
+        # Columns are arrays, or read-only memoryviews for chunks restored from a snapshot
+        return sum(len(column) * column.itemsize for column in self.columns())
+
+
+class _SpilledChunk:
+    """Stands in for a sealed chunk whose columns were moved to disk"""
+
+    __slots__ = ('present', 'rows', 'location')
+
+    def __init__(self, rows: int, location: int):
+        self.present = None
+        self.rows = rows
+        self.location = location
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def nbytes(self) -> int:
+        return 0
+
+
+def _fits(event: Any) -> bool:
+    if type(event) is not dict:
+        return False
+    for key, value in event.items():
+        if key in INT_FIELDS:
+            if type(value) is not int or not _INT64_MIN <= value <= _INT64_MAX:
+                return False
+        elif key in STRING_FIELDS:
+            if type(value) is not str:
+                return False
+        else:
+            return False
+    return True
+
+
+def _copy(event: Any) -> Any:
+    # Overflow rows are kept verbatim; dicts are copied so callers cannot change stored rows
+    return dict(event) if isinstance(event, dict) else event
+
+
+class EventStore:
+    """
+    Append-only struct-of-arrays storage for interaction events.
+
+    Numeric fields live in `array` columns and string fields as ids into a
+    StringInterner, split into chunks of `chunk_size` rows so growth never
+    copies existing rows. Events that do not fit the columns are kept as
+    dicts so every event round-trips. Rows are addressed by their global
+    position; EventLogs map an intent's events onto ranges of positions.
+    """
+
+    def __init__(self, chunk_size: int = 65536):
+        self.interner = StringInterner()
+        self._chunk_size = chunk_size
+        self._chunks: List[Union[_Chunk, _SpilledChunk]] = []
+        self._length = 0
+        self._lock = threading.Lock()
+        # Set by bound(): where chunks spill to, and how many sealed chunks stay in memory
+        self._spill: Any = None
+        self._max_chunks: Optional[int] = None
+        self._resident = 0
+        self._hand = 0
+        self.evictions = 0
+        self.reloads = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _append(self, event: dict) -> None:
+        if not self._chunks or len(self._chunks[-1]) == self._chunk_size:
+            self._chunks.append(_Chunk())
+            if self._max_chunks is not None and len(self._chunks) > 1:
+                self._resident += 1
+                self._evict_chunks()
+        chunk = self._chunks[-1]
+        if _fits(event):
+            mask = 0
+            for i, field in enumerate(INT_FIELDS):
+                if field in event:
+                    mask |= 1 << i
+                chunk.ints[i].append(event.get(field, 0))
+            for i, field in enumerate(STRING_FIELDS):
+                if field in event:
+                    mask |= 1 << (len(INT_FIELDS) + i)
+                    chunk.strings[i].append(self.interner.intern(event[field]))
+                else:
+                    chunk.strings[i].append(0)
+        else:
+            mask = _OVERFLOW
+            for column in chunk.ints:
+                column.append(0)
+            for column in chunk.strings:
+                column.append(0)
+            if chunk.overflow is None:
+                chunk.overflow = {}
+            chunk.overflow[len(chunk.present)] = _copy(event)
+        chunk.present.append(mask)
+        self._length += 1
+
+    def row(self, position: int) -> Any:
+        """Materialize the event at position as a dict"""
+        chunk = self._chunks[position // self._chunk_size]
+        if chunk.present is None:
+            chunk = self._reload(position // self._chunk_size)
+        chunk.referenced = True
+        row = position % self._chunk_size
+        mask = chunk.present[row]
+        if mask & _OVERFLOW:
+            return _copy(chunk.overflow[row])
+        event = {}
+        for i, field in enumerate(INT_FIELDS):
+            if mask & (1 << i):
+                event[field] = chunk.ints[i][row]
+        for i, field in enumerate(STRING_FIELDS):
+            if mask & (1 << (len(INT_FIELDS) + i)):
+                event[field] = self.interner.lookup(chunk.strings[i][row])
+        return event
+
+    def value(self, position: int, field: str) -> Any:
+        """One field of the event at position (None where missing) without building the dict"""
+        chunk = self._chunks[position // self._chunk_size]
+        if chunk.present is None:
+            chunk = self._reload(position // self._chunk_size)
+        chunk.referenced = True
+        row = position % self._chunk_size
+        mask = chunk.present[row]
+        if mask & _OVERFLOW:
+            event = chunk.overflow[row]
+            return event.get(field) if isinstance(event, dict) else None
+        if field in INT_FIELDS:
+            i = INT_FIELDS.index(field)
+            return chunk.ints[i][row] if mask & (1 << i) else None
+        if field in STRING_FIELDS:
+            i = STRING_FIELDS.index(field)
+            return self.interner.lookup(chunk.strings[i][row]) if mask & (1 << (len(INT_FIELDS) + i)) else None
+        return None
+
+    def nbytes(self) -> int:
+        """Bytes held in memory by the column buffers (overflow rows and the interner not included)"""
+        return sum(chunk.nbytes() for chunk in self._chunks)
+
+    # Spilling
+
+    def bound(self, max_bytes: int, spill: Any) -> None:
+        """
+        Keep at most max_bytes of sealed chunks' columns in memory. Chunks
+        not read recently (second-chance clock) are written to spill, a
+        SegmentStore, and read back the next time one of their rows is
+        accessed. The chunk being filled, and chunks mapped from a snapshot
+        (whose pages the OS can drop on its own), always stay.
+        """
+        with self._lock:
+            self._spill = spill
+            self._max_chunks = max(1, max_bytes // (self._chunk_size * self.ROW_BYTES))
+            self._resident = sum(1 for chunk in self._chunks[:-1] if isinstance(chunk.present, array))
+            self._evict_chunks()
+
+    def _encode_chunk(self, chunk: _Chunk) -> bytes:
+        # Stdlib json keeps this module free of Django; overflow rows are rare
+        overflow = json.dumps({row: event for row, event in (chunk.overflow or {}).items()}).encode()
+        return b''.join([struct.pack('<I', len(overflow)), overflow, *(bytes(column) for column in chunk.columns())])
+
+    def _decode_chunk(self, payload: bytes, rows: int, location: int) -> _Chunk:
+        view = memoryview(payload)
+        (length,) = struct.unpack_from('<I', view)
+        overflow = json.loads(bytes(view[4:4 + length]))
+        offset = 4 + length
+        columns = []
+        for typecode in self.COLUMN_TYPES:
+            column = array(typecode)
+            column.frombytes(view[offset:offset + rows * column.itemsize])
+            offset += rows * column.itemsize
+            columns.append(column)
+        chunk = _Chunk()
+        chunk.present = columns[0]
+        chunk.ints = columns[1:1 + len(INT_FIELDS)]
+        chunk.strings = columns[1 + len(INT_FIELDS):]
+        chunk.overflow = {int(row): event for row, event in overflow.items()} or None
+        chunk.location = location
+        return chunk
+
+    def _evict_chunks(self) -> None:
+        # Called with the lock held. Readers that fetched a chunk before it
+        # is replaced by its stand-in keep using the old object.
+        sealed = len(self._chunks) - 1
+        for _ in range(2 * sealed):
+            if self._resident <= self._max_chunks:
+                break
+            index = self._hand % sealed
+            self._hand = index + 1
+            chunk = self._chunks[index]
+            if not isinstance(chunk.present, array):
+                continue
+            if chunk.referenced:
+                chunk.referenced = False
+                continue
+            if chunk.location < 0:
+                chunk.location = self._spill.put(self._encode_chunk(chunk))
+            self._chunks[index] = _SpilledChunk(len(chunk), chunk.location)
+            self._resident -= 1
+            self.evictions += 1
+
+    def _reload(self, index: int) -> _Chunk:
+        with self._lock:
+            chunk = self._chunks[index]
+            if chunk.present is None:
+                chunk = self._decode_chunk(self._spill.get(chunk.location), len(chunk), chunk.location)
+                chunk.referenced = True
+                self._chunks[index] = chunk
+                self._resident += 1
+                self.reloads += 1
+                self._evict_chunks()
+            return chunk
+
+    def stats(self) -> Dict[str, int]:
+        chunks = list(self._chunks)
+        return {
+            'rows': self._length,
+            'chunks': len(chunks),
+            'spilled_chunks': sum(1 for chunk in chunks if chunk.present is None),
+            'resident_bytes': sum(chunk.nbytes() for chunk in chunks),
+            'evictions': self.evictions,
+            'reloads': self.reloads,
+        }
+
+    # Snapshots
+
+    COLUMN_TYPES = 'B' + 'q' * len(INT_FIELDS) + 'I' * len(STRING_FIELDS)
+    ROW_BYTES = sum(array(typecode).itemsize for typecode in COLUMN_TYPES)
+
+    @property
+    def chunk_size(self) -> int:
+        return self._chunk_size
+
+    def export(self, length: int) -> List[Tuple[List[bytes], Dict[int, dict]]]:
+        """
+        The first `length` rows as (column bytes in COLUMN_TYPES order,
+        overflow rows) per chunk. Rows past `length` may be appended
+        concurrently; they are left out.
+        """
+        chunks = []
+        for index in range((length + self._chunk_size - 1) // self._chunk_size):
+            chunk = self._chunks[index]
+            if chunk.present is None:
+                # Read back for the export only, without making it resident again
+                chunk = self._decode_chunk(self._spill.get(chunk.location), len(chunk), chunk.location)
+            rows = min(self._chunk_size, length - index * self._chunk_size)
+            overflow = {row: event for row, event in (chunk.overflow or {}).copy().items() if row < rows}
+            chunks.append(([bytes(column[:rows]) for column in chunk.columns()], overflow))
+        return chunks
+
+    @classmethod
+    def restore(cls, chunk_size: int, strings: Iterable[str],
+                chunks: SequenceType[Tuple[SequenceType[memoryview], Dict[int, dict]]]) -> 'EventStore':
+        """
+        Rebuild a store from export() output. Columns of full chunks are used
+        in place (memoryviews of a mapped snapshot are never copied); only
+        a partially filled chunk is copied so appends can continue.
+        """
+        store = cls(chunk_size)
+        store.interner.load(strings)
+        for columns, overflow in chunks:
+            chunk = _Chunk()
+            full = len(columns[0]) == chunk_size
+            typed = []
+            for typecode, column in zip(cls.COLUMN_TYPES, columns):
+                view = memoryview(column).cast('B')
+                if full:
+                    typed.append(view.cast(typecode))
+                else:
+                    typed.append(array(typecode))
+                    typed[-1].frombytes(view)
+            chunk.present = typed[0]
+            chunk.ints = typed[1:1 + len(INT_FIELDS)]
+            chunk.strings = typed[1 + len(INT_FIELDS):]
+            chunk.overflow = {int(row): event for row, event in overflow.items()} or None
+            store._chunks.append(chunk)
+            store._length += len(chunk)
+        return store
+
+
+class EventLog(Sequence):
+    """
+    Append-only list of one intent's interaction events, stored in an
+    EventStore shared by the whole repository.
+
+    The log only records which ranges of store positions belong to it, so
+    a log costs a couple of small arrays however many fields its events
+    have, and a batch of events appended at once is a single range.
+    Indexing, slicing and iteration materialize rows as dicts on demand,
+    and tolist() (which DRF's JSON encoder calls) materializes them at
+    serialization time.
+
+    Appends are serialized by the store's lock; readers take none because
+    an event is only counted in len() once it is fully written.
+    """
+
+    __slots__ = ('_store', '_starts', '_ends', '_length', '_tail')
+
+    def __init__(self, store: EventStore, events: Iterable[dict] = ()):
+        self._store = store
+        # Segment k covers store positions _starts[k] onwards, and log
+        # indexes up to (excluding) _ends[k]
+        self._starts = array('q')
+        self._ends = array('q')
+        self._length = 0
+        # Store position just past the last segment
+        self._tail = -1
+        self.extend(events)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def nbytes(self) -> int:
+        """Bytes held by the log object and its segment arrays; its rows are counted by the store"""
+        return sys.getsizeof(self) + sys.getsizeof(self._starts) + sys.getsizeof(self._ends)
+
+    def segments(self) -> Tuple[List[int], List[int]]:
+        """(starts, ends) of the store ranges behind the log, see from_segments()"""
+        return self._starts.tolist(), self._ends.tolist()
+
+    @classmethod
+    def from_segments(cls, store: EventStore, starts: SequenceType[int], ends: SequenceType[int]) -> 'EventLog':
+        """Log over rows already in store, as described by segments()"""
+        log = cls.__new__(cls)
+        log._store = store
+        log._starts = array('q', starts)
+        log._ends = array('q', ends)
+        log._length = ends[-1] if ends else 0
+        log._tail = starts[-1] + ends[-1] - (ends[-2] if len(ends) > 1 else 0) if ends else -1
+        return log
+
+    @classmethod
+    def joined(cls, logs: SequenceType['EventLog']) -> 'EventLog':
+        """Log over the events of logs, one after the other, without copying rows; logs share one store"""
+        starts: List[int] = []
+        ends: List[int] = []
+        for log in logs:
+            if log._store is not logs[0]._store:
+                raise ValueError('Only logs of the same EventStore can be joined')
+            offset = ends[-1] if ends else 0
+            log_starts, log_ends = log.segments()
+            starts.extend(log_starts)
+            ends.extend(offset + end for end in log_ends)
+        return cls.from_segments(logs[0]._store, starts, ends)
+
+    def append(self, event: dict) -> None:
+        self.extend((event,))
+
+    def extend(self, events: Iterable[dict]) -> None:
+        store = self._store
+        with store._lock:
+            start = store._length
+            for event in events:
+                store._append(event)
+            added = store._length - start
+            if not added:
+                return
+            if self._tail == start:
+                # Contiguous with the last segment
+                self._ends[-1] += added
+            else:
+                self._starts.append(start)
+                self._ends.append(self._length + added)
+            self._tail = store._length
+            self._length += added
+
+    def _position(self, index: int) -> int:
+        segment = bisect_right(self._ends, index)
+        return self._starts[segment] + index - (self._ends[segment - 1] if segment else 0)
+
+    def _positions(self) -> Iterator[int]:
+        length, previous_end = self._length, 0
+        for start, end in zip(self._starts, self._ends):
+            end = min(end, length)
+            yield from range(start, start + end - previous_end)
+            previous_end = end
+            if end >= length:
+                break
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[dict, List[dict]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('event index out of range')
+        return self._store.row(self._position(index))
+
+    def __iter__(self) -> Iterator[dict]:
+        row = self._store.row
+        for position in self._positions():
+            yield row(position)
+
+    def column(self, field: str) -> List[Any]:
+        """Every value of one field without materializing rows (None where missing)"""
+        value = self._store.value
+        return [value(position, field) for position in self._positions()]
+
+    def tolist(self) -> List[dict]:
+        return list(self)
+
+    def __eq__(self, other: Any) -> bool:
+        if isinstance(other, (EventLog, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self) -> str:
+        return f"EventLog({self.tolist()!r})"
@@ -0,0 +1,75 @@
+import logging
+import queue
+import threading
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+
+class GroupingPipeline:
+    """
+    Runs a handler on a pool of daemon worker threads fed by a bounded
+    queue. Workers are started lazily on the first submit so importing the
+    module (e.g. from management commands) does not spawn threads.
+    """
+
+    def __init__(self, handler: Callable[[Any], None], workers: int = 4, max_queue: int = 1000,
+                 name: str = 'grouping'):
+        self.handler = handler
+        self.workers = workers
+        self.name = name
+        self._queue: 'queue.Queue[Any]' = queue.Queue(maxsize=max_queue)
+        self._threads: List[threading.Thread] = []
+        self._lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+
+    def _ensure_started(self) -> None:
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._run, name=f"{self.name}-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                self.handler(item)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                logger.error("Background %s failed for %r: %s", self.name, item, e)
+                with self._lock:
+                    self.failed += 1
+            finally:
+                self._queue.task_done()
+
+    def submit(self, item: Any, block: bool = False) -> bool:
+        """Queue item for processing; returns False when the queue is full, unless block waits for room"""
+        self._ensure_started()
+        try:
+            self._queue.put(item, block=block)
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            return False
+        return True
+
+    def join(self) -> None:
+        """Block until every queued item has been processed"""
+        self._queue.join()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            'workers': len(self._threads),
+            'queued': self._queue.qsize(),
+            'processed': self.processed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+        }
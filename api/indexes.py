@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional, Set
+import threading
+from django.conf import settings
+from django.utils.module_loading import import_string
+from .backend import intent_assignments_repository, repository
+from .conditional import VersionTracker
+from .matching import BM25Index, EmbeddingIndex, NormalizedTextIndex
+from .paths import InteractionPaths
+from .ranking import IntentRanking
+from .stores import StoreListener
+
+class AssignmentsByGroup(StoreListener):
+    """Normalized intent texts assigned to each grouped intent, the reverse of the assignments store"""
+
+    def __init__(self):
+        self.texts: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    def on_set(self, key, value):
+        with self._lock:
+            self.texts.setdefault(value, set()).add(key)
+
+    def on_replace(self, key, old, new):
+        self.on_delete(key, old)
+        self.on_set(key, new)
+
+    def on_delete(self, key, value):
+        with self._lock:
+            texts = self.texts.get(value)
+            if texts is not None:
+                texts.discard(key)
+                if not texts:
+                    del self.texts[value]
+
+    def on_clear(self):
+        with self._lock:
+            self.texts.clear()
+
+    def assigned_to(self, group_key: str) -> List[str]:
+        with self._lock:
+            return list(self.texts.get(group_key, ()))
+
+assignments_by_group = AssignmentsByGroup()
+intent_assignments_repository.subscribe(assignments_by_group)
+
+class GroupedIntentIndexes(StoreListener):
+    """Keeps the in-process secondary indexes over the repository's grouped intents in sync"""
+
+    def __init__(self):
+        embedder_class = import_string(getattr(settings, 'INTENT_EMBEDDER', 'api.matching.HashedNgramEmbedder'))
+        self.embeddings = EmbeddingIndex(embedder_class())
+        self.texts = NormalizedTextIndex()
+        self.lexical = BM25Index()
+        self.intent_texts: Dict[str, str] = {}
+
+    def on_set(self, key, value):
+        self.intent_texts[key] = value['intent_text']
+        self.embeddings.add(key, value['intent_text'])
+        self.texts.add(key, value['intent_text'])
+        self.lexical.add(key, value['intent_text'])
+
+    def on_delete(self, key, value):
+        self.intent_texts.pop(key, None)
+        self.embeddings.remove(key)
+        self.texts.remove(key, value['intent_text'])
+        self.lexical.remove(key)
+        # Group ids are reused, so assignments must not outlive their group
+        for text in assignments_by_group.assigned_to(key):
+            if intent_assignments_repository.get(text) == key:
+                intent_assignments_repository.pop(text, None)
+
+    def on_clear(self):
+        self.intent_texts.clear()
+        self.embeddings.clear()
+        self.texts.clear()
+        self.lexical.clear()
+        intent_assignments_repository.clear()
+
+# Listeners are hydrated by the first repository.sync() (see similarity.find_local_match),
+# not here: with a database backend the tables may not exist yet at import time
+grouped_intent_indexes = GroupedIntentIndexes()
+repository.subscribe(grouped_intent_indexes)
+
+# Prefix tries of the interaction sessions recorded for every grouped intent
+_paths_config = getattr(settings, 'INTERACTION_PATHS', {})
+interaction_paths = InteractionPaths(max_depth=_paths_config.get('MAX_DEPTH', 50), top=_paths_config.get('TOP', 10))
+repository.subscribe(interaction_paths)
+
+# Grouped intents ranked by recorded intents, all time and per sliding window
+intent_ranking = IntentRanking(getattr(settings, 'TRENDING_WINDOWS', {'hour': (3600, 60), 'day': (86400, 96)}))
+repository.subscribe(intent_ranking)
+
+# Versions of every bill and grouped intent, behind the ETags of the read endpoints (see services.response_etag)
+bill_versions = VersionTracker()
+repository.subscribe_bills(bill_versions)
+grouped_intent_versions = VersionTracker()
+repository.subscribe(grouped_intent_versions)
+
+def shortlist_candidates(target_intent: str, k: Optional[int] = None) -> List[str]:
+    """Grouped intent texts worth showing to the LLM: the best BM25 matches, topped up with the nearest embeddings"""
+    if k is None:
+        k = getattr(settings, 'INTENT_LLM_CANDIDATES', 20)
+    keys = [key for key, _ in grouped_intent_indexes.lexical.top_k(target_intent, k)]
+    if len(keys) < k:
+        seen = set(keys)
+        for key, _ in grouped_intent_indexes.embeddings.top_k(target_intent, k):
+            if len(keys) >= k:
+                break
+            if key not in seen:
+                keys.append(key)
+    intent_texts = grouped_intent_indexes.intent_texts
+    return [intent_texts[key] for key in keys if key in intent_texts]
@@ -0,0 +1,238 @@
+from typing import Dict, List, Optional, Tuple
+import time
+import logging
+import threading
+import numpy as np
+from django.conf import settings
+from .backend import repository
+from .batching import MicroBatcher
+from .clustering import TextClusterer, UnionFind
+from .grouping import GroupingPipeline
+from .indexes import grouped_intent_indexes, grouped_intent_versions, intent_ranking, interaction_paths
+from .matching import normalize_text
+from .repositories import GROUPING_PENDING
+from .similarity import ask_llm_to_group_intents, find_local_match, find_most_similar_intent, needs_llm_tiebreak
+
+logger = logging.getLogger(__name__)
+
+# Grouping status of an intent, polled by clients in async grouping mode
+GROUPING_GROUPED = 'grouped'
+GROUPING_FAILED = 'failed'
+
+# Striped locks keyed on normalized intent text. They only stop two threads from
+# creating separate groups for the same text; counts and ids are atomic in the
+# repository, so unrelated intents are grouped in parallel.
+_grouping_locks = [threading.Lock() for _ in range(64)]
+
+def _grouping_lock(intent_text: str) -> threading.Lock:
+    return _grouping_locks[hash(normalize_text(intent_text)) % len(_grouping_locks)]
+
+def assign_to_group(intent: dict, similar_intent: Optional[dict]) -> dict:
+    """Add intent to similar_intent, or to a new grouped intent when there is none"""
+    intent_text = intent['intent_text']
+    interaction_events = intent['interaction_events']
+
+    with _grouping_lock(intent_text):
+        if not similar_intent:
+            # Another worker may have created a group for the same text meanwhile
+            key = grouped_intent_indexes.texts.get(intent_text)
+            similar_intent = repository.get_grouped_intent(key) if key is not None else None
+
+        if similar_intent:
+            # Update existing grouped intent
+            grouped_intent = repository.increment_grouped_intent(similar_intent)
+            # The group keeps the events it was created with; later sessions are counted in its path trie
+            interaction_paths.add(str(grouped_intent['id']), interaction_events)
+            # Increments replace the entry without notifying listeners
+            grouped_intent_versions.bump(str(grouped_intent['id']))
+            logger.info("Updated existing grouped intent '%s' with new interactions", similar_intent['intent_text'])
+        else:
+            # Create new grouped intent
+            grouped_intent = repository.create_grouped_intent(intent_text, interaction_events)
+            logger.info("Created new grouped intent with ID %s: '%s'", grouped_intent['id'], intent_text)
+        intent_ranking.hit(str(grouped_intent['id']), grouped_intent['count'])
+
+        repository.set_assignment(normalize_text(intent_text), str(grouped_intent['id']))
+
+    intent['grouped_intent_id'] = grouped_intent['id']
+    intent['grouping_status'] = GROUPING_GROUPED
+    repository.update_intent(intent)
+    return grouped_intent
+
+def group_intent(intent: dict) -> dict:
+    """Assign a stored intent to an existing or new grouped intent"""
+    if getattr(settings, 'INTENT_BATCHING', False):
+        intent_batcher.submit(intent).result()
+    else:
+        assign_to_group(intent, find_most_similar_intent(intent['intent_text']))
+    return intent
+
+def group_intents(intents: List[dict]) -> List[dict]:
+    """Group several stored intents, resolving the ones that need the LLM with a single request"""
+    similar_intents: List[Optional[dict]] = []
+    undecided: List[int] = []
+    for i, intent in enumerate(intents):
+        similar_intent, score = find_local_match(intent['intent_text'])
+        similar_intents.append(similar_intent)
+        if similar_intent is None and needs_llm_tiebreak(score):
+            undecided.append(i)
+
+    # Earlier intents in the batch that a later one should join
+    joins: Dict[int, int] = {}
+    if undecided:
+        verdicts = ask_llm_to_group_intents([intents[i]['intent_text'] for i in undecided])
+        for i, verdict in zip(undecided, verdicts):
+            if isinstance(verdict, int):
+                joins[i] = undecided[verdict]
+            elif verdict is not None:
+                key = grouped_intent_indexes.texts.get(verdict)
+                similar_intents[i] = repository.get_grouped_intent(key) if key is not None else None
+
+    grouped = []
+    for i, intent in enumerate(intents):
+        similar_intent = similar_intents[i]
+        if i in joins:
+            similar_intent = grouped[joins[i]]
+        grouped.append(assign_to_group(intent, similar_intent))
+    return grouped
+
+def group_pending_intent(intent_id: int) -> None:
+    """Background worker entry point"""
+    intent = repository.get_intent(intent_id)
+    if intent is None or intent['grouping_status'] != GROUPING_PENDING:
+        return
+    try:
+        group_intent(intent)
+    except Exception:
+        intent['grouping_status'] = GROUPING_FAILED
+        repository.update_intent(intent)
+        raise
+
+def regroup_intents(dry_run: bool = False, workers: Optional[int] = None,
+                    threshold: Optional[float] = None) -> dict:
+    """Merge the grouped intents whose stored texts cluster together; returns a report, applied unless dry_run"""
+    # Grouped intents holding the same normalized text are duplicates outright; the others are
+    # compared by the centroid of their texts' embeddings, weighted by use (see TextClusterer)
+    started = time.perf_counter()
+    timings: Dict[str, float] = {}
+
+    def lap(phase: str) -> None:
+        timings[phase] = time.perf_counter() - started - sum(timings.values())
+
+    summaries = {key: (intent_text, count) for key, intent_text, count in repository.grouped_intent_summaries()}
+    # Oldest first, so older grouped intents lead the clusters and absorb newer ones
+    keys = sorted(summaries, key=int)
+    positions = {key: position for position, key in enumerate(keys)}
+    duplicates = UnionFind(len(keys))
+    # Normalized text -> its index, and the first grouped intent seen holding it
+    text_indexes: Dict[str, int] = {}
+    # Texts repeat across intents far more than they differ, so normalize each only once
+    raw_indexes: Dict[str, int] = {}
+    text_owners: List[int] = []
+    # (text index, grouped intent position) -> number of intents
+    uses: Dict[Tuple[int, int], int] = {}
+
+    def add(intent_text: str, key: str) -> None:
+        position = positions.get(key)
+        if position is None:
+            return
+        index = raw_indexes.get(intent_text)
+        if index is None:
+            index = raw_indexes[intent_text] = text_indexes.setdefault(normalize_text(intent_text), len(text_indexes))
+        if index == len(text_owners):
+            text_owners.append(position)
+        else:
+            duplicates.union(text_owners[index], position)
+        uses[index, position] = uses.get((index, position), 0) + 1
+
+    for key, (intent_text, _) in summaries.items():
+        add(intent_text, key)
+    intents = 0
+    for intent_text, grouped_intent_id in repository.intent_groups():
+        intents += 1
+        if grouped_intent_id is not None:
+            add(intent_text, str(grouped_intent_id))
+    lap('load')
+
+    clusterer = TextClusterer(
+        grouped_intent_indexes.embeddings.embedder,
+        threshold if threshold is not None else getattr(settings, 'INTENT_SIMILARITY_THRESHOLD', 0.75),
+        workers=workers
+    )
+    vectors = clusterer.embed(list(text_indexes))
+    lap('vectorize')
+
+    # One centroid per set of duplicates, numbered in the order of their oldest grouped intent
+    components: Dict[int, int] = {}
+    component_of = [components.setdefault(duplicates.find(position), len(components)) for position in range(len(keys))]
+    centroids = np.zeros((len(components), vectors.shape[1]), dtype=np.float32)
+    if uses:
+        texts, owners = np.array(list(uses), dtype=np.int64).T
+        weights = np.fromiter(uses.values(), dtype=np.float32, count=len(uses))
+        np.add.at(centroids, np.asarray(component_of)[owners], vectors[texts] * weights[:, None])
+    norms = np.linalg.norm(centroids, axis=1, keepdims=True)
+    centroids /= np.where(norms > 0, norms, 1)
+    leaders = clusterer.leaders(centroids)
+    lap('cluster')
+
+    clusters: Dict[int, List[str]] = {}
+    for key, component in zip(keys, component_of):
+        clusters.setdefault(leaders[component], []).append(key)
+    merges = {members[0]: members[1:] for members in clusters.values() if len(members) > 1}
+    if merges and not dry_run:
+        # Merged grouped intents are deleted, taking their tries and rankings with them
+        for key, merged_keys in merges.items():
+            interaction_paths.merge(key, merged_keys)
+            intent_ranking.merge(key, merged_keys)
+        repository.merge_grouped_intents(merges)
+        logger.info("Merged %s grouped intents into %s", sum(map(len, merges.values())), len(merges))
+    lap('apply')
+
+    return {
+        'dry_run': dry_run,
+        'intents': intents,
+        'texts': len(text_indexes),
+        'grouped_intents_before': len(keys),
+        'grouped_intents_after': len(keys) - sum(map(len, merges.values())),
+        'comparisons': clusterer.compared,
+        'merges': [
+            {
+                'into': {'id': key, 'intent_text': summaries[key][0], 'count': summaries[key][1]},
+                'merged': [{'id': merged, 'intent_text': summaries[merged][0], 'count': summaries[merged][1]}
+                           for merged in merged_keys],
+                'count': sum(summaries[member][1] for member in [key, *merged_keys]),
+            }
+            for key, merged_keys in merges.items()
+        ],
+        'timings': {name: round(seconds, 3) for name, seconds in timings.items()},
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    }
+
+grouping_pipeline = GroupingPipeline(
+    group_pending_intent,
+    workers=getattr(settings, 'INTENT_GROUPING_WORKERS', 4),
+    max_queue=getattr(settings, 'INTENT_GROUPING_QUEUE_SIZE', 1000)
+)
+
+def resume_pending_grouping() -> int:
+    """Queue the intents a restarted repository recovered as pending; returns how many"""
+    intent_ids = repository.take_recovered_pending()
+    if intent_ids:
+        logger.info("Resuming grouping of %d recovered pending intents", len(intent_ids))
+
+        # Waits for room in the queue, so a large backlog neither blocks startup nor is dropped
+        def submit_all():
+            for intent_id in intent_ids:
+                grouping_pipeline.submit(intent_id, block=True)
+
+        threading.Thread(target=submit_all, name='grouping-resume', daemon=True).start()
+    return len(intent_ids)
+
+resume_pending_grouping()
+
+intent_batcher = MicroBatcher(
+    group_intents,
+    window=getattr(settings, 'INTENT_BATCH_WINDOW', 0.02),
+    max_batch_size=getattr(settings, 'INTENT_BATCH_MAX_SIZE', 32),
+    name='intent-batcher'
+)
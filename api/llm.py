@@ -0,0 +1,356 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, List, Optional, Set
+
+
+def _token_count(usage: Any, field: str) -> int:
+    value = getattr(usage, field, None)
+    return value if isinstance(value, int) else 0
+
+
+class LLMUsage:
+    """
+    Token and prompt-size accounting for LLM requests. Besides running
+    totals it keeps the last `history` requests so per-request savings from
+    candidate shortlisting can be inspected.
+    """
+
+    def __init__(self, history: int = 100):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.candidates_sent = 0
+        self.candidates_available = 0
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+
+    def record(self, operation: str, response: Any, candidates_sent: int = 0, candidates_available: int = 0) -> Dict[str, Any]:
+        usage = getattr(response, 'usage', None)
+        entry = {
+            'operation': operation,
+            'prompt_tokens': _token_count(usage, 'prompt_tokens'),
+            'completion_tokens': _token_count(usage, 'completion_tokens'),
+            'candidates_sent': candidates_sent,
+            'candidates_available': candidates_available,
+        }
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += entry['prompt_tokens']
+            self.completion_tokens += entry['completion_tokens']
+            self.candidates_sent += candidates_sent
+            self.candidates_available += candidates_available
+            self.recent.append(entry)
+        return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'requests': self.requests,
+                'prompt_tokens': self.prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'candidates_sent': self.candidates_sent,
+                'candidates_available': self.candidates_available,
+                'recent': list(self.recent),
+            }
+
+
+class LLMUnavailable(Exception):
+    """Raised when an LLM request cannot be answered within its deadline or the breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls
+    for `reset_timeout` seconds. After that a single probe call is let
+    through (half-open); its outcome closes or re-opens the breaker.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self.opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+                return self.HALF_OPEN
+            return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self._state == self.OPEN:
+                if self._clock() - self._opened_at < self.reset_timeout:
+                    self.rejected += 1
+                    return False
+                self._state = self.HALF_OPEN
+            if self._state == self.HALF_OPEN:
+                if self._probing:
+                    self.rejected += 1
+                    return False
+                self._probing = True
+            return True
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.opened += 1
+                self._state = self.OPEN
+                self._opened_at = self._clock()
+            self._probing = False
+
+    def release(self) -> None:
+        """End an allowed call that reached no outcome, freeing the half-open probe"""
+        with self._lock:
+            self._probing = False
+
+    def reset(self) -> None:
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        state = self.state
+        with self._lock:
+            return {
+                'state': state,
+                'consecutive_failures': self._failures,
+                'opened': self.opened,
+                'rejected': self.rejected,
+            }
+
+
+def _is_retryable(error: BaseException) -> bool:
+    # Client errors (bad request, auth) will not succeed on another attempt
+    status_code = getattr(error, 'status_code', None)
+    return not (isinstance(status_code, int) and 400 <= status_code < 500 and status_code not in (408, 409, 429))
+
+
+class ResilientLLMClient:
+    """
+    Wraps chat completion calls with a per-request deadline, hedged retries
+    and a circuit breaker.
+
+    Every call gets `timeout` seconds in total. If the first attempt has not
+    answered after `hedge_after` seconds a second one is started and the
+    first response wins; failed attempts are retried while attempts and
+    time remain. Calls that cannot be answered raise LLMUnavailable so the
+    caller can fall back to local matching, and count against the breaker.
+
+    Synchronous attempts run in a pool of `max_workers` threads. Their
+    deadline and hedge timer start when an attempt gets a thread, not when
+    it is queued; a call that waits `timeout` seconds without getting one
+    is saturation of this process, so it raises LLMUnavailable without
+    counting against the breaker. Attempts still queued when a call ends
+    are cancelled.
+
+    `client` and `async_client` are callables returning the OpenAI clients
+    so the underlying clients can be swapped (or mocked) after construction.
+    """
+
+    def __init__(self, client: Callable[[], Any], async_client: Optional[Callable[[], Any]] = None,
+                 timeout: float = 10.0, hedge_after: Optional[float] = 2.0, max_attempts: int = 2,
+                 breaker: Optional[CircuitBreaker] = None, max_workers: int = 32):
+        self._client = client
+        self._async_client = async_client
+        self.timeout = timeout
+        self.hedge_after = hedge_after
+        self.max_attempts = max(1, max_attempts)
+        self.breaker = breaker or CircuitBreaker()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='llm')
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.hedges = 0
+        self.retries = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.saturated = 0
+        self.fallbacks: Dict[str, int] = {}
+
+    def _count(self, field: str) -> None:
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def record_fallback(self, operation: str) -> None:
+        """Count a request answered by the local matcher instead of the LLM"""
+        with self._lock:
+            self.fallbacks[operation] = self.fallbacks.get(operation, 0) + 1
+
+    def _next_wait(self, deadline: float, attempts: int, running: int) -> float:
+        remaining = deadline - time.monotonic()
+        if self.hedge_after is not None and attempts < self.max_attempts and running == 1:
+            return min(remaining, self.hedge_after)
+        return remaining
+
+    def _finish(self, error: Optional[BaseException], timed_out: bool) -> LLMUnavailable:
+        if timed_out:
+            self._count('timeouts')
+        if error is None or _is_retryable(error):
+            self.breaker.record_failure()
+        else:
+            # The upstream answered, it just rejected this request
+            self.breaker.record_success()
+        reason = f"no answer within {self.timeout:.1f}s" if timed_out else f"{error}"
+        return LLMUnavailable(reason)
+
+    def _hedge_due(self, attempts: int, running: Set[Future], starts: Dict[Future, List[float]]) -> Optional[float]:
+        # Only a lone attempt that is already talking to the upstream is hedged
+        if self.hedge_after is None or attempts >= self.max_attempts or len(running) != 1:
+            return None
+        started = starts[next(iter(running))]
+        return started[0] + self.hedge_after if started else None
+
+    def create(self, **kwargs) -> Any:
+        """Hedged, deadline-bound client.chat.completions.create"""
+        if not self.breaker.allow():
+            raise LLMUnavailable('circuit breaker is open')
+        self._count('calls')
+        client = self._client()
+        queued_until = time.monotonic() + self.timeout
+        # Start time of the first attempt to get a thread, which starts the deadline
+        first_started: List[float] = []
+        starts: Dict[Future, List[float]] = {}
+
+        def deadline() -> float:
+            return first_started[0] + self.timeout if first_started else queued_until
+
+        def attempt(started: List[float]):
+            started.append(time.monotonic())
+            if not first_started:
+                first_started.append(started[0])
+            return client.chat.completions.create(timeout=max(deadline() - time.monotonic(), 0.001), **kwargs)
+
+        def submit() -> Future:
+            started: List[float] = []
+            future = self._executor.submit(attempt, started)
+            starts[future] = started
+            return future
+
+        running = {submit()}
+        attempts, error = 1, None
+        try:
+            while running:
+                now = time.monotonic()
+                if deadline() <= now:
+                    break
+                hedge_at = self._hedge_due(attempts, running, starts)
+                if hedge_at is not None and hedge_at <= now:
+                    self._count('hedges')
+                    running.add(submit())
+                    attempts += 1
+                    continue
+                wait_until = deadline() if hedge_at is None else min(deadline(), hedge_at)
+                done, running = wait(running, timeout=wait_until - now, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self.breaker.record_success()
+                        return future.result()
+                    error = future.exception()
+                    self._count('errors')
+                    if not _is_retryable(error):
+                        raise self._finish(error, False) from error
+                if done and attempts < self.max_attempts and deadline() > time.monotonic():
+                    self._count('retries')
+                    running.add(submit())
+                    attempts += 1
+        finally:
+            # Attempts still queued are dropped; running ones are bounded by their own timeout
+            for future in running:
+                future.cancel()
+        if not first_started:
+            self._count('saturated')
+            self.breaker.release()
+            raise LLMUnavailable(f"no worker free within {self.timeout:.1f}s")
+        raise self._finish(error, bool(running) or error is None) from error
+
+    async def acreate(self, **kwargs) -> Any:
+        """Async variant of create using the AsyncOpenAI client"""
+        if not self.breaker.allow():
+            raise LLMUnavailable('circuit breaker is open')
+        self._count('calls')
+        deadline = time.monotonic() + self.timeout
+        client = self._async_client()
+
+        def attempt():
+            return asyncio.ensure_future(
+                client.chat.completions.create(timeout=max(deadline - time.monotonic(), 0.001), **kwargs)
+            )
+
+        running = {attempt()}
+        attempts, error = 1, None
+        try:
+            while running:
+                wait_for = self._next_wait(deadline, attempts, len(running))
+                if wait_for <= 0:
+                    break
+                done, running = await asyncio.wait(running, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self.breaker.record_success()
+                        return task.result()
+                    error = task.exception()
+                    self._count('errors')
+                    if not _is_retryable(error):
+                        raise self._finish(error, False) from error
+                if attempts < self.max_attempts and deadline > time.monotonic() and (done or len(running) == 1):
+                    self._count('retries' if done else 'hedges')
+                    running.add(attempt())
+                    attempts += 1
+            raise self._finish(error, bool(running) or error is None) from error
+        finally:
+            for task in running:
+                task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {
+                'calls': self.calls,
+                'hedges': self.hedges,
+                'retries': self.retries,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'saturated': self.saturated,
+                'fallbacks': dict(self.fallbacks),
+            }
+        return {'breaker': self.breaker.stats(), **counters}
+
+
+def build_llm_client(config: Dict[str, Any], client: Callable[[], Any],
+                     async_client: Optional[Callable[[], Any]] = None) -> ResilientLLMClient:
+    """Create the resilient LLM client described by settings.LLM_CLIENT"""
+    breaker = CircuitBreaker(
+        failure_threshold=config.get('BREAKER_FAILURES', 5),
+        reset_timeout=config.get('BREAKER_RESET', 30.0)
+    )
+    return ResilientLLMClient(
+        client,
+        async_client,
+        timeout=config.get('TIMEOUT', 10.0),
+        hedge_after=config.get('HEDGE_AFTER', 2.0),
+        max_attempts=config.get('MAX_ATTEMPTS', 2),
+        breaker=breaker,
+        max_workers=config.get('MAX_WORKERS', 32)
+    )
@@ -0,0 +1,129 @@
+import atexit
+import datetime
+import itertools
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from typing import Any, Dict, Optional
+
+# Pass as extra= on high-frequency messages so SamplingFilter thins them out
+SAMPLED = {'sampled': True}
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+_INTERNAL_ATTRIBUTES = frozenset(['sampled', 'sample_rate'])
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps every `rate`-th record of each call site that was logged with
+    extra=SAMPLED, starting with the first; other records always pass.
+    Kept records carry sample_rate so their counts can be scaled back up.
+    """
+
+    def __init__(self, rate: int = 100):
+        super().__init__()
+        self.rate = max(1, int(rate))
+        self._counters: Dict[tuple, Any] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.rate == 1 or not getattr(record, 'sampled', False):
+            return True
+        site = (record.pathname, record.lineno)
+        counter = self._counters.get(site)
+        if counter is None:
+            # Losing a race here only restarts the count of one call site
+            counter = self._counters.setdefault(site, itertools.count())
+        if next(counter) % self.rate:
+            return False
+        record.sample_rate = self.rate
+        return True
+
+
+def _truncate(text: str, limit: int) -> str:
+    if limit and len(text) > limit:
+        return f"{text[:limit]}... [{len(text) - limit} more characters]"
+    return text
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, message, any extra=
+    fields and the traceback. Messages and field values are cut to
+    max_length characters so a large payload cannot flood the log.
+    """
+
+    def __init__(self, max_length: int = 2000):
+        super().__init__()
+        self.max_length = max_length
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': _truncate(record.getMessage(), self.max_length),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and key not in _INTERNAL_ATTRIBUTES:
+                entry[key] = value if isinstance(value, (bool, int, float, type(None))) else _truncate(str(value), self.max_length)
+        if getattr(record, 'sample_rate', None):
+            entry['sample_rate'] = record.sample_rate
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _Listener(logging.handlers.QueueListener):
+    def enqueue_sentinel(self) -> None:
+        # A full queue at shutdown is drained first instead of failing the stop
+        self.queue.put(self._sentinel, timeout=5)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a writer thread through a bounded queue, so request
+    threads never format messages or block on the output stream. When the
+    queue is full records are dropped and counted instead of waiting.
+
+    Messages are formatted in the writer thread, after the call returned, so
+    log arguments must not be mutated afterwards.
+    """
+
+    def __init__(self, stream: Any = None, queue_size: int = 10000):
+        super().__init__(queue.Queue(queue_size))
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream if stream is not None else sys.stderr)
+        self.listener = _Listener(self.queue, self.target)
+        self.listener.start()
+        # Drain the queue before the interpreter exits
+        atexit.register(self.close)
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        # Formatting happens in the writer thread, on the target handler
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Unlike QueueHandler.prepare, leave msg and args alone: getMessage() runs in the writer thread
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self) -> None:
+        listener, self.listener = self.listener, None
+        if listener is not None:
+            try:
+                listener.stop()
+            except queue.Full:
+                # The writer is stuck; it is a daemon thread and dies with the process
+                pass
+            self.target.close()
+        super().close()
@@ -0,0 +1,40 @@
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import create_bills
+
+
+class Command(BaseCommand):
+    help = (
+        'Import bills from a CSV file with a header row (user_id, electricity_bill, water_bill, '
+        'internet_bill, phone_bill). The file is streamed, validated row by row and upserted in '
+        'batches. Use a persistent REPOSITORY backend; the in-memory one does not outlive the command.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import, or '-' for standard input")
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='rows per write (default: settings.BILL_IMPORT_BATCH_SIZE)')
+        parser.add_argument('--delimiter', default=',', help='field delimiter (default: ",")')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            source = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f"Cannot open {path}: {e}")
+
+        with source:
+            reader = csv.DictReader(source, delimiter=options['delimiter'])
+            if reader.fieldnames is None or 'user_id' not in reader.fieldnames:
+                raise CommandError('The CSV header must include a user_id column')
+            report = create_bills(reader, batch_size=options['batch_size'])
+
+        for error in report['errors']:
+            self.stderr.write(f"row {error['row'] + 1}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} bills, rejected {report['failed']} "
+            f"in {report['elapsed_seconds']:.2f}s ({report['rows_per_second'] or 0:.0f} rows/s)"
+        ))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import IntentService
+
+
+class Command(BaseCommand):
+    help = (
+        'Re-cluster every stored intent text with the local embedder and merge grouped intents that hold '
+        'similar texts, adding up their counts and interaction events. Runs on a process pool and makes no '
+        'LLM calls. Use --dry-run to only report the merges. Run it against a persistent REPOSITORY while '
+        'the service is stopped: the in-memory backends keep their state inside the server process.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='report the merges without applying them')
+        parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+        parser.add_argument('--threshold', type=float, default=None,
+                            help='cosine similarity that makes two texts the same intent '
+                                 '(default: settings.INTENT_SIMILARITY_THRESHOLD)')
+        parser.add_argument('--show', type=int, default=20, help='merges to list (default: 20, 0 for none)')
+
+    def handle(self, *args, **options):
+        if options['workers'] is not None and options['workers'] < 1:
+            raise CommandError('--workers must be at least 1')
+        report = IntentService.regroup_intents(
+            dry_run=options['dry_run'], workers=options['workers'], threshold=options['threshold']
+        )
+
+        for merge in report['merges'][:options['show']]:
+            into = merge['into']
+            self.stdout.write(f"#{into['id']} '{into['intent_text']}' ({into['count']}) <- " + ', '.join(
+                f"#{merged['id']} '{merged['intent_text']}' ({merged['count']})" for merged in merge['merged']
+            ))
+        if len(report['merges']) > options['show']:
+            self.stdout.write(f"... and {len(report['merges']) - options['show']} more")
+        timings = ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in report['timings'].items())
+        verb = 'Would merge' if report['dry_run'] else 'Merged'
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report['grouped_intents_before'] - report['grouped_intents_after']} of "
+            f"{report['grouped_intents_before']} grouped intents into {len(report['merges'])} "
+            f"({report['intents']} intents, {report['texts']} distinct texts, {report['comparisons']} comparisons) "
+            f"in {report['elapsed_seconds']:.2f}s: {timings}"
+        ))
@@ -0,0 +1,237 @@
+import math
+import re
+import threading
+import zlib
+from collections import Counter
+from typing import Dict, List, Optional, Protocol, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r'\w+')
+_PUNCTUATION_RE = re.compile(r'[^\w\s]+')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def normalize_text(text: str) -> str:
+    """Canonicalize intent text by folding case, punctuation and whitespace"""
+    text = _PUNCTUATION_RE.sub(' ', text.casefold())
+    return _WHITESPACE_RE.sub(' ', text).strip()
+
+
+class Embedder(Protocol):
+    """Turns a piece of text into a fixed-size, L2-normalized vector"""
+    dim: int
+
+    def embed(self, text: str) -> np.ndarray:
+        ...
+
+
+class HashedNgramEmbedder:
+    """
+    Dependency-free embedder that hashes word tokens and character n-grams
+    into a fixed number of buckets (the "hashing trick"). It needs no model
+    download and no network access, and is deterministic across processes.
+    """
+
+    def __init__(self, dim: int = 512, ngram_range: Tuple[int, int] = (3, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> List[str]:
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = [f"w:{token}" for token in tokens]
+        low, high = self.ngram_range
+        for token in tokens:
+            padded = f" {token} "
+            for n in range(low, high + 1):
+                for i in range(len(padded) - n + 1):
+                    features.append(padded[i:i + n])
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = zlib.crc32(feature.encode('utf-8'))
+            # The low bit picks a sign so collisions cancel out on average
+            vector[(digest >> 1) % self.dim] += 1.0 if digest & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+
+class NormalizedTextIndex:
+    """Hash index from normalized intent text to the key of the entry holding it"""
+
+    def __init__(self):
+        self._keys: Dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, key: str, text: str) -> None:
+        # The first entry registered for a normalized text owns it
+        self._keys.setdefault(normalize_text(text), key)
+
+    def remove(self, key: str, text: str) -> None:
+        normalized = normalize_text(text)
+        if self._keys.get(normalized) == key:
+            del self._keys[normalized]
+
+    def clear(self) -> None:
+        self._keys.clear()
+
+    def get(self, text: str) -> Optional[str]:
+        return self._keys.get(normalize_text(text))
+
+
+class EmbeddingIndex:
+    """
+    Keeps one embedding per grouped intent in a contiguous NumPy matrix so a
+    query is a single matrix-vector product instead of a remote LLM call.
+    """
+
+    def __init__(self, embedder: Embedder, initial_capacity: int = 1024):
+        self.embedder = embedder
+        self._lock = threading.RLock()
+        self._matrix = np.zeros((initial_capacity, embedder.dim), dtype=np.float32)
+        self._keys: List[str] = []
+        self._positions: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _grow(self) -> None:
+        capacity = max(1, self._matrix.shape[0]) * 2
+        matrix = np.zeros((capacity, self.embedder.dim), dtype=np.float32)
+        matrix[:len(self._keys)] = self._matrix[:len(self._keys)]
+        self._matrix = matrix
+
+    def add(self, key: str, text: str) -> None:
+        """Add or replace the vector stored for key"""
+        vector = self.embedder.embed(text)
+        with self._lock:
+            position = self._positions.get(key)
+            if position is None:
+                if len(self._keys) == self._matrix.shape[0]:
+                    self._grow()
+                position = len(self._keys)
+                self._keys.append(key)
+                self._positions[key] = position
+            self._matrix[position] = vector
+
+    def remove(self, key: str) -> None:
+        """Remove key by moving the last row into its slot"""
+        with self._lock:
+            position = self._positions.pop(key, None)
+            if position is None:
+                return
+            last = len(self._keys) - 1
+            if position != last:
+                moved_key = self._keys[last]
+                self._matrix[position] = self._matrix[last]
+                self._keys[position] = moved_key
+                self._positions[moved_key] = position
+            self._keys.pop()
+            self._matrix[last] = 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._keys.clear()
+            self._positions.clear()
+            self._matrix[:] = 0
+
+    def top_k(self, text: str, k: int = 1) -> List[Tuple[str, float]]:
+        """Return up to k (key, cosine similarity) pairs, best first"""
+        vector = self.embedder.embed(text)
+        with self._lock:
+            size = len(self._keys)
+            if size == 0 or k <= 0:
+                return []
+            scores = self._matrix[:size] @ vector
+            if k == 1:
+                best = int(np.argmax(scores))
+                return [(self._keys[best], float(scores[best]))]
+            k = min(k, size)
+            candidates = np.argpartition(-scores, k - 1)[:k]
+            ranked = candidates[np.argsort(-scores[candidates])]
+            return [(self._keys[i], float(scores[i])) for i in ranked]
+
+    def query(self, text: str) -> Optional[Tuple[str, float]]:
+        """Return the (key, cosine similarity) of the nearest entry, if any"""
+        results = self.top_k(text, 1)
+        return results[0] if results else None
+
+
+class BM25Index:
+    """
+    Inverted index over normalized intent tokens, scored with Okapi BM25.
+    Entries are added and removed incrementally as grouped intents change.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._terms: Dict[str, List[str]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return normalize_text(text).split()
+
+    def add(self, key: str, text: str) -> None:
+        tokens = self._tokenize(text)
+        with self._lock:
+            self._remove_locked(key)
+            counts = Counter(tokens)
+            for token, count in counts.items():
+                self._postings.setdefault(token, {})[key] = count
+            self._terms[key] = list(counts)
+            self._lengths[key] = len(tokens)
+            self._total_length += len(tokens)
+
+    def _remove_locked(self, key: str) -> None:
+        length = self._lengths.pop(key, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for token in self._terms.pop(key):
+            postings = self._postings[token]
+            del postings[key]
+            if not postings:
+                del self._postings[token]
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            self._remove_locked(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._postings.clear()
+            self._lengths.clear()
+            self._terms.clear()
+            self._total_length = 0
+
+    def top_k(self, text: str, k: int) -> List[Tuple[str, float]]:
+        """Return up to k (key, BM25 score) pairs sharing a token with text, best first"""
+        with self._lock:
+            size = len(self._lengths)
+            if size == 0 or k <= 0:
+                return []
+            average_length = self._total_length / size or 1.0
+            scores: Dict[str, float] = {}
+            for token in set(self._tokenize(text)):
+                postings = self._postings.get(token)
+                if not postings:
+                    continue
+                idf = math.log(1 + (size - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[key] / average_length)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
@@ -0,0 +1,246 @@
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Request and LLM latencies in seconds, from a cache hit to a slow LLM round trip
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _ThreadCells:
+    """
+    Per-thread value arrays behind a metric. Writers only ever touch the
+    array of their own thread, so updates take no lock; readers add up all
+    arrays. Arrays of finished threads are folded into a running total when
+    read, so per-connection server threads do not accumulate.
+    """
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._cells: List[Tuple[threading.Thread, List[float]]] = []
+        self._retired = [0] * size
+
+    def values(self) -> List[float]:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0] * self._size
+            with self._lock:
+                self._cells.append((threading.current_thread(), values))
+            self._local.values = values
+            return values
+
+    def totals(self) -> List[float]:
+        with self._lock:
+            live = []
+            for thread, values in self._cells:
+                if thread.is_alive():
+                    live.append((thread, values))
+                else:
+                    # A finished thread can no longer write to its array
+                    self._retired = [a + b for a, b in zip(self._retired, values)]
+            self._cells = live
+            totals = list(self._retired)
+            for _, values in live:
+                totals = [a + b for a, b in zip(totals, values)]
+        return totals
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        """The child for one combination of label values"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + ([extra] if extra else [])
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class _CounterChild:
+    __slots__ = ('_cells',)
+
+    def __init__(self):
+        self._cells = _ThreadCells(1)
+
+    def inc(self, amount: float = 1) -> None:
+        self._cells.values()[0] += amount
+
+    def value(self) -> float:
+        return self._cells.totals()[0]
+
+
+class Counter(_Metric):
+    """Monotonic counter, optionally split by labels"""
+
+    kind = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self):
+        for key, child in sorted(self._children.items()):
+            yield f"{self.name}{self._label_text(key)} {_number(child.value())}"
+
+
+class _HistogramChild:
+    __slots__ = ('_buckets', '_cells')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        # One count per bucket (the last one is +Inf), then the sum of observations
+        self._cells = _ThreadCells(len(buckets) + 2)
+
+    def observe(self, value: float) -> None:
+        values = self._cells.values()
+        values[bisect.bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def totals(self) -> Tuple[List[float], float]:
+        totals = self._cells.totals()
+        return totals[:-1], totals[-1]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets, optionally split by labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    @contextmanager
+    def time(self, *labelvalues):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.labels(*labelvalues).observe(time.perf_counter() - started)
+
+    def samples(self):
+        for key, child in sorted(self._children.items()):
+            counts, total = child.totals()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = '+Inf' if bound == math.inf else _number(bound)
+                yield f"{self.name}_bucket{self._label_text(key, ('le', le))} {_number(cumulative)}"
+            yield f"{self.name}_sum{self._label_text(key)} {_number(total)}"
+            yield f"{self.name}_count{self._label_text(key)} {_number(cumulative)}"
+
+
+class Gauge(_Metric):
+    """Value read when metrics are collected; func returns a number or a {label values: number} dict"""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str, func: Callable, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._func = func
+
+    def samples(self):
+        values = self._func()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for key, value in sorted(values.items()):
+            key = key if isinstance(key, tuple) else (key,)
+            yield f"{self.name}{self._label_text(tuple(str(part) for part in key))} {_number(value)}"
+
+
+class CounterFunc(Gauge):
+    """Counter whose totals are kept elsewhere and read when metrics are collected"""
+
+    kind = 'counter'
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, func: Callable, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, func, labelnames))
+
+    def counter_func(self, name: str, documentation: str, func: Callable, labelnames: Sequence[str] = ()) -> CounterFunc:
+        return self._register(CounterFunc(name, documentation, func, labelnames))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+# Process-wide registry served at /api/metrics/
+registry = MetricsRegistry()
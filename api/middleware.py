@@ -0,0 +1,52 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from .metrics import registry
+
+request_duration = registry.histogram(
+    'luma_http_request_duration_seconds',
+    'Time spent handling HTTP requests, by URL name (see api/urls.py), method and status',
+    ['view', 'method', 'status'],
+)
+
+HTTP_METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+
+
+class MetricsMiddleware:
+    """
+    Records the duration of every request in request_duration. Put it first
+    in MIDDLEWARE so the time spent in other middleware is included; for
+    streaming responses only the time until the response starts is counted.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self._is_async = iscoroutinefunction(get_response)
+        if self._is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self._is_async:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._record(request, response, started)
+        return response
+
+    @staticmethod
+    def _record(request, response, started: float) -> None:
+        match = getattr(request, 'resolver_match', None)
+        # Unresolved paths and unknown methods share one label so scanners cannot blow up the series count
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        method = request.method if request.method in HTTP_METHODS else 'other'
+        request_duration.labels(view, method, response.status_code).observe(time.perf_counter() - started)
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_bill'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='groupedintent',
+            name='count',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddField(
+            model_name='intent',
+            name='grouping_status',
+            field=models.CharField(default='pending', max_length=16),
+        ),
+        migrations.CreateModel(
+            name='IntentAssignment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('normalized_text', models.TextField(unique=True)),
+                ('grouped_intent', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assignments', to='api.groupedintent')),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:56
+
+from django.db import migrations, models
+
+
+def seed_grouped_intents_version(apps, schema_editor):
+    # The version used to be the highest grouped intent id; continue from there
+    GroupedIntent = apps.get_model('api', 'GroupedIntent')
+    Counter = apps.get_model('api', 'Counter')
+    latest = GroupedIntent.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+    Counter.objects.create(name='grouped_intents_version', value=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_grouping_state'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Counter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=64, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(seed_grouped_intents_version, migrations.RunPython.noop),
+    ]
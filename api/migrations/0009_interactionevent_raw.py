@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_counter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='interactionevent',
+            name='raw',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
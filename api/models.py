@@ -0,0 +1,58 @@
+from django.db import models
+
+
+class GroupedIntent(models.Model):
+    grouped_intent_id = models.CharField(max_length=36, unique=True)
+    intent_texts = models.JSONField(default=list)
+    interaction_events = models.JSONField(default=list)
+    count = models.PositiveIntegerField(default=1)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Intent(models.Model):
+    intent_id = models.CharField(max_length=36, unique=True)
+    intent_text = models.TextField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    is_grouped = models.BooleanField(default=False)
+    grouping_status = models.CharField(max_length=16, default='pending')
+    grouped_intent = models.ForeignKey(
+        GroupedIntent, blank=True, null=True, on_delete=models.SET_NULL, related_name='original_intents'
+    )
+
+
+class InteractionEvent(models.Model):
+    intent = models.ForeignKey(Intent, on_delete=models.CASCADE, related_name='interaction_events')
+    timestamp = models.BigIntegerField()
+    view_id = models.IntegerField()
+    view_resource_name = models.CharField(max_length=255)
+    screen_name = models.CharField(max_length=255)
+    action_type = models.CharField(max_length=255)
+    # Events that are not objects, kept verbatim as [event] (the columns above are left empty)
+    raw = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+
+class IntentAssignment(models.Model):
+    normalized_text = models.TextField(unique=True)
+    grouped_intent = models.ForeignKey(GroupedIntent, on_delete=models.CASCADE, related_name='assignments')
+
+
+class Bill(models.Model):
+    user_id = models.CharField(max_length=36, unique=True)
+    electricity_bill = models.DecimalField(max_digits=10, decimal_places=2)
+    water_bill = models.DecimalField(max_digits=10, decimal_places=2)
+    internet_bill = models.DecimalField(max_digits=10, decimal_places=2)
+    phone_bill = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+
+class Counter(models.Model):
+    """Named counters shared by every process using the database"""
+
+    # Bumped by every write that adds or removes grouped intents
+    GROUPED_INTENTS_VERSION = 'grouped_intents_version'
+
+    name = models.CharField(max_length=64, unique=True)
+    value = models.BigIntegerField(default=0)
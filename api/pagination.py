@@ -0,0 +1,59 @@
+import base64
+import json
+import zlib
+from typing import Any, Iterator, List, Optional, Tuple
+
+
+def encode_cursor(check: Any, sequence: int) -> str:
+    """Opaque cursor pointing just past the event at sequence, whose fingerprint is check"""
+    payload = json.dumps([check, sequence], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[Any, int]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        check, sequence = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not isinstance(sequence, int) or isinstance(sequence, bool) or sequence < 0:
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return check, sequence
+
+
+def fingerprint(event: Any) -> str:
+    """Short checksum of an event, whatever its shape, telling whether a cursor still points at it"""
+    encoded = json.dumps(event, sort_keys=True, separators=(',', ':'), default=str).encode()
+    return format(zlib.crc32(encoded), '08x')
+
+
+def resume_position(events: List[Any], cursor: Optional[str]) -> int:
+    """
+    Index of the first event after cursor. Events are append-only, so the
+    cursor's position is all it takes; if the event there no longer matches
+    the cursor the history was rebuilt and the cursor is rejected with a
+    ValueError.
+    """
+    if not cursor:
+        return 0
+    check, sequence = decode_cursor(cursor)
+    if sequence >= len(events) or fingerprint(events[sequence]) != check:
+        raise ValueError(f"Stale cursor: {cursor!r}, the events changed since it was issued")
+    return sequence + 1
+
+
+def paginate_events(events: List[Any], cursor: Optional[str], limit: int) -> Tuple[List[Any], Optional[str]]:
+    """One page of at most limit events and the cursor of the next page (None on the last page)"""
+    start = resume_position(events, cursor)
+    page = events[start:start + limit]
+    end = start + len(page)
+    next_cursor = encode_cursor(fingerprint(page[-1]), end - 1) if page and end < len(events) else None
+    return page, next_cursor
+
+
+def iter_events(events: List[Any], position: int = 0) -> Iterator[dict]:
+    """Events from position on, read one at a time so nothing is copied up front"""
+    while position < len(events):
+        yield events[position]
+        position += 1
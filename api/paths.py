@@ -0,0 +1,227 @@
+import heapq
+import threading
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .stores import StoreListener
+
+# Fields of an interaction event that make up one step of a path
+STEP_FIELDS = ('screen_name', 'view_resource_name', 'action_type')
+
+Step = Tuple[Optional[str], ...]
+
+
+def _step(event: Any) -> Step:
+    if not isinstance(event, dict):
+        return (None,) * len(STEP_FIELDS)
+    return tuple(event.get(field) for field in STEP_FIELDS)
+
+
+def event_steps(events: Iterable[Any]) -> Iterator[Step]:
+    """The step of every event, with None for missing fields"""
+    if hasattr(events, 'column'):
+        # EventLogs hand out columns without materializing rows
+        return zip(*(events.column(field) for field in STEP_FIELDS))
+    return map(_step, events)
+
+
+class StepTable:
+    """Ids for distinct steps, shared by the tries of every grouped intent"""
+
+    def __init__(self):
+        self._ids: Dict[Step, int] = {}
+        self._steps: List[Step] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._steps)
+
+    def id(self, step: Step) -> int:
+        step_id = self._ids.get(step)
+        if step_id is None:
+            with self._lock:
+                step_id = self._ids.get(step)
+                if step_id is None:
+                    step_id = len(self._steps)
+                    self._steps.append(step)
+                    self._ids[step] = step_id
+        return step_id
+
+    def step(self, step_id: int) -> Step:
+        return self._steps[step_id]
+
+
+class PathTrie:
+    """
+    Prefix trie of sessions, each a sequence of steps (see STEP_FIELDS):
+    sessions that start alike share nodes, so many recorded sessions cost
+    about as much as their distinct paths. Every node counts the sessions
+    passing through it and the sessions ending at it.
+
+    Nodes live in parallel arrays and edges in one dict keyed on
+    (node, step id), so a node costs a few array slots and a dict entry.
+    The `top` most frequent complete paths are kept up to date on every
+    insert (counts only grow, so the list stays exact), which makes
+    top_paths(k) for k <= top cost O(k * path length).
+    """
+
+    def __init__(self, steps: StepTable, max_depth: int = 50, top: int = 10):
+        self._steps = steps
+        # Longer sessions are cut to their first max_depth steps
+        self.max_depth = max_depth
+        self.top = top
+        # Node 0 is the root, the empty path
+        self._parents = array('I', [0])
+        self._step_ids = array('I', [0])
+        self._counts = array('I', [0])
+        self._ends = array('I', [0])
+        self._children: Dict[int, int] = {}
+        # (sessions ending there, node) of the most frequent complete paths, best first
+        self._leaders: List[Tuple[int, int]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Number of nodes, the root included"""
+        return len(self._parents)
+
+    @property
+    def sessions(self) -> int:
+        return self._counts[0]
+
+    def add(self, events: Iterable[Any], weight: int = 1) -> None:
+        """Count the session made of events weight times; empty sessions are ignored"""
+        step_ids = [self._steps.id(step) for step, _ in zip(event_steps(events), range(self.max_depth))]
+        if step_ids:
+            with self._lock:
+                self._insert(step_ids, weight)
+
+    def _insert(self, step_ids: Sequence[int], weight: int) -> None:
+        parents, counts, children = self._parents, self._counts, self._children
+        node = 0
+        counts[0] += weight
+        for step_id in step_ids:
+            edge = node << 32 | step_id
+            child = children.get(edge)
+            if child is None:
+                child = children[edge] = len(parents)
+                parents.append(node)
+                self._step_ids.append(step_id)
+                counts.append(0)
+                self._ends.append(0)
+            counts[child] += weight
+            node = child
+        self._ends[node] += weight
+        # Ties go to the older path
+        leaders = [entry for entry in self._leaders if entry[1] != node]
+        leaders.append((self._ends[node], node))
+        leaders.sort(key=lambda entry: (-entry[0], entry[1]))
+        self._leaders = leaders[:self.top]
+
+    def _path(self, node: int) -> List[int]:
+        nodes = []
+        while node:
+            nodes.append(node)
+            node = self._parents[node]
+        nodes.reverse()
+        return nodes
+
+    def top_paths(self, k: int = 1) -> List[Dict[str, Any]]:
+        """
+        The k most frequent complete paths as {'count': sessions that
+        followed exactly this path, 'steps': [step fields plus 'count',
+        the sessions that reached the step]}, most frequent first
+        """
+        with self._lock:
+            if k <= self.top:
+                leaders = self._leaders[:k]
+            else:
+                # Most frequent first, then oldest first
+                leaders = [(-negated, node) for negated, node in heapq.nsmallest(
+                    k, ((-ends, node) for node, ends in enumerate(self._ends) if ends)
+                )]
+            paths = [(ends, self._path(node)) for ends, node in leaders]
+            counts = self._counts
+            return [{
+                'count': ends,
+                'steps': [
+                    {**dict(zip(STEP_FIELDS, self._steps.step(self._step_ids[node]))), 'count': counts[node]}
+                    for node in nodes
+                ],
+            } for ends, nodes in paths]
+
+    def merge(self, other: 'PathTrie') -> None:
+        """Add every session counted by other, which must share this trie's StepTable"""
+        with other._lock:
+            paths = [([other._step_ids[node] for node in other._path(node)], ends)
+                     for node, ends in enumerate(other._ends) if ends]
+        with self._lock:
+            for step_ids, ends in paths:
+                self._insert(step_ids, ends)
+
+    def nbytes(self) -> int:
+        """Approximate bytes held by the node arrays and edges (the shared StepTable not included)"""
+        arrays = (self._parents, self._step_ids, self._counts, self._ends)
+        # A dict entry plus its int key and value
+        return sum(len(column) * column.itemsize for column in arrays) + len(self._children) * 100
+
+
+class InteractionPaths(StoreListener):
+    """
+    One PathTrie per grouped intent. Subscribed to the grouped intents, it
+    starts a trie with the events of every new grouped intent (the session
+    of the intent that created it) and drops the trie of a deleted one;
+    sessions of intents that join an existing grouped intent are added
+    with add(). Tries are kept in process memory, so after a restart they
+    hold the first session of each grouped intent plus what is added since.
+    """
+
+    def __init__(self, max_depth: int = 50, top: int = 10):
+        self.max_depth = max_depth
+        self.top = top
+        self.steps = StepTable()
+        self._tries: Dict[str, PathTrie] = {}
+        self._lock = threading.Lock()
+
+    def _trie(self, key: str) -> PathTrie:
+        trie = self._tries.get(key)
+        if trie is None:
+            with self._lock:
+                trie = self._tries.setdefault(key, PathTrie(self.steps, self.max_depth, self.top))
+        return trie
+
+    def add(self, key: str, events: Iterable[Any]) -> None:
+        """Count one session of the grouped intent with this key"""
+        self._trie(key).add(events)
+
+    def get(self, key: str) -> Optional[PathTrie]:
+        return self._tries.get(key)
+
+    def merge(self, key: str, merged_keys: Iterable[str]) -> None:
+        """Add the sessions of merged_keys to key, before the grouped intents are merged and deleted"""
+        trie = self._trie(key)
+        for merged_key in merged_keys:
+            merged = self._tries.get(merged_key)
+            if merged is not None:
+                trie.merge(merged)
+
+    def on_set(self, key, value):
+        # Replaced entries (increments, merges) already have a trie
+        if key not in self._tries:
+            self.add(key, value['interaction_events'])
+
+    def on_delete(self, key, value):
+        with self._lock:
+            self._tries.pop(key, None)
+
+    def on_clear(self):
+        with self._lock:
+            self._tries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        tries = list(self._tries.values())
+        return {
+            'grouped_intents': len(tries),
+            'nodes': sum(len(trie) for trie in tries),
+            'distinct_steps': len(self.steps),
+            'bytes': sum(trie.nbytes() for trie in tries),
+        }
@@ -0,0 +1,306 @@
+import glob
+import mmap
+import os
+import struct
+import sys
+import threading
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .codecs import dumps, loads
+
+# Log frame header: payload length and CRC-32 of the payload
+_FRAME = struct.Struct('<II')
+# Snapshot header: magic, format version, offset and length of the metadata
+_SNAPSHOT_MAGIC = b'LUMASNAP'
+_SNAPSHOT_HEADER = struct.Struct('<8sIQQ')
+_SNAPSHOT_VERSION = 1
+
+SYNC_MODES = ('group', 'always', 'none')
+
+
+class CorruptLog(Exception):
+    """A log segment other than the last one, or a snapshot, failed its checks"""
+
+
+class LogFailed(Exception):
+    """A write to the log failed, so it refuses further records rather than leave a gap"""
+
+
+def _fsync_directory(directory: str) -> None:
+    # Makes created, renamed and deleted files in directory durable
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class WriteAheadLog:
+    """
+    Append-only log of JSON records split into segment files named after
+    the LSN (log sequence number) of their first record.
+
+    append() only buffers a record; wait_durable() makes it durable. With
+    sync='group' the first waiter becomes the leader: it writes everything
+    buffered so far with one write() and one fsync() while later writers
+    keep appending, so concurrent writers share fsyncs. sync='always'
+    writes and fsyncs every record inside append(), and sync='none' writes
+    without fsync (safe against process crashes, not power loss).
+
+    replay() must run before the first append on an existing directory; it
+    is called automatically otherwise. A torn record at the end of the last
+    segment (a crash mid-write) is cut off; damage anywhere else raises
+    CorruptLog.
+
+    A failed write or fsync leaves the log failed: the records it carried
+    may be partly on disk, so every later append() and wait_durable()
+    raises LogFailed and the log stays a prefix of what was applied.
+    """
+
+    def __init__(self, directory: str, sync: str = 'group', commit_delay: float = 0.0):
+        if sync not in SYNC_MODES:
+            raise ValueError(f"Unknown WAL sync mode: {sync}")
+        self.directory = str(directory)
+        self.sync = sync
+        # Seconds the group commit leader waits for more records to join its fsync
+        self.commit_delay = commit_delay
+        os.makedirs(self.directory, exist_ok=True)
+        self._condition = threading.Condition()
+        self._fd: Optional[int] = None
+        self._pending: List[bytes] = []
+        self._last_lsn = 0
+        self._durable_lsn = 0
+        self._flushing = False
+        self._replayed = False
+        self._failure: Optional[BaseException] = None
+        self.appended = 0
+        self.syncs = 0
+
+    @property
+    def last_lsn(self) -> int:
+        return self._last_lsn
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        paths = glob.glob(os.path.join(self.directory, 'wal-*.log'))
+        return sorted((int(os.path.basename(path)[4:-4]), path) for path in paths)
+
+    # Recovery
+
+    def replay(self, after_lsn: int = 0) -> Iterator[Tuple[int, list]]:
+        """(lsn, record) for every record after after_lsn (the LSN of the snapshot loaded), in log order"""
+        self._last_lsn = max(self._last_lsn, after_lsn)
+        segments = self._segments()
+        for index, (_, path) in enumerate(segments):
+            last = index == len(segments) - 1
+            with open(path, 'rb') as file:
+                data = file.read()
+            offset = 0
+            while offset < len(data):
+                end = offset + _FRAME.size
+                if end <= len(data):
+                    length, crc = _FRAME.unpack_from(data, offset)
+                    payload = data[end:end + length]
+                if end > len(data) or len(payload) < length or zlib.crc32(payload) != crc:
+                    if not last:
+                        raise CorruptLog(f"{path} is damaged at offset {offset}")
+                    # Torn write at the tail: drop it so new segments never follow garbage
+                    with open(path, 'r+b') as file:
+                        file.truncate(offset)
+                        os.fsync(file.fileno())
+                    break
+                lsn, *record = loads(payload)
+                self._last_lsn = lsn
+                if lsn > after_lsn:
+                    yield lsn, record
+                offset = end + length
+        self._durable_lsn = self._last_lsn
+        self._replayed = True
+
+    # Writing
+
+    def _open_segment(self) -> None:
+        path = os.path.join(self.directory, f"wal-{self._last_lsn + 1:020d}.log")
+        self._fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if self.sync != 'none':
+            _fsync_directory(self.directory)
+
+    def _check(self) -> None:
+        # Condition held
+        if self._failure is not None:
+            raise LogFailed(f"{self.directory}: an earlier write failed") from self._failure
+
+    def _write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        if self.sync != 'none':
+            os.fsync(self._fd)
+            self.syncs += 1
+
+    def append(self, record: Sequence[Any]) -> int:
+        """Buffer record and return its LSN; callers serialize appends to fix the log order"""
+        if not self._replayed:
+            for _ in self.replay():
+                pass
+        with self._condition:
+            self._check()
+            if self._fd is None:
+                self._open_segment()
+            lsn = self._last_lsn + 1
+            payload = dumps([lsn, *record])
+            frame = _FRAME.pack(len(payload), zlib.crc32(payload)) + payload
+            self._last_lsn = lsn
+            self.appended += 1
+            if self.sync == 'always':
+                try:
+                    self._write(frame)
+                except BaseException as error:
+                    self._failure = error
+                    raise
+                self._durable_lsn = lsn
+            else:
+                self._pending.append(frame)
+        return lsn
+
+    def wait_durable(self, lsn: int) -> None:
+        """Block until the record with this LSN has been written (and fsynced, unless sync='none')"""
+        with self._condition:
+            while self._durable_lsn < lsn:
+                self._check()
+                if self._flushing:
+                    self._condition.wait()
+                    continue
+                self._flushing = True
+                if self.commit_delay:
+                    self._condition.wait(self.commit_delay)
+                target, data, self._pending = self._last_lsn, b''.join(self._pending), []
+                failure = None
+                self._condition.release()
+                try:
+                    self._write(data)
+                except BaseException as error:
+                    failure = error
+                    raise
+                finally:
+                    self._condition.acquire()
+                    if failure is None:
+                        self._durable_lsn = target
+                    else:
+                        self._failure = failure
+                    self._flushing = False
+                    self._condition.notify_all()
+
+    def flush(self) -> int:
+        """Make every appended record durable and return the last LSN"""
+        lsn = self._last_lsn
+        self.wait_durable(lsn)
+        return lsn
+
+    def rotate(self) -> int:
+        """
+        Flush, and start a new segment with the next record. Returns the
+        last LSN of the closed segment; call it while appends are held off
+        so that LSN matches the state being snapshotted.
+        """
+        lsn = self.flush()
+        with self._condition:
+            while self._flushing:
+                self._condition.wait()
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+        return lsn
+
+    def discard_through(self, lsn: int) -> None:
+        """Delete segments whose records all have an LSN up to lsn, e.g. once a snapshot covers them"""
+        segments = self._segments()
+        # The end of a segment is known from the start of the next one, or
+        # from the last LSN when the newest segment is closed
+        ends = [next_first - 1 for next_first, _ in segments[1:]]
+        ends.append(self._last_lsn if self._fd is None else None)
+        removed = False
+        for (_, path), end in zip(segments, ends):
+            if end is not None and end <= lsn:
+                os.remove(path)
+                removed = True
+        if removed and self.sync != 'none':
+            _fsync_directory(self.directory)
+
+    def close(self) -> None:
+        if self._failure is None:
+            self.rotate()
+        elif self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+# Snapshots
+
+def snapshot_path(directory: str, lsn: int) -> str:
+    return os.path.join(directory, f"snapshot-{lsn:020d}.snap")
+
+
+def snapshots(directory: str) -> List[Tuple[int, str]]:
+    """(lsn, path) of the snapshots in directory, oldest first"""
+    paths = glob.glob(os.path.join(directory, 'snapshot-*.snap'))
+    return sorted((int(os.path.basename(path)[9:-5]), path) for path in paths)
+
+
+def write_snapshot(path: str, meta: Dict[str, Any], chunks: Sequence[Tuple[Sequence[bytes], Dict[int, dict]]],
+                   sync: bool = True) -> None:
+    """
+    Write meta plus chunks of raw column buffers (EventStore.export()) to
+    path atomically: the file is written under a temporary name and renamed
+    into place, so a snapshot is either complete or absent. Column buffers
+    start at 8-byte aligned offsets so they can be cast in place when the
+    file is mapped.
+    """
+    temporary = f"{path}.tmp"
+    chunk_meta = []
+    with open(temporary, 'wb') as file:
+        file.write(b'\0' * _SNAPSHOT_HEADER.size)
+        for columns, overflow in chunks:
+            extents = []
+            for column in columns:
+                file.write(b'\0' * (-file.tell() % 8))
+                extents.append([file.tell(), len(column)])
+                file.write(column)
+            chunk_meta.append({'columns': extents, 'overflow': overflow})
+        encoded = dumps({
+            **meta,
+            'byteorder': sys.byteorder,
+            'chunks': chunk_meta,
+        })
+        meta_offset = file.tell()
+        file.write(encoded)
+        file.seek(0)
+        file.write(_SNAPSHOT_HEADER.pack(_SNAPSHOT_MAGIC, _SNAPSHOT_VERSION, meta_offset, len(encoded)))
+        file.flush()
+        if sync:
+            os.fsync(file.fileno())
+    os.replace(temporary, path)
+    if sync:
+        _fsync_directory(os.path.dirname(path) or '.')
+
+
+def read_snapshot(path: str) -> Tuple[Dict[str, Any], List[Tuple[List[memoryview], Dict[str, dict]]]]:
+    """
+    Map a snapshot read-only and return its meta and its chunks as
+    memoryviews into the mapping, so column data is paged in on demand
+    instead of being read and copied up front.
+    """
+    with open(path, 'rb') as file:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    magic, version, meta_offset, meta_length = _SNAPSHOT_HEADER.unpack_from(mapping)
+    if magic != _SNAPSHOT_MAGIC or version != _SNAPSHOT_VERSION:
+        raise CorruptLog(f"{path} is not a version {_SNAPSHOT_VERSION} snapshot")
+    meta = loads(mapping[meta_offset:meta_offset + meta_length])
+    if meta['byteorder'] != sys.byteorder:
+        raise CorruptLog(f"{path} was written on a {meta['byteorder']}-endian machine")
+    view = memoryview(mapping)
+    chunks = [
+        ([view[offset:offset + length] for offset, length in chunk['columns']], chunk['overflow'])
+        for chunk in meta.pop('chunks')
+    ]
+    return meta, chunks
@@ -0,0 +1,253 @@
+import heapq
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .stores import StoreListener
+
+
+class IndexedMaxHeap:
+    """
+    Max-heap of keys by count with a position index, so a key's count can
+    be changed or the key removed in O(log n). Ties go to the key added
+    first. top(n) walks the heap best-first, costing O(n log n) whatever
+    the number of keys.
+    """
+
+    def __init__(self):
+        # Heap slots: parallel lists of key, count and insertion sequence
+        self._keys: List[Any] = []
+        self._counts: List[int] = []
+        self._seqs: List[int] = []
+        self._positions: Dict[Any, int] = {}
+        self._seq = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, key: Any) -> bool:
+        return key in self._positions
+
+    def get(self, key: Any, default: int = 0) -> int:
+        position = self._positions.get(key)
+        return self._counts[position] if position is not None else default
+
+    def _above(self, i: int, j: int) -> bool:
+        # Whether slot i ranks before slot j
+        counts = self._counts
+        return counts[i] > counts[j] or (counts[i] == counts[j] and self._seqs[i] < self._seqs[j])
+
+    def _swap(self, i: int, j: int) -> None:
+        keys, counts, seqs = self._keys, self._counts, self._seqs
+        keys[i], keys[j] = keys[j], keys[i]
+        counts[i], counts[j] = counts[j], counts[i]
+        seqs[i], seqs[j] = seqs[j], seqs[i]
+        self._positions[keys[i]] = i
+        self._positions[keys[j]] = j
+
+    def _sift_up(self, i: int) -> None:
+        while i:
+            parent = (i - 1) // 2
+            if not self._above(i, parent):
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i: int) -> None:
+        size = len(self._keys)
+        while True:
+            best, left = i, 2 * i + 1
+            for child in (left, left + 1):
+                if child < size and self._above(child, best):
+                    best = child
+            if best == i:
+                break
+            self._swap(i, best)
+            i = best
+
+    def set(self, key: Any, count: int) -> None:
+        position = self._positions.get(key)
+        if position is None:
+            position = self._positions[key] = len(self._keys)
+            self._keys.append(key)
+            self._counts.append(count)
+            self._seqs.append(self._seq)
+            self._seq += 1
+            self._sift_up(position)
+            return
+        old, self._counts[position] = self._counts[position], count
+        if count > old:
+            self._sift_up(position)
+        elif count < old:
+            self._sift_down(position)
+
+    def add(self, key: Any, weight: int = 1) -> int:
+        """Add weight to the count of key (0 when absent) and return the new count"""
+        count = self.get(key) + weight
+        self.set(key, count)
+        return count
+
+    def remove(self, key: Any) -> None:
+        position = self._positions.pop(key, None)
+        if position is None:
+            return
+        last = len(self._keys) - 1
+        if position != last:
+            self._swap(position, last)
+            # _swap indexed the removed key again
+            del self._positions[key]
+        self._keys.pop()
+        self._counts.pop()
+        self._seqs.pop()
+        if position < len(self._keys):
+            self._sift_up(position)
+            self._sift_down(position)
+
+    def clear(self) -> None:
+        self._keys.clear()
+        self._counts.clear()
+        self._seqs.clear()
+        self._positions.clear()
+
+    def top(self, n: int) -> List[Tuple[Any, int]]:
+        """The n keys with the highest counts as (key, count), highest first"""
+        ranked: List[Tuple[Any, int]] = []
+        frontier = [(-self._counts[0], self._seqs[0], 0)] if self._keys else []
+        while frontier and len(ranked) < n:
+            negated, _, i = heapq.heappop(frontier)
+            ranked.append((self._keys[i], -negated))
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(self._keys):
+                    heapq.heappush(frontier, (-self._counts[child], self._seqs[child], child))
+        return ranked
+
+
+class SlidingWindowCounter:
+    """
+    Counts per key over the last `span` seconds, kept in a ring of
+    `buckets` buckets of span / buckets seconds each: a count leaves the
+    window when its bucket is reused, so the window is exact to one
+    bucket. Totals per key are kept in an IndexedMaxHeap, updated as
+    counts enter and leave, so every count is added and later subtracted
+    once and the top keys need no scan.
+    """
+
+    def __init__(self, span: float, buckets: int):
+        self.span = span
+        self.width = span / buckets
+        self._ring: List[Dict[Any, int]] = [{} for _ in range(buckets)]
+        # Number of the bucket of time the newest ring slot holds
+        self._current: Optional[int] = None
+        self.totals = IndexedMaxHeap()
+
+    def advance(self, now: float) -> None:
+        """Expire the buckets that fell out of the window by now"""
+        current = int(now // self.width)
+        if self._current is not None and current > self._current:
+            for number in range(max(self._current + 1, current - len(self._ring) + 1), current + 1):
+                expired = self._ring[number % len(self._ring)]
+                for key, count in expired.items():
+                    self._subtract(key, count)
+                expired.clear()
+        if self._current is None or current > self._current:
+            self._current = current
+
+    def _subtract(self, key: Any, count: int) -> None:
+        if self.totals.add(key, -count) <= 0:
+            self.totals.remove(key)
+
+    def add(self, key: Any, weight: int, now: float) -> None:
+        self.advance(now)
+        bucket = self._ring[self._current % len(self._ring)]
+        bucket[key] = bucket.get(key, 0) + weight
+        self.totals.add(key, weight)
+
+    def move(self, key: Any, target: Any) -> None:
+        """Count every hit of key in the window as a hit of target"""
+        for bucket in self._ring:
+            count = bucket.pop(key, 0)
+            if count:
+                bucket[target] = bucket.get(target, 0) + count
+        count = self.totals.get(key)
+        if count:
+            self.totals.remove(key)
+            self.totals.add(target, count)
+
+    def remove(self, key: Any) -> None:
+        for bucket in self._ring:
+            bucket.pop(key, None)
+        self.totals.remove(key)
+
+    def clear(self) -> None:
+        for bucket in self._ring:
+            bucket.clear()
+        self.totals.clear()
+
+
+class IntentRanking(StoreListener):
+    """
+    Grouped intents ranked by how often they were recorded: all time (the
+    grouped intent's count) and over sliding windows such as the last hour.
+    Subscribed to the grouped intents, it ranks every new grouped intent
+    by its count and drops deleted ones; recorded intents are counted with
+    hit(), which takes the grouped intent's new count from the repository,
+    so the all-time ranking stays exact. Windows hold the hits this process
+    saw, so they start empty after a restart.
+    """
+
+    def __init__(self, windows: Dict[str, Tuple[float, int]], clock: Callable[[], float] = time.time):
+        self._clock = clock
+        self.all_time = IndexedMaxHeap()
+        self.windows = {name: SlidingWindowCounter(span, buckets) for name, (span, buckets) in windows.items()}
+        self._lock = threading.Lock()
+
+    def hit(self, key: str, count: int) -> None:
+        """Count one recorded intent of the grouped intent with this key, whose count is now count"""
+        now = self._clock()
+        with self._lock:
+            self.all_time.set(key, count)
+            for window in self.windows.values():
+                window.add(key, 1, now)
+
+    def merge(self, key: str, merged_keys: Iterable[str]) -> None:
+        """Move the hits of merged_keys to key, before the grouped intents are merged and deleted"""
+        with self._lock:
+            for merged_key in merged_keys:
+                self.all_time.add(key, self.all_time.get(merged_key))
+                for window in self.windows.values():
+                    window.move(merged_key, key)
+
+    def top(self, n: int, window: Optional[str] = None) -> List[Tuple[str, int]]:
+        """
+        The n grouped intents recorded most often as (key, count), all
+        time or in the named window; raises KeyError for unknown windows
+        """
+        with self._lock:
+            if window is None:
+                return self.all_time.top(n)
+            counter = self.windows[window]
+            counter.advance(self._clock())
+            return counter.totals.top(n)
+
+    def on_set(self, key, value):
+        with self._lock:
+            # Replaced entries (merges) are already ranked
+            if key not in self.all_time:
+                self.all_time.set(key, value['count'])
+
+    def on_delete(self, key, value):
+        with self._lock:
+            self.all_time.remove(key)
+            for window in self.windows.values():
+                window.remove(key)
+
+    def on_clear(self):
+        with self._lock:
+            self.all_time.clear()
+            for window in self.windows.values():
+                window.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'grouped_intents': len(self.all_time),
+                    **{name: len(window.totals) for name, window in self.windows.items()}}
@@ -0,0 +1,1208 @@
+import gc
+import itertools
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import uuid
+from collections.abc import Mapping
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F
+
+from .codecs import dumps, loads
+from .events import EventLog, EventStore
+from .models import Bill, Counter, GroupedIntent, Intent, IntentAssignment, InteractionEvent
+from .persistence import WriteAheadLog, read_snapshot, snapshot_path, snapshots, write_snapshot
+from .spill import SegmentStore
+from .stores import AtomicCounter, RetainedStore, ShardedStore, StoreListener
+
+logger = logging.getLogger(__name__)
+
+GROUPING_PENDING = 'pending'
+
+
+class Repository:
+    """
+    Storage interface used by the services layer for bills, intents,
+    interaction events, grouped intents and intent-to-group assignments.
+
+    Grouped intents are keyed by the string form of their id. Listeners
+    subscribed through `subscribe` are told about every grouped intent the
+    repository knows of, including ones written by other processes, once
+    `sync` has picked them up; subscribing does not query the database, so
+    it is safe at import time, before migrations have run. Listeners subscribed through
+    `subscribe_bills` see every stored bill and every bill this process
+    writes afterwards, with the replaced bill on upserts.
+    """
+
+    BILL_FIELDS = ('user_id', 'electricity_bill', 'water_bill', 'internet_bill', 'phone_bill')
+
+    def __init__(self):
+        self._listeners: List[StoreListener] = []
+        self._bill_listeners: List[StoreListener] = []
+        # Subscribed, but not yet told about the stored bills (see sync_bills)
+        self._unsynced_bill_listeners: List[StoreListener] = []
+        self._bills_sync_lock = threading.Lock()
+
+    # Listeners
+
+    def subscribe(self, listener: StoreListener) -> None:
+        self._listeners.append(listener)
+
+    def sync(self) -> None:
+        """Notify listeners about grouped intents created elsewhere"""
+
+    @property
+    def grouped_intents_version(self) -> int:
+        """Changes whenever the set of grouped intents changes"""
+        raise NotImplementedError
+
+    # Bills
+
+    def subscribe_bills(self, listener: StoreListener) -> None:
+        # The stored bills are replayed by the next sync_bills(), so subscribing never queries the database
+        with self._bills_sync_lock:
+            self._unsynced_bill_listeners.append(listener)
+
+    def sync_bills(self) -> None:
+        """Tell listeners subscribed since the last call about every stored bill; writes call it first"""
+        with self._bills_sync_lock:
+            listeners, self._unsynced_bill_listeners = self._unsynced_bill_listeners, []
+            if listeners:
+                for bill in self.all_bills():
+                    for listener in listeners:
+                        listener.on_set(bill['user_id'], bill)
+                self._bill_listeners.extend(listeners)
+
+    def all_bills(self) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def _notify_bills(self, bills: List[dict], previous: Dict[str, dict]) -> None:
+        # previous holds the stored bills that the batch overwrites
+        for bill in bills:
+            old = previous.get(bill['user_id'])
+            previous[bill['user_id']] = bill
+            for listener in self._bill_listeners:
+                if old is None:
+                    listener.on_set(bill['user_id'], bill)
+                else:
+                    listener.on_replace(bill['user_id'], old, bill)
+
+    def get_bill(self, user_id: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def save_bill(self, bill: dict) -> None:
+        raise NotImplementedError
+
+    def save_bills(self, bills: Iterable[dict]) -> None:
+        for bill in bills:
+            self.save_bill(bill)
+
+    # Intents
+
+    def create_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        """Store a new, ungrouped intent and its interaction events"""
+        raise NotImplementedError
+
+    def get_intent(self, intent_id: int) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update_intent(self, intent: dict) -> None:
+        """Persist the grouping fields of an intent"""
+        raise NotImplementedError
+
+    # Grouped intents
+
+    def create_grouped_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        raise NotImplementedError
+
+    def get_grouped_intent(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def increment_grouped_intent(self, grouped_intent: dict) -> dict:
+        """Atomically add one to the count of a grouped intent and return the updated grouped intent"""
+        raise NotImplementedError
+
+    # Assignments of normalized intent texts to grouped intents
+
+    def get_assignment(self, normalized_text: str) -> Optional[str]:
+        raise NotImplementedError
+
+    def set_assignment(self, normalized_text: str, key: str) -> None:
+        raise NotImplementedError
+
+    # Regrouping (see IntentService.regroup_intents)
+
+    def intent_groups(self) -> Iterator[Tuple[str, Optional[int]]]:
+        """(intent_text, grouped_intent_id) of every stored intent"""
+        raise NotImplementedError
+
+    def grouped_intent_summaries(self) -> Iterator[Tuple[str, str, int]]:
+        """(key, intent_text, count) of every grouped intent"""
+        raise NotImplementedError
+
+    def merge_grouped_intents(self, merges: Dict[str, List[str]]) -> None:
+        """
+        Fold the grouped intents listed under each key into the grouped
+        intent with that key, as one atomic change: counts are added up,
+        interaction events appended in list order, and the intents and
+        assignments of the merged grouped intents moved over before they
+        are deleted.
+        """
+        raise NotImplementedError
+
+    # Sizes, exported as metrics gauges
+
+    COLLECTIONS = ('bills', 'intents', 'interaction_events', 'grouped_intents', 'intent_assignments')
+
+    def sizes(self) -> Dict[str, int]:
+        """Number of stored items in each of COLLECTIONS"""
+        raise NotImplementedError
+
+    def retention_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Memory, eviction and spill figures of bounded collections; empty when nothing is bounded"""
+        return {}
+
+    def take_recovered_pending(self) -> List[int]:
+        """
+        Ids of the intents found pending grouping when the repository was
+        reopened, whose grouping was lost with the previous process; each
+        id is handed out once
+        """
+        return []
+
+
+def _intent_nbytes(intent: dict) -> int:
+    # The intent dict, its text and its event log; the events' rows are counted by the EventStore
+    events = intent['interaction_events']
+    events_bytes = events.nbytes() if isinstance(events, EventLog) else sys.getsizeof(events)
+    return sys.getsizeof(intent) + sys.getsizeof(intent['intent_text']) + events_bytes
+
+
+class IntentEvents(Mapping):
+    """Interaction events of every stored intent by intent id, read through from the intents store"""
+
+    def __init__(self, intents: Dict[int, dict]):
+        self._intents = intents
+
+    def __getitem__(self, intent_id: int) -> EventLog:
+        return self._intents[intent_id]['interaction_events']
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._intents)
+
+    def __len__(self) -> int:
+        return len(self._intents)
+
+    def clear(self) -> None:
+        """Clears the intents as well, since the events are theirs"""
+        self._intents.clear()
+
+
+class InMemoryRepository(Repository):
+    """
+    Process-local sharded stores; fastest, but lost on restart and not
+    shared between workers. Ids come from atomic counters and grouped
+    intents are copy-on-write snapshots: a count increment swaps in a new
+    dict instead of mutating the one readers may be holding. Interaction
+    events are kept in a columnar EventStore and handed out as EventLogs.
+
+    Memory can be bounded. Intents are then kept in a RetainedStore that
+    spills the least recently used ones to a SegmentStore in spill_dir (a
+    temporary directory by default) beyond intents_max_bytes, or once
+    unused for intents_ttl seconds; event chunks beyond events_max_bytes
+    are spilled too. Both are read back transparently. Intents pending
+    grouping and grouped intents always stay in memory, so group counts
+    are unaffected.
+    """
+
+    def __init__(self, shards: int = 16, event_chunk_size: int = 65536, intents_max_bytes: Optional[int] = None,
+                 intents_ttl: Optional[float] = None, events_max_bytes: Optional[int] = None,
+                 spill_dir: Optional[str] = None):
+        super().__init__()
+        bounded = any(limit is not None for limit in (intents_max_bytes, intents_ttl, events_max_bytes))
+        self.spill = SegmentStore(spill_dir) if bounded else None
+        self.events_max_bytes = events_max_bytes
+        self.events = EventStore(event_chunk_size)
+        self._bound_events()
+        self.bills: Dict[str, dict] = ShardedStore(shards)
+        if intents_max_bytes is not None or intents_ttl is not None:
+            self.intents: Dict[int, dict] = RetainedStore(
+                self.spill, self._encode_intent, self._decode_intent, _intent_nbytes, shards,
+                max_bytes=intents_max_bytes, ttl=intents_ttl,
+                evictable=lambda intent: intent['grouping_status'] != GROUPING_PENDING,
+            )
+        else:
+            self.intents = ShardedStore(shards)
+        self.grouped_intents: Dict[str, dict] = ShardedStore(shards, copy_on_write=True)
+        self.interaction_events = IntentEvents(self.intents)
+        self.assignments: Dict[str, str] = ShardedStore(shards)
+        # Key of a merged grouped intent -> key it was merged into
+        self.merged_into: Dict[str, str] = {}
+
+    def _bound_events(self) -> None:
+        if self.events_max_bytes is not None:
+            self.events.bound(self.events_max_bytes, self.spill)
+
+    def _encode_intent(self, intent: dict) -> bytes:
+        return dumps([intent['id'], intent['intent_text'], intent['grouping_status'], intent['grouped_intent_id'],
+                      *intent['interaction_events'].segments()])
+
+    def _decode_intent(self, payload: bytes) -> dict:
+        intent_id, intent_text, status, grouped_intent_id, starts, ends = loads(payload)
+        # Merges while the intent was spilled could not repoint it
+        if grouped_intent_id is not None and str(grouped_intent_id) in self.merged_into:
+            grouped_intent_id = int(self._resolve(str(grouped_intent_id)))
+        return {
+            'id': intent_id,
+            'intent_text': intent_text,
+            'interaction_events': EventLog.from_segments(self.events, starts, ends),
+            'grouping_status': status,
+            'grouped_intent_id': grouped_intent_id
+        }
+
+    def subscribe(self, listener: StoreListener) -> None:
+        # Listen on the store itself so direct writes to it are seen as well
+        self.grouped_intents.subscribe(listener)
+
+    @property
+    def grouped_intents_version(self) -> int:
+        # Count increments do not change the set of grouped intents
+        return self.grouped_intents.identity_version
+
+    def subscribe_bills(self, listener: StoreListener) -> None:
+        # Listen on the store so direct writes to it are seen as well
+        self.bills.subscribe(listener)
+
+    def all_bills(self) -> Iterator[dict]:
+        return iter(self.bills.values())
+
+    def get_bill(self, user_id: str) -> Optional[dict]:
+        return self.bills.get(user_id)
+
+    def save_bill(self, bill: dict) -> None:
+        self.bills[bill['user_id']] = bill
+
+    def save_bills(self, bills: Iterable[dict]) -> None:
+        self.bills.set_many((bill['user_id'], bill) for bill in bills)
+
+    def event_log(self, interaction_events: Iterable[dict] = ()) -> EventLog:
+        return EventLog(self.events, interaction_events)
+
+    def create_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        intent_id = self.intents.allocate_id()
+        interaction_events = self.event_log(interaction_events)
+        intent = {
+            'id': intent_id,
+            'intent_text': intent_text,
+            'interaction_events': interaction_events,
+            'grouping_status': GROUPING_PENDING,
+            'grouped_intent_id': None
+        }
+        self.intents[intent_id] = intent
+        return intent
+
+    def get_intent(self, intent_id: int) -> Optional[dict]:
+        return self.intents.get(intent_id)
+
+    def update_intent(self, intent: dict) -> None:
+        # Intents are stored by reference; a bounded store only needs to know it was used (and may have been spilled)
+        if isinstance(self.intents, RetainedStore):
+            self.intents.touch(intent['id'], intent)
+
+    def create_grouped_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        grouped_intent_id = self.grouped_intents.allocate_id(str)
+        grouped_intent = {
+            'id': grouped_intent_id,
+            'intent_text': intent_text,
+            'count': 1,
+            'interaction_events': self.event_log(interaction_events)
+        }
+        self.grouped_intents[str(grouped_intent_id)] = grouped_intent
+        return grouped_intent
+
+    def _resolve(self, key: str) -> str:
+        # Writers that looked a grouped intent up before it was merged land on the one it was merged into
+        while key not in self.grouped_intents and key in self.merged_into:
+            key = self.merged_into[key]
+        return key
+
+    def get_grouped_intent(self, key: str) -> Optional[dict]:
+        return self.grouped_intents.get(self._resolve(key))
+
+    def increment_grouped_intent(self, grouped_intent: dict) -> dict:
+        return self.grouped_intents.compute(
+            self._resolve(str(grouped_intent['id'])), lambda current: {**current, 'count': current['count'] + 1}
+        )
+
+    def get_assignment(self, normalized_text: str) -> Optional[str]:
+        return self.assignments.get(normalized_text)
+
+    def set_assignment(self, normalized_text: str, key: str) -> None:
+        self.assignments[normalized_text] = key
+
+    def intent_groups(self) -> Iterator[Tuple[str, Optional[int]]]:
+        for intent in self.intents.values():
+            yield intent['intent_text'], intent['grouped_intent_id']
+
+    def grouped_intent_summaries(self) -> Iterator[Tuple[str, str, int]]:
+        for key, grouped_intent in self.grouped_intents.items():
+            yield key, grouped_intent['intent_text'], grouped_intent['count']
+
+    def _joined_events(self, logs: List[Any]) -> EventLog:
+        if all(isinstance(log, EventLog) for log in logs):
+            return EventLog.joined(logs)
+        return self.event_log(itertools.chain.from_iterable(logs))
+
+    def merge_grouped_intents(self, merges: Dict[str, List[str]]) -> None:
+        if not merges:
+            return
+        targets = {merged: key for key, keys in merges.items() for merged in keys}
+
+        def merge(current: Dict[str, dict]) -> Dict[str, dict]:
+            updated = {}
+            for key, keys in merges.items():
+                grouped_intents = [current[key], *(current[merged] for merged in keys)]
+                updated[key] = {
+                    **current[key],
+                    'count': sum(grouped_intent['count'] for grouped_intent in grouped_intents),
+                    'interaction_events': self._joined_events(
+                        [grouped_intent['interaction_events'] for grouped_intent in grouped_intents]
+                    ),
+                }
+            return updated
+
+        # Repoint assignments first: deleting a grouped intent drops the assignments still pointing at it
+        self.assignments.set_many(
+            (text, targets[key]) for text, key in self.assignments.items() if key in targets
+        )
+        self.merged_into.update(targets)
+        self.grouped_intents.transform([*merges, *targets], merge)
+        for intent in self.intents.values():
+            key = str(intent['grouped_intent_id'])
+            if key in targets:
+                intent['grouped_intent_id'] = int(targets[key])
+
+    def sizes(self) -> Dict[str, int]:
+        return {
+            'bills': len(self.bills),
+            'intents': len(self.intents),
+            # Rows in the shared event store, including those of grouped intents
+            'interaction_events': len(self.events),
+            'grouped_intents': len(self.grouped_intents),
+            'intent_assignments': len(self.assignments),
+        }
+
+    def retention_stats(self) -> Dict[str, Dict[str, Any]]:
+        if self.spill is None:
+            return {}
+        stats = {'interaction_events': self.events.stats(), 'spill': self.spill.stats()}
+        if isinstance(self.intents, RetainedStore):
+            stats['intents'] = self.intents.stats()
+        return stats
+
+    def close(self) -> None:
+        if isinstance(self.intents, RetainedStore):
+            self.intents.close()
+        if self.spill is not None:
+            self.spill.close()
+
+
+class PersistentRepository(InMemoryRepository):
+    """
+    InMemoryRepository that survives restarts. Every write is appended to a
+    write-ahead log in `path` before it returns, and every `snapshot_every`
+    log records a background thread writes a snapshot of the whole state
+    and deletes the log segments it covers. Startup maps the newest
+    snapshot (event columns are used in place, not read and copied) and
+    replays the log records written after it.
+
+    Writes are applied and logged under one lock, so the log order is the
+    apply order, and wait for their fsync outside it, so concurrent writers
+    share fsyncs (see WriteAheadLog). Writes made directly to the stores
+    bypass the log and are not persisted.
+    """
+
+    def __init__(self, path: str, sync: str = 'group', snapshot_every: int = 100000,
+                 shards: int = 16, event_chunk_size: int = 65536, **retention):
+        super().__init__(shards, event_chunk_size, **retention)
+        self.path = str(path)
+        self.snapshot_every = snapshot_every
+        self.wal = WriteAheadLog(os.path.join(self.path, 'wal'), sync=sync)
+        self._write_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._since_snapshot = 0
+        self._recover()
+
+    # Recovery
+
+    def _recover(self) -> None:
+        # Recovery allocates millions of objects that all stay alive, so
+        # cyclic GC passes over them would find nothing while taking most
+        # of the time
+        enabled = gc.isenabled()
+        gc.disable()
+        try:
+            lsn = 0
+            found = snapshots(self.path)
+            if found:
+                lsn, path = found[-1]
+                self._load_snapshot(path)
+            for _, record in self.wal.replay(lsn):
+                self._apply(record)
+                self._since_snapshot += 1
+        finally:
+            if enabled:
+                gc.enable()
+        for store in (self.intents, self.grouped_intents):
+            store.ids = AtomicCounter(max((int(key) for key in store.keys()), default=0) + 1)
+        # Pending intents are never spilled, so the resident ones are all of them
+        intents = self.intents.resident_values() if isinstance(self.intents, RetainedStore) else self.intents.values()
+        self._recovered_pending = sorted(
+            intent['id'] for intent in intents if intent['grouping_status'] == GROUPING_PENDING
+        )
+
+    def take_recovered_pending(self) -> List[int]:
+        recovered, self._recovered_pending = self._recovered_pending, []
+        return recovered
+
+    def _load_snapshot(self, path: str) -> None:
+        meta, chunks = read_snapshot(path)
+        self.events = EventStore.restore(meta['chunk_size'], meta['strings'], chunks)
+        self._bound_events()
+        log = lambda starts, ends: EventLog.from_segments(self.events, starts, ends)
+        self.bills.set_many((bill['user_id'], bill) for bill in meta['bills'])
+        intents = []
+        for intent_id, intent_text, status, grouped_intent_id, starts, ends in meta['intents']:
+            intents.append(self._intent(intent_id, intent_text, log(starts, ends), status, grouped_intent_id))
+        self.intents.set_many((intent['id'], intent) for intent in intents)
+        self.grouped_intents.set_many(
+            (str(grouped_intent_id), self._grouped_intent(grouped_intent_id, intent_text, log(starts, ends), count))
+            for grouped_intent_id, intent_text, count, starts, ends in meta['grouped_intents']
+        )
+        self.assignments.set_many(meta['assignments'])
+        self.merged_into.update(meta['merged_into'])
+
+    @staticmethod
+    def _intent(intent_id: int, intent_text: str, interaction_events: EventLog,
+                status: str = GROUPING_PENDING, grouped_intent_id: Optional[int] = None) -> dict:
+        return {
+            'id': intent_id,
+            'intent_text': intent_text,
+            'interaction_events': interaction_events,
+            'grouping_status': status,
+            'grouped_intent_id': grouped_intent_id
+        }
+
+    @staticmethod
+    def _grouped_intent(grouped_intent_id: int, intent_text: str, interaction_events: EventLog, count: int = 1) -> dict:
+        return {
+            'id': grouped_intent_id,
+            'intent_text': intent_text,
+            'count': count,
+            'interaction_events': interaction_events
+        }
+
+    def _apply(self, record: list) -> None:
+        kind, *args = record
+        if kind == 'bills':
+            super().save_bills(args[0])
+        elif kind == 'intent':
+            intent_id, intent_text, interaction_events = args
+            intent = self._intent(intent_id, intent_text, self.event_log(interaction_events))
+            self.intents[intent_id] = intent
+        elif kind == 'intent_update':
+            intent_id, status, grouped_intent_id = args
+            intent = self.intents.get(intent_id)
+            if intent is not None:
+                intent['grouping_status'] = status
+                intent['grouped_intent_id'] = grouped_intent_id
+        elif kind == 'group':
+            grouped_intent_id, intent_text, interaction_events = args
+            self.grouped_intents[str(grouped_intent_id)] = self._grouped_intent(
+                grouped_intent_id, intent_text, self.event_log(interaction_events)
+            )
+        elif kind == 'group_count':
+            key, count = args
+            if key in self.grouped_intents:
+                self.grouped_intents.compute(key, lambda current: {**current, 'count': count})
+        elif kind == 'assign':
+            super().set_assignment(*args)
+        elif kind == 'merge':
+            super().merge_grouped_intents(args[0])
+        else:
+            raise ValueError(f"Unknown log record: {kind}")
+
+    # Logged writes
+
+    def _log(self, record: list) -> int:
+        # Called with _write_lock held
+        self._since_snapshot += 1
+        return self.wal.append(record)
+
+    def _commit(self, lsn: int) -> None:
+        self.wal.wait_durable(lsn)
+        if self.snapshot_every and self._since_snapshot >= self.snapshot_every \
+                and self._snapshot_lock.acquire(blocking=False):
+            threading.Thread(target=self._background_snapshot, name='luma-snapshot', daemon=True).start()
+
+    def save_bill(self, bill: dict) -> None:
+        self.save_bills([bill])
+
+    def save_bills(self, bills: Iterable[dict]) -> None:
+        bills = list(bills)
+        with self._write_lock:
+            super().save_bills(bills)
+            lsn = self._log(['bills', bills])
+        self._commit(lsn)
+
+    def create_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        interaction_events = list(interaction_events)
+        with self._write_lock:
+            intent = super().create_intent(intent_text, interaction_events)
+            lsn = self._log(['intent', intent['id'], intent_text, interaction_events])
+        self._commit(lsn)
+        return intent
+
+    def update_intent(self, intent: dict) -> None:
+        with self._write_lock:
+            super().update_intent(intent)
+            lsn = self._log(['intent_update', intent['id'], intent['grouping_status'], intent['grouped_intent_id']])
+        self._commit(lsn)
+
+    def create_grouped_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        interaction_events = list(interaction_events)
+        with self._write_lock:
+            grouped_intent = super().create_grouped_intent(intent_text, interaction_events)
+            lsn = self._log(['group', grouped_intent['id'], intent_text, interaction_events])
+        self._commit(lsn)
+        return grouped_intent
+
+    def increment_grouped_intent(self, grouped_intent: dict) -> dict:
+        with self._write_lock:
+            grouped_intent = super().increment_grouped_intent(grouped_intent)
+            # The new count rather than the increment, so replaying a record twice is harmless
+            lsn = self._log(['group_count', str(grouped_intent['id']), grouped_intent['count']])
+        self._commit(lsn)
+        return grouped_intent
+
+    def set_assignment(self, normalized_text: str, key: str) -> None:
+        with self._write_lock:
+            super().set_assignment(normalized_text, key)
+            lsn = self._log(['assign', normalized_text, key])
+        self._commit(lsn)
+
+    def merge_grouped_intents(self, merges: Dict[str, List[str]]) -> None:
+        with self._write_lock:
+            super().merge_grouped_intents(merges)
+            lsn = self._log(['merge', merges])
+        self._commit(lsn)
+
+    # Snapshots
+
+    def _background_snapshot(self) -> None:
+        # _commit() acquired the snapshot lock for this thread
+        try:
+            self._snapshot()
+        except Exception:
+            logger.exception('Snapshot of %s failed', self.path)
+        finally:
+            self._snapshot_lock.release()
+
+    def snapshot(self) -> int:
+        """Write a snapshot of the current state, delete the log and snapshots it replaces and return its LSN"""
+        with self._snapshot_lock:
+            return self._snapshot()
+
+    def _snapshot(self) -> int:
+        with self._write_lock:
+            # Writes are held off only while the stores are copied; encoding happens afterwards
+            lsn = self.wal.rotate()
+            self._since_snapshot = 0
+            events = self.events
+            event_count, string_count = len(events), len(events.interner)
+            bills = list(self.bills.values())
+            intents = list(self.intents.values())
+            grouped_intents = list(self.grouped_intents.values())
+            assignments = list(self.assignments.items())
+            merged_into = dict(self.merged_into)
+        meta = {
+            'lsn': lsn,
+            'chunk_size': events.chunk_size,
+            'strings': events.interner.strings(string_count),
+            'bills': bills,
+            'intents': [
+                [intent['id'], intent['intent_text'], intent['grouping_status'], intent['grouped_intent_id'],
+                 *intent['interaction_events'].segments()]
+                for intent in intents
+            ],
+            'grouped_intents': [
+                [grouped_intent['id'], grouped_intent['intent_text'], grouped_intent['count'],
+                 *grouped_intent['interaction_events'].segments()]
+                for grouped_intent in grouped_intents
+            ],
+            'assignments': assignments,
+            'merged_into': merged_into,
+        }
+        write_snapshot(snapshot_path(self.path, lsn), meta, events.export(event_count), sync=self.wal.sync != 'none')
+        self.wal.discard_through(lsn)
+        for older, path in snapshots(self.path):
+            if older < lsn:
+                os.remove(path)
+        return lsn
+
+    def close(self) -> None:
+        self.wal.close()
+        super().close()
+
+
+class SQLiteRepository(Repository):
+    """
+    SQLite file shared by every worker process on the host. Runs in WAL
+    mode so readers never block the writer, keeps one connection per thread
+    (the sqlite3 module caches their prepared statements) and writes
+    multi-row data such as interaction events and bill batches in a single
+    transaction with executemany.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS bills (
+            user_id TEXT PRIMARY KEY,
+            electricity_bill TEXT NOT NULL,
+            water_bill TEXT NOT NULL,
+            internet_bill TEXT NOT NULL,
+            phone_bill TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS intents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            intent_text TEXT NOT NULL,
+            grouping_status TEXT NOT NULL,
+            grouped_intent_id INTEGER
+        );
+        CREATE TABLE IF NOT EXISTS interaction_events (
+            intent_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            event TEXT NOT NULL,
+            PRIMARY KEY (intent_id, position)
+        );
+        CREATE TABLE IF NOT EXISTS grouped_intents (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            intent_text TEXT NOT NULL,
+            count INTEGER NOT NULL,
+            interaction_events TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS intent_assignments (
+            normalized_text TEXT PRIMARY KEY,
+            grouped_intent_id INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL
+        );
+        -- Files written before the counter existed start from their highest grouped intent id
+        INSERT OR IGNORE INTO counters SELECT 'grouped_intents_version', COALESCE(MAX(id), 0) FROM grouped_intents;
+    """
+
+    # Run in the transaction of every write that adds or removes grouped intents
+    BUMP_VERSION = "UPDATE counters SET value = value + 1 WHERE name = 'grouped_intents_version'"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = str(path)
+        self._local = threading.local()
+        self._sync_lock = threading.Lock()
+        self._synced_id = 0
+        self._connection().executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None, cached_statements=256)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute('PRAGMA busy_timeout=30000')
+            self._local.connection = connection
+        return connection
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    @staticmethod
+    def _grouped_intent(row: Any) -> dict:
+        return {
+            'id': row[0],
+            'intent_text': row[1],
+            'count': row[2],
+            'interaction_events': json.loads(row[3])
+        }
+
+    def sync(self) -> None:
+        with self._sync_lock:
+            rows = self._connection().execute(
+                'SELECT id, intent_text, count, interaction_events FROM grouped_intents WHERE id > ? ORDER BY id',
+                (self._synced_id,)
+            ).fetchall()
+            for row in rows:
+                grouped_intent = self._grouped_intent(row)
+                for listener in self._listeners:
+                    listener.on_set(str(grouped_intent['id']), grouped_intent)
+                self._synced_id = grouped_intent['id']
+
+    @property
+    def grouped_intents_version(self) -> int:
+        row = self._connection().execute(
+            "SELECT value FROM counters WHERE name = 'grouped_intents_version'"
+        ).fetchone()
+        return row[0] if row else 0
+
+    def get_bill(self, user_id: str) -> Optional[dict]:
+        row = self._connection().execute(
+            'SELECT user_id, electricity_bill, water_bill, internet_bill, phone_bill FROM bills WHERE user_id = ?',
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(self.BILL_FIELDS, row))
+
+    def all_bills(self) -> Iterator[dict]:
+        for row in self._connection().execute(
+            'SELECT user_id, electricity_bill, water_bill, internet_bill, phone_bill FROM bills'
+        ):
+            yield dict(zip(self.BILL_FIELDS, row))
+
+    def save_bill(self, bill: dict) -> None:
+        self.save_bills([bill])
+
+    def save_bills(self, bills: Iterable[dict]) -> None:
+        self.sync_bills()
+        bills = list(bills)
+        rows = [
+            (bill['user_id'], bill['electricity_bill'], bill['water_bill'], bill['internet_bill'], bill['phone_bill'])
+            for bill in bills
+        ]
+        previous: Dict[str, dict] = {}
+        with self._transaction() as connection:
+            if self._bill_listeners:
+                user_ids = list({row[0] for row in rows})
+                # Stay below SQLite's bound parameter limit
+                for start in range(0, len(user_ids), 500):
+                    chunk = user_ids[start:start + 500]
+                    for row in connection.execute(
+                        'SELECT user_id, electricity_bill, water_bill, internet_bill, phone_bill FROM bills '
+                        f"WHERE user_id IN ({', '.join('?' * len(chunk))})", chunk
+                    ):
+                        previous[row[0]] = dict(zip(self.BILL_FIELDS, row))
+            connection.executemany('INSERT OR REPLACE INTO bills VALUES (?, ?, ?, ?, ?)', rows)
+        self._notify_bills(bills, previous)
+
+    def create_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO intents (intent_text, grouping_status) VALUES (?, ?)',
+                (intent_text, GROUPING_PENDING)
+            )
+            intent_id = cursor.lastrowid
+            connection.executemany(
+                'INSERT INTO interaction_events (intent_id, position, event) VALUES (?, ?, ?)',
+                [(intent_id, position, json.dumps(event)) for position, event in enumerate(interaction_events)]
+            )
+        return {
+            'id': intent_id,
+            'intent_text': intent_text,
+            'interaction_events': interaction_events,
+            'grouping_status': GROUPING_PENDING,
+            'grouped_intent_id': None
+        }
+
+    def get_intent(self, intent_id: int) -> Optional[dict]:
+        connection = self._connection()
+        row = connection.execute(
+            'SELECT id, intent_text, grouping_status, grouped_intent_id FROM intents WHERE id = ?', (intent_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        events = connection.execute(
+            'SELECT event FROM interaction_events WHERE intent_id = ? ORDER BY position', (intent_id,)
+        ).fetchall()
+        return {
+            'id': row[0],
+            'intent_text': row[1],
+            'interaction_events': [json.loads(event) for event, in events],
+            'grouping_status': row[2],
+            'grouped_intent_id': row[3]
+        }
+
+    def update_intent(self, intent: dict) -> None:
+        with self._transaction() as connection:
+            connection.execute(
+                'UPDATE intents SET grouping_status = ?, grouped_intent_id = ? WHERE id = ?',
+                (intent['grouping_status'], intent['grouped_intent_id'], intent['id'])
+            )
+
+    def create_grouped_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                'INSERT INTO grouped_intents (intent_text, count, interaction_events) VALUES (?, 1, ?)',
+                (intent_text, json.dumps(interaction_events))
+            )
+            connection.execute(self.BUMP_VERSION)
+        self.sync()
+        return {
+            'id': cursor.lastrowid,
+            'intent_text': intent_text,
+            'count': 1,
+            'interaction_events': interaction_events.copy()
+        }
+
+    def get_grouped_intent(self, key: str) -> Optional[dict]:
+        row = self._connection().execute(
+            'SELECT id, intent_text, count, interaction_events FROM grouped_intents WHERE id = ?', (int(key),)
+        ).fetchone()
+        return self._grouped_intent(row) if row is not None else None
+
+    def increment_grouped_intent(self, grouped_intent: dict) -> dict:
+        with self._transaction() as connection:
+            connection.execute('UPDATE grouped_intents SET count = count + 1 WHERE id = ?', (grouped_intent['id'],))
+            count = connection.execute(
+                'SELECT count FROM grouped_intents WHERE id = ?', (grouped_intent['id'],)
+            ).fetchone()[0]
+        return {**grouped_intent, 'count': count}
+
+    def get_assignment(self, normalized_text: str) -> Optional[str]:
+        row = self._connection().execute(
+            'SELECT grouped_intent_id FROM intent_assignments WHERE normalized_text = ?', (normalized_text,)
+        ).fetchone()
+        return str(row[0]) if row is not None else None
+
+    def set_assignment(self, normalized_text: str, key: str) -> None:
+        with self._transaction() as connection:
+            connection.execute('INSERT OR REPLACE INTO intent_assignments VALUES (?, ?)', (normalized_text, int(key)))
+
+    def intent_groups(self) -> Iterator[Tuple[str, Optional[int]]]:
+        yield from self._connection().execute('SELECT intent_text, grouped_intent_id FROM intents')
+
+    def grouped_intent_summaries(self) -> Iterator[Tuple[str, str, int]]:
+        for row in self._connection().execute('SELECT id, intent_text, count FROM grouped_intents'):
+            yield str(row[0]), row[1], row[2]
+
+    def merge_grouped_intents(self, merges: Dict[str, List[str]]) -> None:
+        if not merges:
+            return
+        deleted: List[Tuple[str, dict]] = []
+        updated: List[dict] = []
+        with self._transaction() as connection:
+            connection.execute(self.BUMP_VERSION)
+            for key, keys in merges.items():
+                ids = [int(key), *(int(merged) for merged in keys)]
+                rows: Dict[int, Any] = {}
+                # Stay below SQLite's bound parameter limit
+                for start in range(0, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    for row in connection.execute(
+                        'SELECT id, intent_text, count, interaction_events FROM grouped_intents '
+                        f"WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                    ):
+                        rows[row[0]] = self._grouped_intent(row)
+                grouped_intents = [rows[grouped_intent_id] for grouped_intent_id in ids]
+                merged = {
+                    **grouped_intents[0],
+                    'count': sum(grouped_intent['count'] for grouped_intent in grouped_intents),
+                    'interaction_events': [
+                        event for grouped_intent in grouped_intents for event in grouped_intent['interaction_events']
+                    ],
+                }
+                connection.execute(
+                    'UPDATE grouped_intents SET count = ?, interaction_events = ? WHERE id = ?',
+                    (merged['count'], json.dumps(merged['interaction_events']), ids[0])
+                )
+                for start in range(1, len(ids), 500):
+                    chunk = ids[start:start + 500]
+                    placeholders = ', '.join('?' * len(chunk))
+                    connection.execute(
+                        f"UPDATE intents SET grouped_intent_id = ? WHERE grouped_intent_id IN ({placeholders})",
+                        [ids[0], *chunk]
+                    )
+                    connection.execute(
+                        f"UPDATE intent_assignments SET grouped_intent_id = ? WHERE grouped_intent_id IN ({placeholders})",
+                        [ids[0], *chunk]
+                    )
+                    connection.execute(f"DELETE FROM grouped_intents WHERE id IN ({placeholders})", chunk)
+                deleted.extend((str(grouped_intent['id']), grouped_intent) for grouped_intent in grouped_intents[1:])
+                updated.append(merged)
+        for listener in self._listeners:
+            for key, grouped_intent in deleted:
+                listener.on_delete(key, grouped_intent)
+            for grouped_intent in updated:
+                listener.on_set(str(grouped_intent['id']), grouped_intent)
+
+    def sizes(self) -> Dict[str, int]:
+        counts = ', '.join(f"(SELECT count(*) FROM {table})" for table in self.COLLECTIONS)
+        return dict(zip(self.COLLECTIONS, self._connection().execute(f"SELECT {counts}").fetchone()))
+
+
+class ORMRepository(Repository):
+    """
+    Django ORM on the api models (see api/migrations). Interaction events of
+    intents are stored as InteractionEvent rows, so only the documented event
+    fields (timestamp, view_id, view_resource_name, screen_name, action_type)
+    are kept for them.
+    """
+
+    EVENT_FIELDS = ('timestamp', 'view_id', 'view_resource_name', 'screen_name', 'action_type')
+
+    def __init__(self):
+        super().__init__()
+        self._sync_lock = threading.Lock()
+        self._synced_id = 0
+
+    @staticmethod
+    def _grouped_intent(model: Any) -> dict:
+        return {
+            'id': model.pk,
+            'intent_text': model.intent_texts[0] if model.intent_texts else '',
+            'count': model.count,
+            'interaction_events': model.interaction_events
+        }
+
+    @staticmethod
+    def _integer(value: Any) -> int:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+    def sync(self) -> None:
+        with self._sync_lock:
+            for model in GroupedIntent.objects.filter(pk__gt=self._synced_id).order_by('pk'):
+                grouped_intent = self._grouped_intent(model)
+                for listener in self._listeners:
+                    listener.on_set(str(model.pk), grouped_intent)
+                self._synced_id = model.pk
+
+    @property
+    def grouped_intents_version(self) -> int:
+        counters = Counter.objects.filter(name=Counter.GROUPED_INTENTS_VERSION)
+        return counters.values_list('value', flat=True).first() or 0
+
+    @staticmethod
+    def _bump_version() -> None:
+        # Called inside the transaction of every write that adds or removes grouped intents
+        if not Counter.objects.filter(name=Counter.GROUPED_INTENTS_VERSION).update(value=F('value') + 1):
+            Counter.objects.create(name=Counter.GROUPED_INTENTS_VERSION, value=1)
+
+    def get_bill(self, user_id: str) -> Optional[dict]:
+        values = Bill.objects.filter(user_id=user_id).values(
+            'user_id', 'electricity_bill', 'water_bill', 'internet_bill', 'phone_bill'
+        ).first()
+        if values is None:
+            return None
+        return self._bill(values)
+
+    @staticmethod
+    def _bill(values: dict) -> dict:
+        return {key: value if key == 'user_id' else f"{value:.2f}" for key, value in values.items()}
+
+    def all_bills(self) -> Iterator[dict]:
+        for values in Bill.objects.values(*self.BILL_FIELDS).iterator():
+            yield self._bill(values)
+
+    def _previous_bills(self, user_ids: List[str]) -> Dict[str, dict]:
+        if not self._bill_listeners:
+            return {}
+        return {
+            values['user_id']: self._bill(values)
+            for values in Bill.objects.filter(user_id__in=user_ids).values(*self.BILL_FIELDS)
+        }
+
+    def save_bill(self, bill: dict) -> None:
+        self.sync_bills()
+        with transaction.atomic():
+            previous = self._previous_bills([bill['user_id']])
+            Bill.objects.update_or_create(
+                user_id=bill['user_id'],
+                defaults={key: value for key, value in bill.items() if key != 'user_id'}
+            )
+        self._notify_bills([bill], previous)
+
+    def save_bills(self, bills: Iterable[dict]) -> None:
+        self.sync_bills()
+        bills = list(bills)
+        with transaction.atomic():
+            previous = self._previous_bills(list({bill['user_id'] for bill in bills}))
+            # One upsert statement per batch instead of a query pair per bill
+            Bill.objects.bulk_create(
+                [Bill(**bill) for bill in bills],
+                update_conflicts=True,
+                unique_fields=['user_id'],
+                update_fields=['electricity_bill', 'water_bill', 'internet_bill', 'phone_bill', 'updated_at']
+            )
+        self._notify_bills(bills, previous)
+
+    def create_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        with transaction.atomic():
+            model = Intent.objects.create(intent_id=uuid.uuid4().hex, intent_text=intent_text)
+            InteractionEvent.objects.bulk_create([self._event_model(model, event) for event in interaction_events])
+        return {
+            'id': model.pk,
+            'intent_text': intent_text,
+            'interaction_events': interaction_events,
+            'grouping_status': GROUPING_PENDING,
+            'grouped_intent_id': None
+        }
+
+    def _event_model(self, intent: Intent, event: Any) -> InteractionEvent:
+        if not isinstance(event, dict):
+            return InteractionEvent(intent=intent, timestamp=0, view_id=0, raw=[event])
+        return InteractionEvent(
+            intent=intent,
+            timestamp=self._integer(event.get('timestamp')),
+            view_id=self._integer(event.get('view_id')),
+            view_resource_name=event.get('view_resource_name', ''),
+            screen_name=event.get('screen_name', ''),
+            action_type=event.get('action_type', '')
+        )
+
+    def _events(self, intent: Intent) -> List[Any]:
+        events = []
+        for row in intent.interaction_events.order_by('pk').values(*self.EVENT_FIELDS, 'raw'):
+            raw = row.pop('raw')
+            events.append(raw[0] if raw is not None else row)
+        return events
+
+    def get_intent(self, intent_id: int) -> Optional[dict]:
+        model = Intent.objects.filter(pk=intent_id).first()
+        if model is None:
+            return None
+        return {
+            'id': model.pk,
+            'intent_text': model.intent_text,
+            'interaction_events': self._events(model),
+            'grouping_status': model.grouping_status,
+            'grouped_intent_id': model.grouped_intent_id
+        }
+
+    def update_intent(self, intent: dict) -> None:
+        Intent.objects.filter(pk=intent['id']).update(
+            grouping_status=intent['grouping_status'],
+            grouped_intent_id=intent['grouped_intent_id'],
+            is_grouped=intent['grouped_intent_id'] is not None
+        )
+
+    def create_grouped_intent(self, intent_text: str, interaction_events: List[dict]) -> dict:
+        with transaction.atomic():
+            model = GroupedIntent.objects.create(
+                grouped_intent_id=uuid.uuid4().hex,
+                intent_texts=[intent_text],
+                interaction_events=interaction_events.copy()
+            )
+            self._bump_version()
+        self.sync()
+        return self._grouped_intent(model)
+
+    def get_grouped_intent(self, key: str) -> Optional[dict]:
+        model = GroupedIntent.objects.filter(pk=int(key)).first()
+        return self._grouped_intent(model) if model is not None else None
+
+    def increment_grouped_intent(self, grouped_intent: dict) -> dict:
+        GroupedIntent.objects.filter(pk=grouped_intent['id']).update(count=F('count') + 1)
+        count = GroupedIntent.objects.values_list('count', flat=True).get(pk=grouped_intent['id'])
+        return {**grouped_intent, 'count': count}
+
+    def get_assignment(self, normalized_text: str) -> Optional[str]:
+        grouped_intent_id = IntentAssignment.objects.filter(
+            normalized_text=normalized_text
+        ).values_list('grouped_intent_id', flat=True).first()
+        return str(grouped_intent_id) if grouped_intent_id is not None else None
+
+    def set_assignment(self, normalized_text: str, key: str) -> None:
+        IntentAssignment.objects.update_or_create(
+            normalized_text=normalized_text, defaults={'grouped_intent_id': int(key)}
+        )
+
+    def intent_groups(self) -> Iterator[Tuple[str, Optional[int]]]:
+        yield from Intent.objects.values_list('intent_text', 'grouped_intent_id').iterator()
+
+    def grouped_intent_summaries(self) -> Iterator[Tuple[str, str, int]]:
+        for model in GroupedIntent.objects.only('intent_texts', 'count').iterator():
+            yield str(model.pk), model.intent_texts[0] if model.intent_texts else '', model.count
+
+    def merge_grouped_intents(self, merges: Dict[str, List[str]]) -> None:
+        if not merges:
+            return
+        deleted: List[Tuple[str, dict]] = []
+        updated: List[dict] = []
+        with transaction.atomic():
+            self._bump_version()
+            for key, keys in merges.items():
+                ids = [int(key), *(int(merged) for merged in keys)]
+                models = GroupedIntent.objects.select_for_update().in_bulk(ids)
+                target = models[ids[0]]
+                for merged_id in ids[1:]:
+                    model = models[merged_id]
+                    target.count += model.count
+                    target.interaction_events = target.interaction_events + model.interaction_events
+                    target.intent_texts = target.intent_texts + [
+                        text for text in model.intent_texts if text not in target.intent_texts
+                    ]
+                    deleted.append((str(merged_id), self._grouped_intent(model)))
+                target.save(update_fields=['count', 'interaction_events', 'intent_texts', 'updated_at'])
+                Intent.objects.filter(grouped_intent_id__in=ids[1:]).update(grouped_intent_id=ids[0])
+                IntentAssignment.objects.filter(grouped_intent_id__in=ids[1:]).update(grouped_intent_id=ids[0])
+                GroupedIntent.objects.filter(pk__in=ids[1:]).delete()
+                updated.append(self._grouped_intent(target))
+        for listener in self._listeners:
+            for key, grouped_intent in deleted:
+                listener.on_delete(key, grouped_intent)
+            for grouped_intent in updated:
+                listener.on_set(str(grouped_intent['id']), grouped_intent)
+
+    def sizes(self) -> Dict[str, int]:
+        models = (Bill, Intent, InteractionEvent, GroupedIntent, IntentAssignment)
+        return {collection: model.objects.count() for collection, model in zip(self.COLLECTIONS, models)}
+
+
+def build_repository(config: Dict[str, Any]) -> Repository:
+    """Create a repository from a settings dict such as settings.REPOSITORY"""
+    backend = config.get('BACKEND', 'memory')
+    if backend == 'memory':
+        retention = dict(
+            intents_max_bytes=config.get('INTENTS_MAX_BYTES'),
+            intents_ttl=config.get('INTENTS_TTL'),
+            events_max_bytes=config.get('EVENTS_MAX_BYTES'),
+            spill_dir=config.get('SPILL_DIR'),
+        )
+        if config.get('PERSIST_DIR'):
+            return PersistentRepository(
+                config['PERSIST_DIR'],
+                sync=config.get('WAL_SYNC', 'group'),
+                snapshot_every=config.get('SNAPSHOT_EVERY', 100000),
+                event_chunk_size=config.get('EVENT_CHUNK_SIZE', 65536),
+                **retention
+            )
+        return InMemoryRepository(event_chunk_size=config.get('EVENT_CHUNK_SIZE', 65536), **retention)
+    if backend == 'sqlite':
+        return SQLiteRepository(config['PATH'])
+    if backend == 'orm':
+        if settings.DATABASES['default'].get('NAME') == ':memory:':
+            # Every process would get an empty, unmigrated database of its own
+            raise ImproperlyConfigured("The 'orm' repository needs a persistent DATABASES['default'], migrated")
+        return ORMRepository()
+    raise ValueError(f"Unknown repository backend: {backend}")
@@ -1,161 +1,259 @@
-from datetime import datetime
-from typing import Dict, List, Optional
-import os
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import re
+import math
+import time
+import asyncio
 import logging
-from openai import OpenAI
-from dotenv import load_dotenv
+from django.conf import settings
+from .aggregates import BillAggregates
+from .backend import call_repository, repository
+from .cache import LRUTTLCache
+from .conditional import version_etag
+from .indexes import bill_versions, grouped_intent_indexes, grouped_intent_versions, intent_ranking, interaction_paths
+from .intent_grouping import (assign_to_group, group_intent, group_intents, grouping_pipeline, intent_batcher,
+                              regroup_intents)
+from .logs import SAMPLED
+from .pagination import iter_events, paginate_events, resume_position
+from .repositories import InMemoryRepository
+from .similarity import find_most_similar_intent, find_most_similar_intent_async
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Handlers and levels come from settings.LOGGING
 logger = logging.getLogger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Running per-category bill totals and quantiles, kept up to date on every upsert
+bill_stats = BillAggregates(getattr(settings, 'BILL_STATS_RELATIVE_ACCURACY', 0.01))
+repository.subscribe_bills(bill_stats)
 
-# Initialize OpenAI client
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+def get_bill_stats() -> Dict[str, Any]:
+    # Bill listeners are hydrated on first use, not at import time (the bills table may not exist yet)
+    repository.sync_bills()
+    return bill_stats.stats()
 
-# In-memory repositories
-bills_repository: Dict[str, dict] = {}
-intents_repository: Dict[int, dict] = {}
-grouped_intents_repository: Dict[str, dict] = {}
-interaction_events_repository: Dict[int, List[dict]] = {}
+
+# Versions only see writes made by this process, so they are trusted with the
+# in-memory repository only; shared backends fall back to ETags hashed from the
+# response body (ConditionalGetMiddleware).
+_versions_trusted = isinstance(repository, InMemoryRepository)
+_version_trackers = {'bill': bill_versions, 'grouped_intent': grouped_intent_versions}
+
+def _build_response_cache(config: Dict[str, Any]) -> Optional[LRUTTLCache]:
+    if not config.get('ENABLED', True) or not _versions_trusted:
+        return None
+    return LRUTTLCache(max_entries=config.get('MAX_ENTRIES', 10000), ttl=config.get('TTL', 3600))
+
+# Already encoded response bodies keyed by ETag and media type
+response_cache = _build_response_cache(getattr(settings, 'RESPONSE_CACHE', {}))
+
+def response_etag(namespace: str, key: Any, params: Iterable = ()) -> Optional[str]:
+    """Version-based ETag for a bill or grouped intent, or None when versions cannot be trusted"""
+    if not _versions_trusted:
+        return None
+    return version_etag(namespace, key, _version_trackers[namespace].version(key), params)
 
 def get_bills(user_id: str) -> Optional[dict]:
     """Get bills for a specific user"""
-    return bills_repository.get(user_id)
+    return repository.get_bill(user_id)
 
 def create_bill(user_id: str, electricity_bill: float = 0, water_bill: float = 0,
                internet_bill: float = 0, phone_bill: float = 0) -> dict:
-    """Create a new bill for a user"""
-    bill = {
-        'user_id': user_id,
-        'electricity_bill': f"{float(electricity_bill):.2f}",
-        'water_bill': f"{float(water_bill):.2f}",
-        'internet_bill': f"{float(internet_bill):.2f}",
-        'phone_bill': f"{float(phone_bill):.2f}"
-    }
-    bills_repository[user_id] = bill
+    """Create a new bill for a user; raises ValueError naming the first invalid amount"""
+    amounts = zip(BILL_AMOUNT_FIELDS, (electricity_bill, water_bill, internet_bill, phone_bill))
+    bill = {'user_id': user_id}
+    for field, amount in amounts:
+        try:
+            bill[field] = format_amount(amount)
+        except (TypeError, ValueError):
+            # Same message as validate_bill
+            raise ValueError(f"{field} must be a number")
+    repository.save_bill(bill)
     return bill
 
-def are_intents_similar(intent1: str, intent2: str) -> bool:
-    """Use OpenAI to determine if two intents are similar"""
-    try:
-        logger.info(f"Checking similarity between intents: '{intent1}' and '{intent2}'")
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that determines if two user intents are similar. Respond with only 'true' or 'false'."},
-                {"role": "user", "content": f"Are these intents similar? Intent 1: '{intent1}' Intent 2: '{intent2}'"}
-            ],
-            temperature=0.1,
-            max_tokens=10
-        )
-        result = response.choices[0].message.content.strip().lower() == 'true'
-        logger.info(f"OpenAI Response for similarity check: {response.choices[0].message.content}")
-        logger.info(f"Similarity result: {result}")
-        return result
-    except Exception as e:
-        logger.error(f"Error checking intent similarity: {e}")
-        return False
-
-def find_most_similar_intent(target_intent: str) -> Optional[dict]:
-    """Find the most similar grouped intent using LLM"""
-    if not grouped_intents_repository:
-        logger.info("No grouped intents available for comparison")
-        return None
+BILL_AMOUNT_FIELDS = ('electricity_bill', 'water_bill', 'internet_bill', 'phone_bill')
+
+# Amounts that are already normalized (the usual case for CSV imports) are kept as they are
+_AMOUNT_RE = re.compile(r'-?(0|[1-9][0-9]{0,7})\.[0-9]{2}')
+
+def format_amount(value: Union[str, float, int, None]) -> str:
+    """Format an amount with two decimals, raising ValueError for anything that is not a finite number"""
+    if isinstance(value, str):
+        if _AMOUNT_RE.fullmatch(value):
+            return value
+        value = value.strip() or 0
+    if value is None or isinstance(value, bool):
+        raise ValueError(f"invalid amount: {value!r}")
+    number = float(value)
+    # Bill amounts are DecimalField(max_digits=10, decimal_places=2)
+    if not math.isfinite(number) or abs(number) >= 1e8:
+        raise ValueError(f"invalid amount: {value!r}")
+    return f"{number:.2f}"
+
+def validate_bill(row: dict) -> dict:
+    """Normalize one bill row; raises ValueError describing the first problem found"""
+    user_id = row.get('user_id')
+    if not isinstance(user_id, str) or not user_id.strip():
+        raise ValueError('user_id is required')
+    if len(user_id) > 36:
+        raise ValueError('user_id is longer than 36 characters')
+    bill = {'user_id': user_id}
+    for field in BILL_AMOUNT_FIELDS:
+        try:
+            bill[field] = format_amount(row.get(field, 0))
+        except (TypeError, ValueError):
+            raise ValueError(f"{field} must be a number")
+    return bill
+
+def create_bills(rows: Iterable[Any], batch_size: Optional[int] = None) -> dict:
+    """Validate and upsert bills in batches, consuming rows lazily; invalid rows are reported by position"""
+    batch_size = batch_size or getattr(settings, 'BILL_IMPORT_BATCH_SIZE', 5000)
+    max_errors = getattr(settings, 'BILL_IMPORT_MAX_ERRORS', 100)
+    started = time.perf_counter()
+    created, failed = 0, 0
+    errors: List[dict] = []
+    batch: List[dict] = []
+    for position, row in enumerate(rows):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError('row must be an object')
+            batch.append(validate_bill(row))
+        except ValueError as e:
+            failed += 1
+            if len(errors) < max_errors:
+                errors.append({'row': position, 'error': str(e)})
+            continue
+        if len(batch) >= batch_size:
+            repository.save_bills(batch)
+            created += len(batch)
+            batch = []
+    if batch:
+        repository.save_bills(batch)
+        created += len(batch)
+    elapsed = time.perf_counter() - started
+    logger.info("Imported %d bills (%d rejected) in %.2fs", created, failed, elapsed)
+    return {
+        'created': created,
+        'failed': failed,
+        'errors': errors,
+        'elapsed_seconds': round(elapsed, 3),
+        'rows_per_second': round((created + failed) / elapsed, 1) if elapsed > 0 else None,
+    }
 
-    # First try exact match
-    for grouped_intent in grouped_intents_repository.values():
-        if grouped_intent['intent_text'] == target_intent:
-            logger.info(f"Found exact match for intent: '{target_intent}'")
-            return grouped_intent
-
-    # If no exact match, use LLM to find the most similar
-    try:
-        # Create a prompt with all available intents
-        intents_list = [intent['intent_text'] for intent in grouped_intents_repository.values()]
-        logger.info(f"Finding most similar intent to '{target_intent}' among: {intents_list}")
-        
-        prompt = f"""Given the target intent: '{target_intent}'
-And these available intents: {', '.join(intents_list)}
-Which intent is most similar to the target intent? Return only the exact matching intent text."""
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant that finds the most similar intent from a list. Return only the exact matching intent text."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.1,
-            max_tokens=50
-        )
-
-        matched_intent_text = response.choices[0].message.content.strip()
-        logger.info(f"OpenAI suggested most similar intent: '{matched_intent_text}'")
-        
-        # Find the grouped intent with the matched text
-        for grouped_intent in grouped_intents_repository.values():
-            if grouped_intent['intent_text'] == matched_intent_text:
-                logger.info(f"Found matching grouped intent for '{matched_intent_text}'")
-                return grouped_intent
-
-        logger.warning(f"OpenAI suggested intent '{matched_intent_text}' not found in repository")
-        return None
-    except Exception as e:
-        logger.error(f"Error finding similar intent: {e}")
-        return None
 
 class IntentService:
+    @staticmethod
+    def store_intent(intent_text: str, interaction_events: List[dict]) -> dict:
+        """Store a new intent and its interaction events without grouping it"""
+        intent = repository.create_intent(intent_text, interaction_events)
+        logger.info("Created new intent with ID %s: '%s'", intent['id'], intent_text)
+        return intent
+
+    # Grouping lives in intent_grouping
+    group_intent = staticmethod(group_intent)
+    group_intents = staticmethod(group_intents)
+    regroup_intents = staticmethod(regroup_intents)
+
     @staticmethod
     def create_intent(intent_text: str, interaction_events: List[dict]) -> dict:
-        # Create intent
-        intent_id = len(intents_repository) + 1
-        intent = {
-            'id': intent_id,
-            'intent_text': intent_text,
-            'interaction_events': interaction_events
-        }
-        intents_repository[intent_id] = intent
-        logger.info(f"Created new intent with ID {intent_id}: '{intent_text}'")
-
-        # Store interaction events
-        interaction_events_repository[intent_id] = interaction_events
-
-        # Find similar intent using LLM
-        similar_intent = find_most_similar_intent(intent_text)
+        """Store and group an intent in the calling thread"""
+        intent = IntentService.store_intent(intent_text, interaction_events)
+        return IntentService.group_intent(intent)
 
-        if similar_intent:
-            # Update existing grouped intent
-            similar_intent['count'] += 1
-            # TODO: Consider whether to extend interaction events or keep them separate
-            # similar_intent['interaction_events'].extend(interaction_events)
-            logger.info(f"Updated existing grouped intent '{similar_intent['intent_text']}' with new interactions")
-        else:
-            # Create new grouped intent
-            grouped_intent_id = len(grouped_intents_repository) + 1
-            grouped_intent = {
-                'id': grouped_intent_id,
-                'intent_text': intent_text,
-                'count': 1,
-                'interaction_events': interaction_events.copy()
-            }
-            grouped_intents_repository[str(grouped_intent_id)] = grouped_intent
-            logger.info(f"Created new grouped intent with ID {grouped_intent_id}: '{intent_text}'")
+    @staticmethod
+    def record_intent(intent_text: str, interaction_events: List[dict]) -> dict:
+        """Store an intent and group it inline, or in the background in 'async' INTENT_GROUPING_MODE"""
+        if getattr(settings, 'INTENT_GROUPING_MODE', 'sync') != 'async':
+            return IntentService.create_intent(intent_text, interaction_events)
 
+        intent = IntentService.store_intent(intent_text, interaction_events)
+        if not grouping_pipeline.submit(intent['id']):
+            # Queue is full; degrade to grouping in the request thread
+            logger.warning("Grouping queue full, grouping intent %s inline", intent['id'])
+            IntentService.group_intent(intent)
         return intent
 
+    @staticmethod
+    async def record_intent_async(intent_text: str, interaction_events: List[dict]) -> dict:
+        """Async variant of record_intent; the LLM round trip does not hold a thread"""
+        intent = await call_repository(IntentService.store_intent, intent_text, interaction_events)
+        if getattr(settings, 'INTENT_GROUPING_MODE', 'sync') == 'async' and grouping_pipeline.submit(intent['id']):
+            return intent
+        if getattr(settings, 'INTENT_BATCHING', False):
+            await asyncio.wrap_future(intent_batcher.submit(intent))
+        else:
+            similar_intent = await find_most_similar_intent_async(intent_text)
+            await call_repository(assign_to_group, intent, similar_intent)
+        return intent
+
+    @staticmethod
+    def get_intent(intent_id: int) -> Optional[dict]:
+        """Get a stored intent, including its grouping status"""
+        return repository.get_intent(intent_id)
+
+    @staticmethod
+    def find_grouped_intent(intent_text: str) -> Optional[dict]:
+        """The grouped intent whose interaction events answer a query for intent_text"""
+        logger.info("Searching for interactions with intent: '%s'", intent_text, extra=SAMPLED)
+        # Find the most similar grouped intent
+        similar_intent = find_most_similar_intent(intent_text)
+        if similar_intent:
+            logger.info("Found similar intent: '%s'", similar_intent['intent_text'], extra=SAMPLED)
+            return similar_intent
+        logger.info("No similar intent found for: '%s'", intent_text, extra=SAMPLED)
+        return None
+
     @staticmethod
     def get_interactions(intent_text: str) -> Optional[List[dict]]:
         """
         Returns interaction events for a given intent text.
         Uses LLM to find the most similar grouped intent and returns its events.
         """
-        logger.info(f"Searching for interactions with intent: '{intent_text}'")
-        # Find the most similar grouped intent
-        similar_intent = find_most_similar_intent(intent_text)
+        similar_intent = IntentService.find_grouped_intent(intent_text)
+        return similar_intent['interaction_events'] if similar_intent else None
+
+    @staticmethod
+    def tag_grouped_intent(grouped_intent: dict, params: Iterable = ()) -> Tuple[Optional[str], dict]:
+        """ETag of grouped_intent and the grouped intent re-read after it; untagged if merged or deleted meanwhile"""
+        # Version first, so a concurrent write can make the body newer than its tag but never older
+        key = str(grouped_intent['id'])
+        etag = response_etag('grouped_intent', key, params)
+        if etag is None:
+            return None, grouped_intent
+        current = repository.get_grouped_intent(key)
+        if current is None or str(current['id']) != key:
+            return None, grouped_intent
+        return etag, current
+
+    @staticmethod
+    def get_interactions_page(grouped_intent: dict, cursor: Optional[str], limit: int) -> dict:
+        """One page of the interaction events of grouped_intent and the next cursor; ValueError for bad cursors"""
+        results, next_cursor = paginate_events(grouped_intent['interaction_events'], cursor, limit)
+        return {'results': results, 'next_cursor': next_cursor}
+
+    @staticmethod
+    def stream_interactions(grouped_intent: dict, cursor: Optional[str] = None) -> Iterator[dict]:
+        """Lazily iterate the interaction events of grouped_intent after cursor"""
+        # Resolve (and validate) the cursor before the response starts streaming
+        events = grouped_intent['interaction_events']
+        return iter_events(events, resume_position(events, cursor))
+
+    @staticmethod
+    def get_interaction_paths(grouped_intent: dict, k: int) -> dict:
+        """The k most frequent interaction paths recorded for grouped_intent, and how many sessions there were"""
+        trie = interaction_paths.get(str(grouped_intent['id']))
+        if trie is None:
+            return {'sessions': 0, 'paths': []}
+        return {'sessions': trie.sessions, 'paths': trie.top_paths(k)}
+
+    @staticmethod
+    def top_intents(n: int, window: Optional[str] = None) -> List[dict]:
+        """The n grouped intents recorded most often, all time or in a TRENDING_WINDOWS window (KeyError if unknown)"""
+        repository.sync()
+        return [{'id': int(key), 'intent_text': grouped_intent_indexes.intent_texts.get(key), 'count': count}
+                for key, count in intent_ranking.top(n, window)]
+
+    @staticmethod
+    async def get_interactions_async(intent_text: str) -> Optional[List[dict]]:
+        """Async variant of get_interactions"""
+        similar_intent = await find_most_similar_intent_async(intent_text)
         if similar_intent:
-            logger.info(f"Found similar intent: '{similar_intent['intent_text']}'")
             return similar_intent['interaction_events']
-        logger.info(f"No similar intent found for: '{intent_text}'")
-        return None 
\ No newline at end of file
+        return None
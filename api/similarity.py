@@ -0,0 +1,358 @@
+from typing import Any, Iterator, List, Optional, Tuple, Union
+import os
+import json
+import time
+import asyncio
+import logging
+import weakref
+import httpx
+from contextlib import contextmanager
+from openai import AsyncOpenAI, OpenAI
+from dotenv import load_dotenv
+from django.conf import settings
+from .backend import call_repository, repository
+from .cache import MISSING, build_cache
+from .indexes import grouped_intent_indexes, shortlist_candidates
+from .llm import LLMUsage, build_llm_client
+from .logs import SAMPLED
+from .matching import normalize_text
+from .metrics import registry
+from .singleflight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Load environment variables
+load_dotenv()
+
+# Initialize OpenAI client. Retries are left to llm_client, which knows the deadline.
+client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'), max_retries=0)
+
+# AsyncOpenAI clients used by the async views, one per event loop because
+# pooled connections cannot be shared between loops
+_async_clients: 'weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]' = weakref.WeakKeyDictionary()
+
+def get_async_client() -> AsyncOpenAI:
+    """Shared AsyncOpenAI client with a tuned keep-alive connection pool for the running loop"""
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        pool = getattr(settings, 'OPENAI_HTTP_POOL', {})
+        http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=pool.get('MAX_CONNECTIONS', 100),
+                max_keepalive_connections=pool.get('MAX_KEEPALIVE_CONNECTIONS', 100),
+                keepalive_expiry=pool.get('KEEPALIVE_EXPIRY', 30)
+            ),
+            timeout=pool.get('TIMEOUT', 30)
+        )
+        async_client = AsyncOpenAI(api_key=os.getenv('OPENAI_API_KEY'), http_client=http_client, max_retries=0)
+        _async_clients[loop] = async_client
+    return async_client
+
+# Cache of LLM verdicts, shared across workers when backed by SQLite
+llm_cache = build_cache(getattr(settings, 'LLM_CACHE', {}))
+
+# Token and candidate counts of every LLM request
+llm_usage = LLMUsage()
+
+# Concurrent lookups of the same text against the same grouped intents share one LLM request
+llm_flights = SingleFlight()
+
+# Prometheus metrics of the LLM calls and intent matching, served at /api/metrics/
+llm_call_duration = registry.histogram(
+    'luma_llm_call_duration_seconds', 'Latency of LLM calls including hedges and retries, by operation and outcome',
+    ['operation', 'outcome'],
+)
+llm_tokens = registry.counter('luma_llm_tokens_total', 'Tokens used by LLM calls, by operation and kind', ['operation', 'kind'])
+llm_errors = registry.counter('luma_llm_errors_total', 'Failed LLM calls, by operation and error type', ['operation', 'error'])
+llm_coalesced = registry.counter(
+    'luma_llm_coalesced_total', 'LLM requests avoided by joining an identical request in flight, by operation',
+    ['operation'],
+)
+intent_matches = registry.counter(
+    'luma_intent_matches_total', 'Intent matching results, by operation, deciding source and outcome',
+    ['operation', 'source', 'outcome'],
+)
+
+@contextmanager
+def observe_llm_call(operation: str) -> Iterator[None]:
+    """Time the LLM call in the block and count its failures by error type"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        # llm_client raises LLMUnavailable from the upstream error; count the latter when there is one
+        llm_errors.labels(operation, type(e.__cause__ or e).__name__).inc()
+        llm_call_duration.labels(operation, 'error').observe(time.perf_counter() - started)
+        raise
+    llm_call_duration.labels(operation, 'ok').observe(time.perf_counter() - started)
+
+def record_llm_usage(operation: str, response: Any, candidates_sent: int = 0, candidates_available: int = 0) -> None:
+    entry = llm_usage.record(operation, response, candidates_sent, candidates_available)
+    llm_tokens.labels(operation, 'prompt').inc(entry['prompt_tokens'])
+    llm_tokens.labels(operation, 'completion').inc(entry['completion_tokens'])
+
+def record_match(operation: str, source: str, matched: bool) -> None:
+    intent_matches.labels(operation, source, 'matched' if matched else 'unmatched').inc()
+
+# Deadlines, hedging and circuit breaking for every LLM request. The lambdas
+# look the clients up on each call so they can be replaced at runtime.
+llm_client = build_llm_client(getattr(settings, 'LLM_CLIENT', {}), lambda: client, lambda: get_async_client())
+
+def are_intents_similar(intent1: str, intent2: str) -> bool:
+    """Use OpenAI to determine if two intents are similar"""
+    # The verdict is symmetric and does not depend on the grouped intents
+    cache_key = 'similar:' + '|'.join(sorted((normalize_text(intent1), normalize_text(intent2))))
+    cached = llm_cache.get(cache_key)
+    if cached is not MISSING:
+        record_match('similar', 'cache', cached)
+        return cached
+    try:
+        logger.info("Checking similarity between intents: '%s' and '%s'", intent1, intent2, extra=SAMPLED)
+        with observe_llm_call('similar'):
+            response = llm_client.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that determines if two user intents are similar. Respond with only 'true' or 'false'."},
+                    {"role": "user", "content": f"Are these intents similar? Intent 1: '{intent1}' Intent 2: '{intent2}'"}
+                ],
+                temperature=0.1,
+                max_tokens=10
+            )
+        record_llm_usage('similar', response)
+        result = response.choices[0].message.content.strip().lower() == 'true'
+        logger.info("OpenAI response for similarity check: %s (similar: %s)",
+                    response.choices[0].message.content, result, extra=SAMPLED)
+    except Exception as e:
+        logger.error("Error checking intent similarity, using local matching: %s", e)
+        llm_client.record_fallback('similar')
+        result = local_similarity(intent1, intent2) >= getattr(settings, 'INTENT_LLM_TIEBREAK_FLOOR', 0.45)
+        record_match('similar', 'fallback', result)
+        return result
+    record_match('similar', 'llm', result)
+    llm_cache.set(cache_key, result)
+    return result
+
+def local_similarity(intent1: str, intent2: str) -> float:
+    """Cosine similarity of two intents under the in-process embedder"""
+    if normalize_text(intent1) == normalize_text(intent2):
+        return 1.0
+    embedder = grouped_intent_indexes.embeddings.embedder
+    return float(embedder.embed(intent1) @ embedder.embed(intent2))
+
+def local_fallback_match(target_intent: str) -> Optional[dict]:
+    """Best embedding candidate for target_intent, used when the LLM cannot be reached"""
+    match = grouped_intent_indexes.embeddings.query(target_intent)
+    if match is None or match[1] < getattr(settings, 'INTENT_LLM_TIEBREAK_FLOOR', 0.45):
+        return None
+    return repository.get_grouped_intent(match[0])
+
+def find_local_match(target_intent: str) -> Tuple[Optional[dict], Optional[float]]:
+    """Match target_intent without the LLM; returns the matched grouped intent (if any) and the best score"""
+    # Pick up grouped intents created by other workers
+    repository.sync()
+    if not grouped_intent_indexes.intent_texts:
+        logger.info("No grouped intents available for comparison", extra=SAMPLED)
+        return None, None
+
+    # First try an exact match on the normalized text, then texts seen before
+    normalized = normalize_text(target_intent)
+    key = grouped_intent_indexes.texts.get(normalized)
+    if key is None:
+        key = repository.get_assignment(normalized)
+    grouped_intent = repository.get_grouped_intent(key) if key is not None else None
+    if grouped_intent is not None:
+        logger.info("Found exact match for intent: '%s'", target_intent, extra=SAMPLED)
+        return grouped_intent, 1.0
+
+    # Then ask the in-process embedding index
+    match = grouped_intent_indexes.embeddings.query(target_intent)
+    if match is None:
+        return None, None
+    key, score = match
+    threshold = getattr(settings, 'INTENT_SIMILARITY_THRESHOLD', 0.75)
+    if score >= threshold:
+        logger.info("Embedding match for '%s' (score %.3f)", target_intent, score, extra=SAMPLED)
+        return repository.get_grouped_intent(key), score
+    return None, score
+
+def needs_llm_tiebreak(score: Optional[float]) -> bool:
+    """Only borderline scores are worth a round trip to the LLM"""
+    if score is None or not getattr(settings, 'INTENT_LLM_TIEBREAK', True):
+        return False
+    return score >= getattr(settings, 'INTENT_LLM_TIEBREAK_FLOOR', 0.45)
+
+def find_most_similar_intent(target_intent: str) -> Optional[dict]:
+    """Find the most similar grouped intent, falling back to the LLM for borderline matches"""
+    grouped_intent, score = find_local_match(target_intent)
+    if grouped_intent is not None:
+        record_match('most_similar', 'local', True)
+        return grouped_intent
+    if not needs_llm_tiebreak(score):
+        if score is not None:
+            logger.info("No grouped intent close enough to '%s' (best score %.3f)", target_intent, score, extra=SAMPLED)
+        record_match('most_similar', 'local', False)
+        return None
+    return ask_llm_for_most_similar_intent(target_intent)
+
+
+def _most_similar_cache_key(target_intent: str) -> str:
+    # Keyed on the grouped intent set version so new groups invalidate old verdicts
+    return f"most_similar:{repository.grouped_intents_version}:{normalize_text(target_intent)}"
+
+def _most_similar_request(target_intent: str) -> Tuple[List[str], dict]:
+    """Build the chat completion arguments for a most-similar-intent query"""
+    # Create a prompt with the shortlisted candidate intents
+    intents_list = shortlist_candidates(target_intent)
+    logger.info("Finding most similar intent to '%s' among %d candidates: %s",
+                target_intent, len(intents_list), intents_list, extra=SAMPLED)
+
+    prompt = f"""Given the target intent: '{target_intent}'
+And these available intents: {', '.join(intents_list)}
+Which intent is most similar to the target intent? Return only the exact matching intent text."""
+
+    return intents_list, dict(
+        model="gpt-3.5-turbo",
+        messages=[
+            {"role": "system", "content": "You are a helpful assistant that finds the most similar intent from a list. Return only the exact matching intent text."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.1,
+        max_tokens=50
+    )
+
+def _most_similar_response(response, intents_list: List[str]) -> str:
+    record_llm_usage('most_similar', response, len(intents_list), len(grouped_intent_indexes.intent_texts))
+    matched_intent_text = response.choices[0].message.content.strip()
+    logger.info("OpenAI suggested most similar intent: '%s'", matched_intent_text, extra=SAMPLED)
+    return matched_intent_text
+
+def _grouped_intent_for_text(matched_intent_text: str) -> Optional[dict]:
+    """Find the grouped intent with the matched text"""
+    key = grouped_intent_indexes.texts.get(matched_intent_text)
+    grouped_intent = repository.get_grouped_intent(key) if key is not None else None
+    if grouped_intent is not None:
+        logger.info("Found matching grouped intent for '%s'", matched_intent_text, extra=SAMPLED)
+        return grouped_intent
+
+    logger.warning("OpenAI suggested intent '%s' not found in repository", matched_intent_text)
+    return None
+
+def _fetch_most_similar(target_intent: str, cache_key: str) -> str:
+    """Ask the LLM for the grouped intent text most similar to target_intent and cache the verdict"""
+    intents_list, request = _most_similar_request(target_intent)
+    with observe_llm_call('most_similar'):
+        response = llm_client.create(**request)
+    matched_intent_text = _most_similar_response(response, intents_list)
+    llm_cache.set(cache_key, matched_intent_text)
+    return matched_intent_text
+
+def ask_llm_for_most_similar_intent(target_intent: str) -> Optional[dict]:
+    """Use the LLM to pick the most similar grouped intent"""
+    cache_key = _most_similar_cache_key(target_intent)
+    matched_intent_text = llm_cache.get(cache_key)
+    source = 'cache'
+    if matched_intent_text is MISSING:
+        try:
+            matched_intent_text, leader = llm_flights.do(cache_key, _fetch_most_similar, target_intent, cache_key)
+        except Exception as e:
+            logger.error("Error finding similar intent, using local matching: %s", e)
+            llm_client.record_fallback('most_similar')
+            grouped_intent = local_fallback_match(target_intent)
+            record_match('most_similar', 'fallback', grouped_intent is not None)
+            return grouped_intent
+        source = 'llm' if leader else 'coalesced'
+        if not leader:
+            llm_coalesced.labels('most_similar').inc()
+    grouped_intent = _grouped_intent_for_text(matched_intent_text)
+    record_match('most_similar', source, grouped_intent is not None)
+    return grouped_intent
+
+async def _fetch_most_similar_async(target_intent: str, cache_key: str) -> str:
+    """Async variant of _fetch_most_similar"""
+    intents_list, request = _most_similar_request(target_intent)
+    with observe_llm_call('most_similar'):
+        response = await llm_client.acreate(**request)
+    matched_intent_text = _most_similar_response(response, intents_list)
+    llm_cache.set(cache_key, matched_intent_text)
+    return matched_intent_text
+
+async def ask_llm_for_most_similar_intent_async(target_intent: str) -> Optional[dict]:
+    """Async variant of ask_llm_for_most_similar_intent using the pooled AsyncOpenAI client"""
+    cache_key = await call_repository(_most_similar_cache_key, target_intent)
+    matched_intent_text = llm_cache.get(cache_key)
+    source = 'cache'
+    if matched_intent_text is MISSING:
+        try:
+            matched_intent_text, leader = await llm_flights.ado(
+                cache_key, _fetch_most_similar_async, target_intent, cache_key
+            )
+        except Exception as e:
+            logger.error("Error finding similar intent, using local matching: %s", e)
+            llm_client.record_fallback('most_similar')
+            grouped_intent = await call_repository(local_fallback_match, target_intent)
+            record_match('most_similar', 'fallback', grouped_intent is not None)
+            return grouped_intent
+        source = 'llm' if leader else 'coalesced'
+        if not leader:
+            llm_coalesced.labels('most_similar').inc()
+    grouped_intent = await call_repository(_grouped_intent_for_text, matched_intent_text)
+    record_match('most_similar', source, grouped_intent is not None)
+    return grouped_intent
+
+async def find_most_similar_intent_async(target_intent: str) -> Optional[dict]:
+    """Async variant of find_most_similar_intent"""
+    grouped_intent, score = await call_repository(find_local_match, target_intent)
+    if grouped_intent is not None:
+        record_match('most_similar', 'local', True)
+        return grouped_intent
+    if not needs_llm_tiebreak(score):
+        record_match('most_similar', 'local', False)
+        return None
+    return await ask_llm_for_most_similar_intent_async(target_intent)
+
+def ask_llm_to_group_intents(target_intents: List[str]) -> List[Optional[Union[str, int]]]:
+    """Map several new intent texts with one LLM request to a grouped intent text, an earlier target's index, or None"""
+    # Union of every target's shortlist, keeping the order they were ranked in
+    intents_list = list(dict.fromkeys(
+        text for target_intent in target_intents for text in shortlist_candidates(target_intent)
+    ))
+    targets = '\n'.join(f"{i}: {text}" for i, text in enumerate(target_intents))
+    prompt = f"""Existing intents: {', '.join(intents_list)}
+New intents:
+{targets}
+For every new intent, return the exact text of the most similar existing intent, or the number of an earlier new intent it is the same as, or null if it matches none.
+Respond with a JSON object mapping each new intent number to that value."""
+    try:
+        logger.info("Grouping %d intents with a single LLM request", len(target_intents))
+        with observe_llm_call('group_batch'):
+            response = llm_client.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a helpful assistant that groups user intents. Respond with only a JSON object."},
+                    {"role": "user", "content": prompt}
+                ],
+                temperature=0.1,
+                max_tokens=50 * len(target_intents),
+                response_format={"type": "json_object"}
+            )
+        record_llm_usage('group_batch', response, len(intents_list), len(grouped_intent_indexes.intent_texts))
+        verdicts = json.loads(response.choices[0].message.content)
+    except Exception as e:
+        logger.error("Error grouping intents in batch, using local matching: %s", e)
+        llm_client.record_fallback('group_batch')
+        fallbacks = [local_fallback_match(target_intent) for target_intent in target_intents]
+        return [grouped_intent['intent_text'] if grouped_intent else None for grouped_intent in fallbacks]
+
+    results: List[Optional[Union[str, int]]] = []
+    for i in range(len(target_intents)):
+        verdict = verdicts.get(str(i)) if isinstance(verdicts, dict) else None
+        if isinstance(verdict, bool):
+            verdict = None
+        elif isinstance(verdict, str) and verdict.strip().isdigit():
+            verdict = int(verdict.strip())
+        # Only references to earlier targets are meaningful
+        if isinstance(verdict, int) and not 0 <= verdict < i:
+            verdict = None
+        results.append(verdict if isinstance(verdict, (str, int)) else None)
+    return results
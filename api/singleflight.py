@@ -0,0 +1,81 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class FlightAborted(Exception):
+    """The call that followers of a flight were waiting for was cancelled or interrupted"""
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller (the
+    leader) runs the function, and callers arriving while it runs wait for
+    its outcome instead of repeating the work. Results and exceptions are
+    shared; nothing is kept once the flight lands, so this is not a cache.
+
+    Flights are shared between threads (do) and event loops (ado), since
+    both wait on the same concurrent Future. Followers must treat results
+    as read-only.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[Hashable, Future] = {}
+        # Calls that ran the function, and calls that were answered by another one's flight
+        self.leaders = 0
+        self.followers = 0
+
+    def _join(self, key: Hashable) -> Tuple[Future, bool]:
+        with self._lock:
+            future = self._flights.get(key)
+            if future is not None:
+                self.followers += 1
+                return future, False
+            future = Future()
+            # A running future cannot be cancelled by a follower giving up on it
+            future.set_running_or_notify_cancel()
+            self._flights[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _land(self, key: Hashable, future: Future, result: Any = None, error: Optional[BaseException] = None) -> None:
+        with self._lock:
+            del self._flights[key]
+        if error is None:
+            future.set_result(result)
+        elif isinstance(error, Exception):
+            future.set_exception(error)
+        else:
+            future.set_exception(FlightAborted(f"{type(error).__name__} in the leading call"))
+
+    def do(self, key: Hashable, function: Callable[..., Any], *args) -> Tuple[Any, bool]:
+        """(result of function(*args) or of the flight already running for key, whether this call ran it)"""
+        future, leader = self._join(key)
+        if not leader:
+            return future.result(), False
+        try:
+            result = function(*args)
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result, True
+
+    async def ado(self, key: Hashable, function: Callable[..., Awaitable[Any]], *args) -> Tuple[Any, bool]:
+        """Async variant of do; function is a coroutine function"""
+        future, leader = self._join(key)
+        if not leader:
+            return await asyncio.wrap_future(future), False
+        try:
+            result = await function(*args)
+        except BaseException as e:
+            self._land(key, future, error=e)
+            raise
+        self._land(key, future, result)
+        return result, True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'leaders': self.leaders, 'coalesced': self.followers, 'in_flight': len(self._flights)}
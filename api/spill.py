@@ -0,0 +1,137 @@
+import glob
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import zlib
+from typing import Any, Dict, Optional
+
+# Record header: payload length and CRC-32 of the payload
+_HEADER = struct.Struct('<II')
+# A location packs the segment number above the byte offset in it
+_OFFSET_BITS = 40
+# Store directories are named <prefix><pid>-<random>
+_PREFIX = 'luma-spill-'
+
+
+def _remove_orphans(parent: str) -> None:
+    # Directories of stores whose process has exited; crashed processes never closed them
+    for path in glob.glob(os.path.join(parent, f"{_PREFIX}*-*")):
+        pid = os.path.basename(path)[len(_PREFIX):].split('-', 1)[0]
+        if not pid.isdigit() or int(pid) == os.getpid():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            shutil.rmtree(path, ignore_errors=True)
+        except PermissionError:
+            # Alive, but owned by another user
+            pass
+
+
+class SegmentStore:
+    """
+    Local on-disk store for entries evicted from memory. Records are
+    appended to segment files of about segment_bytes each and addressed by
+    the int location put() returns. Space is reclaimed a segment at a time:
+    once every record of a full segment has been discarded (read back into
+    memory or deleted) its file is removed.
+
+    Spilled data is a cache of in-memory state, not a durable copy. Each
+    store writes to a directory of its own, created inside `directory`
+    (the system temporary directory by default) and removed on close(),
+    so processes sharing a spill directory never touch each other's
+    segments. Directories left behind by processes that are gone are
+    removed on start.
+    """
+
+    def __init__(self, directory: Optional[str] = None, segment_bytes: int = 64 * 2 ** 20):
+        parent = tempfile.gettempdir() if directory is None else str(directory)
+        os.makedirs(parent, exist_ok=True)
+        _remove_orphans(parent)
+        self.directory = tempfile.mkdtemp(prefix=f"{_PREFIX}{os.getpid()}-", dir=parent)
+        self.segment_bytes = segment_bytes
+        self._lock = threading.Lock()
+        self._fds: Dict[int, int] = {}
+        # Bytes of records not yet discarded, per segment
+        self._live: Dict[int, int] = {}
+        self._segment = -1
+        self._offset = 0
+        self.writes = 0
+        self.reads = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, f"spill-{segment:06d}.seg")
+
+    def _open_segment(self) -> None:
+        self._segment += 1
+        self._offset = 0
+        self._fds[self._segment] = os.open(self._path(self._segment), os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        self._live[self._segment] = 0
+
+    def put(self, payload: bytes) -> int:
+        """Append payload and return its location"""
+        record = _HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        with self._lock:
+            if self._segment < 0 or self._offset >= self.segment_bytes:
+                self._open_segment()
+            location = self._segment << _OFFSET_BITS | self._offset
+            fd, view = self._fds[self._segment], memoryview(record)
+            while view:
+                view = view[os.write(fd, view):]
+            self._offset += len(record)
+            self._live[self._segment] += len(record)
+            self.writes += 1
+            self.bytes_written += len(record)
+        return location
+
+    def get(self, location: int) -> bytes:
+        segment, offset = location >> _OFFSET_BITS, location & ((1 << _OFFSET_BITS) - 1)
+        # Under the lock, so discard() cannot close the segment mid-read
+        with self._lock:
+            fd = self._fds[segment]
+            length, crc = _HEADER.unpack(os.pread(fd, _HEADER.size, offset))
+            payload = os.pread(fd, length, offset + _HEADER.size)
+            self.reads += 1
+            self.bytes_read += _HEADER.size + length
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise IOError(f"Spilled record at {location} in {self._path(segment)} is damaged")
+        return payload
+
+    def discard(self, location: int) -> None:
+        """Mark the record at location as no longer needed"""
+        segment, offset = location >> _OFFSET_BITS, location & ((1 << _OFFSET_BITS) - 1)
+        with self._lock:
+            length, _ = _HEADER.unpack(os.pread(self._fds[segment], _HEADER.size, offset))
+            self._live[segment] -= _HEADER.size + length
+            if not self._live[segment] and segment != self._segment:
+                os.close(self._fds.pop(segment))
+                del self._live[segment]
+                os.remove(self._path(segment))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            disk_bytes = sum(
+                self._offset if segment == self._segment else os.fstat(fd).st_size for segment, fd in self._fds.items()
+            )
+            return {
+                'segments': len(self._fds),
+                'disk_bytes': disk_bytes,
+                'live_bytes': sum(self._live.values()),
+                'writes': self.writes,
+                'reads': self.reads,
+                'bytes_written': self.bytes_written,
+                'bytes_read': self.bytes_read,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            for fd in self._fds.values():
+                os.close(fd)
+            self._fds.clear()
+            self._live.clear()
+            self._segment = -1
+        shutil.rmtree(self.directory, ignore_errors=True)
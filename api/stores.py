@@ -0,0 +1,603 @@
+import itertools
+import logging
+import threading
+import time
+import weakref
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StoreListener:
+    """Receives change notifications from a ShardedStore"""
+
+    def on_set(self, key: Any, value: Any) -> None:
+        pass
+
+    def on_replace(self, key: Any, old: Any, new: Any) -> None:
+        """An existing entry was overwritten; listeners that do not care about old see a plain on_set"""
+        self.on_set(key, new)
+
+    def on_delete(self, key: Any, value: Any) -> None:
+        pass
+
+    def on_clear(self) -> None:
+        pass
+
+
+class AtomicCounter:
+    """Thread-safe id allocator; next() on itertools.count is atomic in CPython"""
+
+    def __init__(self, start: int = 1):
+        self._start = start
+        self._counter = itertools.count(start)
+
+    def next(self) -> int:
+        return next(self._counter)
+
+    def reset(self) -> None:
+        self._counter = itertools.count(self._start)
+
+
+# Marks keys that did not exist before a write
+_ABSENT = object()
+
+
+class _Shard:
+    __slots__ = ('lock', 'data')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.data: Dict[Any, Any] = {}
+
+
+class ShardedStore(MutableMapping):
+    """
+    A dict-like store split into independently locked shards, so writers
+    to different keys do not contend on one global lock.
+
+    Readers never take a lock. With copy_on_write=True a write copies the
+    affected shard, modifies the copy and swaps it in with a single
+    reference assignment, so every shard a reader holds is an immutable
+    snapshot. Without it, shards are updated in place (point reads stay
+    lock-free because single dict operations are atomic in CPython) and
+    iteration works on per-shard copies; use that for large stores where
+    copying a shard per write would cost too much.
+
+    Subscribed listeners are notified whenever entries are added, replaced
+    (with the value that was overwritten), removed or cleared. `version`
+    increases on every change, compute() included, which lets caches key
+    derived results on the exact entries they were computed from.
+    `identity_version` increases on every change but compute(), whose
+    in-place updates (counters) keep the entry's identity, for results
+    that depend on which entries exist rather than on their counters. `ids`
+    allocates unique ids and restarts after clear().
+    """
+
+    def __init__(self, shards: int = 16, copy_on_write: bool = False):
+        self._shards = [_Shard() for _ in range(shards)]
+        self._copy_on_write = copy_on_write
+        self._listeners: List[StoreListener] = []
+        self._version_lock = threading.Lock()
+        self.version = 0
+        self.identity_version = 0
+        self.ids = AtomicCounter()
+
+    def _shard(self, key: Any) -> _Shard:
+        return self._shards[hash(key) % len(self._shards)]
+
+    def _bump_version(self, identity: bool = True) -> None:
+        with self._version_lock:
+            self.version += 1
+            if identity:
+                self.identity_version += 1
+
+    def subscribe(self, listener: StoreListener) -> None:
+        self._listeners.append(listener)
+        for key, value in self.items():
+            listener.on_set(key, value)
+
+    def allocate_id(self, key_type: Callable[[int], Any] = int) -> int:
+        """Return an unused id; key_type maps it to the key type of the store"""
+        while True:
+            candidate = self.ids.next()
+            if key_type(candidate) not in self:
+                return candidate
+
+    # Reads
+
+    def __getitem__(self, key):
+        return self._shard(key).data[key]
+
+    def get(self, key, default=None):
+        return self._shard(key).data.get(key, default)
+
+    def __contains__(self, key):
+        return key in self._shard(key).data
+
+    def __len__(self):
+        return sum(len(shard.data) for shard in self._shards)
+
+    def _shard_views(self) -> Iterator[Dict[Any, Any]]:
+        for shard in self._shards:
+            if self._copy_on_write:
+                yield shard.data
+            else:
+                with shard.lock:
+                    data = dict(shard.data)
+                yield data
+
+    def __iter__(self):
+        for data in self._shard_views():
+            yield from data
+
+    def items(self):
+        return [item for data in self._shard_views() for item in data.items()]
+
+    def values(self):
+        return [value for data in self._shard_views() for value in data.values()]
+
+    def keys(self):
+        return [key for data in self._shard_views() for key in data]
+
+    def snapshot(self) -> Dict[Any, Any]:
+        """Point-in-time copy of every shard"""
+        merged: Dict[Any, Any] = {}
+        for data in self._shard_views():
+            merged.update(data)
+        return merged
+
+    # Writes
+
+    def _notify_set(self, key: Any, old: Any, value: Any) -> None:
+        for listener in self._listeners:
+            if old is _ABSENT:
+                listener.on_set(key, value)
+            else:
+                listener.on_replace(key, old, value)
+
+    def __setitem__(self, key, value):
+        shard = self._shard(key)
+        with shard.lock:
+            old = shard.data.get(key, _ABSENT)
+            if self._copy_on_write:
+                data = dict(shard.data)
+                data[key] = value
+                shard.data = data
+            else:
+                shard.data[key] = value
+        self._bump_version()
+        self._notify_set(key, old, value)
+
+    def set_many(self, items: Iterable[Tuple[Any, Any]]) -> None:
+        """Write a batch of entries, taking each shard's lock (and copying it) once"""
+        by_shard: Dict[int, List[Tuple[Any, Any]]] = {}
+        for key, value in items:
+            by_shard.setdefault(hash(key) % len(self._shards), []).append((key, value))
+        if not by_shard:
+            return
+        changes: List[Tuple[Any, Any, Any]] = []
+        for index, entries in by_shard.items():
+            shard = self._shards[index]
+            with shard.lock:
+                data = dict(shard.data) if self._copy_on_write else shard.data
+                if self._listeners:
+                    for key, value in entries:
+                        changes.append((key, data.get(key, _ABSENT), value))
+                        data[key] = value
+                else:
+                    # Nobody to tell about replaced values, e.g. while loading a snapshot
+                    data.update(entries)
+                shard.data = data
+        self._bump_version()
+        for key, old, value in changes:
+            self._notify_set(key, old, value)
+
+    def transform(self, keys: Iterable[Any], function: Callable[[Dict[Any, Any]], Dict[Any, Any]]) -> None:
+        """
+        Atomically rewrite several existing entries: function gets {key:
+        value} for keys and returns their new values; keys it leaves out are
+        deleted. The locks of all affected shards are held together (taken in
+        shard order), so no writer sees part of the change. Listeners hear
+        about deletions first.
+        """
+        keys = list(keys)
+        indexes = sorted({hash(key) % len(self._shards) for key in keys})
+        shards = [self._shards[index] for index in indexes]
+        for shard in shards:
+            shard.lock.acquire()
+        try:
+            current = {key: self._shard(key).data[key] for key in keys}
+            updated = function(current)
+            if not updated.keys() <= current.keys():
+                raise ValueError('transform() can only replace or delete the given keys')
+            copies = {id(shard): dict(shard.data) if self._copy_on_write else shard.data for shard in shards}
+            for key in keys:
+                data = copies[id(self._shard(key))]
+                if key in updated:
+                    data[key] = updated[key]
+                else:
+                    del data[key]
+            for shard in shards:
+                shard.data = copies[id(shard)]
+        finally:
+            for shard in shards:
+                shard.lock.release()
+        self._bump_version()
+        for key in keys:
+            if key not in updated:
+                for listener in self._listeners:
+                    listener.on_delete(key, current[key])
+        for key, value in updated.items():
+            self._notify_set(key, current[key], value)
+
+    def __delitem__(self, key):
+        shard = self._shard(key)
+        with shard.lock:
+            if self._copy_on_write:
+                data = dict(shard.data)
+                value = data.pop(key)
+                shard.data = data
+            else:
+                value = shard.data.pop(key)
+        self._bump_version()
+        for listener in self._listeners:
+            listener.on_delete(key, value)
+
+    def compute(self, key: Any, update: Callable[[Any], Any]) -> Any:
+        """
+        Atomically replace the value of an existing key with update(value)
+        and return the new value. Meant for changes that keep the entry's
+        identity (e.g. counters), so listeners and identity_version are left
+        alone; version still increases.
+        """
+        shard = self._shard(key)
+        with shard.lock:
+            value = update(shard.data[key])
+            if self._copy_on_write:
+                data = dict(shard.data)
+                data[key] = value
+                shard.data = data
+            else:
+                shard.data[key] = value
+        self._bump_version(identity=False)
+        return value
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.data = {}
+        self.ids.reset()
+        self._bump_version()
+        for listener in self._listeners:
+            listener.on_clear()
+
+
+def _sweep_periodically(store_ref: 'weakref.ref[RetainedStore]', closed: threading.Event, interval: float) -> None:
+    # Holds the store weakly, so a store that is dropped without close() still ends the thread
+    while not closed.wait(interval):
+        store = store_ref()
+        if store is None:
+            return
+        try:
+            store.sweep()
+        except Exception:
+            logger.exception('Sweeping expired entries failed')
+        del store
+
+
+class RetainedStore(ShardedStore):
+    """
+    ShardedStore of int-keyed entries that keeps only part of them in
+    memory. Each shard tracks its entries in least recently used order with
+    their approximate size (size(value)); once a shard holds more than its
+    share of max_bytes, or an entry has not been read or written for ttl
+    seconds, entries are encoded and moved to `spill` (a SegmentStore).
+    Reading a spilled entry decodes it and brings it back into memory, so
+    callers see one mapping either way. Entries for which evictable(value)
+    is false stay in memory. Budgets and expiry are checked whenever a
+    shard is accessed, and with a ttl a background thread runs sweep()
+    every sweep_interval seconds (ttl / 4 by default) until close(), so
+    entries of shards nobody touches expire too.
+
+    Eviction and reloading are not changes: listeners are not told and the
+    version stays the same. Iteration includes spilled entries, decoded on
+    the fly without bringing them back. Point reads take the shard's lock to
+    record the access.
+    """
+
+    def __init__(self, spill: Any, encode: Callable[[Any], bytes], decode: Callable[[bytes], Any],
+                 size: Callable[[Any], int], shards: int = 16, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, evictable: Optional[Callable[[Any], bool]] = None,
+                 clock: Callable[[], float] = time.monotonic, sweep_interval: Optional[float] = None):
+        super().__init__(shards)
+        self.spill = spill
+        self.encode = encode
+        self.decode = decode
+        self.size = size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.evictable = evictable
+        self._clock = clock
+        # Per shard: key -> (last access, size) in least recently used order, and the sizes' sum
+        self._recency: List['OrderedDict[int, Tuple[float, int]]'] = [OrderedDict() for _ in range(shards)]
+        self._bytes = [0] * shards
+        # Spill location of every spilled key, indexed by key; -1 when not spilled
+        self._locations = array('q')
+        self._spilled = 0
+        self._locations_lock = threading.Lock()
+        self.evictions = {'lru': 0, 'ttl': 0}
+        self.reloads = 0
+        self._closed = threading.Event()
+        if ttl is not None:
+            threading.Thread(
+                target=_sweep_periodically, args=(weakref.ref(self), self._closed, sweep_interval or ttl / 4),
+                name='luma-retention-sweep', daemon=True,
+            ).start()
+
+    def close(self) -> None:
+        """Stop the background sweep"""
+        self._closed.set()
+
+    def _index(self, key: int) -> int:
+        return hash(key) % len(self._shards)
+
+    def _location(self, key: int) -> int:
+        locations = self._locations
+        return locations[key] if 0 <= key < len(locations) else -1
+
+    def _set_location(self, key: int, location: int) -> None:
+        with self._locations_lock:
+            locations = self._locations
+            if key >= len(locations):
+                locations.extend([-1] * (key + 1 - len(locations) + len(locations) // 2))
+            self._spilled += (location >= 0) - (locations[key] >= 0)
+            locations[key] = location
+
+    def _unspill(self, key: int) -> Any:
+        # Shard lock held; the spilled value of key, no longer kept on disk, or _ABSENT
+        location = self._location(key)
+        if location < 0:
+            return _ABSENT
+        value = self.decode(self.spill.get(location))
+        self._set_location(key, -1)
+        self.spill.discard(location)
+        return value
+
+    def _admit(self, index: int, key: int, value: Any) -> None:
+        # Shard lock held
+        recency = self._recency[index]
+        previous = recency.pop(key, None)
+        if previous is not None:
+            self._bytes[index] -= previous[1]
+        size = self.size(value)
+        recency[key] = (self._clock(), size)
+        self._bytes[index] += size
+        self._shards[index].data[key] = value
+
+    def _forget(self, index: int, key: int) -> None:
+        # Shard lock held
+        previous = self._recency[index].pop(key, None)
+        if previous is not None:
+            self._bytes[index] -= previous[1]
+
+    def _evict(self, index: int) -> None:
+        # Shard lock held
+        limit = self.max_bytes / len(self._shards) if self.max_bytes is not None else None
+        expired_before = self._clock() - self.ttl if self.ttl is not None else None
+        recency, data = self._recency[index], self._shards[index].data
+        skipped = 0
+        while recency and skipped < len(recency):
+            key, (touched, size) = next(iter(recency.items()))
+            if limit is not None and self._bytes[index] > limit:
+                reason = 'lru'
+            elif expired_before is not None and touched <= expired_before:
+                reason = 'ttl'
+            else:
+                break
+            value = data[key]
+            if self.evictable is not None and not self.evictable(value):
+                recency.move_to_end(key)
+                skipped += 1
+                continue
+            self._set_location(key, self.spill.put(self.encode(value)))
+            del data[key]
+            del recency[key]
+            self._bytes[index] -= size
+            self.evictions[reason] += 1
+
+    def sweep(self) -> None:
+        """Spill the entries of every shard that are over budget or expired"""
+        for index, shard in enumerate(self._shards):
+            with shard.lock:
+                self._evict(index)
+
+    def touch(self, key: int, value: Any) -> None:
+        """
+        Record an access to value, which the caller holds and may have
+        changed in place; it is put back if it was spilled meanwhile.
+        """
+        index = self._index(key)
+        with self._shards[index].lock:
+            if key not in self._shards[index].data:
+                old = self._unspill(key)
+                if old is _ABSENT:
+                    return
+            self._admit(index, key, value)
+            self._evict(index)
+
+    # Reads
+
+    def get(self, key, default=None):
+        index = self._index(key)
+        shard = self._shards[index]
+        with shard.lock:
+            value = shard.data.get(key, _ABSENT)
+            if value is _ABSENT:
+                value = self._unspill(key)
+                if value is _ABSENT:
+                    return default
+                self.reloads += 1
+            self._admit(index, key, value)
+            self._evict(index)
+        return value
+
+    def __getitem__(self, key):
+        value = self.get(key, _ABSENT)
+        if value is _ABSENT:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in self._shard(key).data or self._location(key) >= 0
+
+    def __len__(self):
+        return super().__len__() + self._spilled
+
+    def _spilled_keys(self) -> List[int]:
+        locations = self._locations
+        return [key for key in range(len(locations)) if locations[key] >= 0]
+
+    def _shard_views(self) -> Iterator[Dict[Any, Any]]:
+        yield from super()._shard_views()
+        spilled = {}
+        for key in self._spilled_keys():
+            location = self._location(key)
+            if location >= 0:
+                try:
+                    spilled[key] = self.decode(self.spill.get(location))
+                except (KeyError, OSError):
+                    # Reloaded (and its segment removed) since the keys were listed
+                    pass
+        yield spilled
+
+    def __iter__(self):
+        for view in super()._shard_views():
+            yield from view
+        yield from self._spilled_keys()
+
+    def keys(self):
+        return list(self)
+
+    def resident_values(self) -> List[Any]:
+        """The values held in memory, without decoding spilled ones"""
+        return [value for data in super()._shard_views() for value in data.values()]
+
+    # Writes
+
+    def __setitem__(self, key, value):
+        index = self._index(key)
+        shard = self._shards[index]
+        with shard.lock:
+            old = shard.data.get(key, _ABSENT)
+            if old is _ABSENT:
+                old = self._unspill(key)
+            self._admit(index, key, value)
+            self._evict(index)
+        self._bump_version()
+        self._notify_set(key, old, value)
+
+    def set_many(self, items: Iterable[Tuple[Any, Any]]) -> None:
+        changes: List[Tuple[Any, Any, Any]] = []
+        for key, value in items:
+            index = self._index(key)
+            shard = self._shards[index]
+            with shard.lock:
+                old = shard.data.get(key, _ABSENT)
+                if old is _ABSENT:
+                    old = self._unspill(key)
+                self._admit(index, key, value)
+                self._evict(index)
+            if self._listeners:
+                changes.append((key, old, value))
+        self._bump_version()
+        for key, old, value in changes:
+            self._notify_set(key, old, value)
+
+    def __delitem__(self, key):
+        index = self._index(key)
+        shard = self._shards[index]
+        with shard.lock:
+            value = shard.data.pop(key, _ABSENT)
+            if value is _ABSENT:
+                value = self._unspill(key)
+                if value is _ABSENT:
+                    raise KeyError(key)
+            self._forget(index, key)
+        self._bump_version()
+        for listener in self._listeners:
+            listener.on_delete(key, value)
+
+    def _fault_in(self, index: int, key: int) -> Any:
+        # Shard lock held; the value of key, brought back into memory if it was spilled
+        value = self._shards[index].data.get(key, _ABSENT)
+        if value is _ABSENT:
+            value = self._unspill(key)
+            if value is _ABSENT:
+                raise KeyError(key)
+            self.reloads += 1
+            self._admit(index, key, value)
+        return value
+
+    def compute(self, key: Any, update: Callable[[Any], Any]) -> Any:
+        index = self._index(key)
+        with self._shards[index].lock:
+            value = update(self._fault_in(index, key))
+            self._admit(index, key, value)
+            self._evict(index)
+        self._bump_version(identity=False)
+        return value
+
+    def transform(self, keys: Iterable[Any], function: Callable[[Dict[Any, Any]], Dict[Any, Any]]) -> None:
+        keys = list(keys)
+        indexes = sorted({self._index(key) for key in keys})
+        for index in indexes:
+            self._shards[index].lock.acquire()
+        try:
+            current = {key: self._fault_in(self._index(key), key) for key in keys}
+            updated = function(current)
+            if not updated.keys() <= current.keys():
+                raise ValueError('transform() can only replace or delete the given keys')
+            for key in keys:
+                index = self._index(key)
+                if key in updated:
+                    self._admit(index, key, updated[key])
+                else:
+                    del self._shards[index].data[key]
+                    self._forget(index, key)
+            for index in indexes:
+                self._evict(index)
+        finally:
+            for index in indexes:
+                self._shards[index].lock.release()
+        self._bump_version()
+        for key in keys:
+            if key not in updated:
+                for listener in self._listeners:
+                    listener.on_delete(key, current[key])
+        for key, value in updated.items():
+            self._notify_set(key, current[key], value)
+
+    def clear(self):
+        for index, shard in enumerate(self._shards):
+            with shard.lock:
+                self._recency[index].clear()
+                self._bytes[index] = 0
+        for key in self._spilled_keys():
+            location = self._location(key)
+            if location >= 0:
+                self._set_location(key, -1)
+                self.spill.discard(location)
+        super().clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'resident': super().__len__(),
+            'resident_bytes': sum(self._bytes),
+            'spilled': self._spilled,
+            'evictions': dict(self.evictions),
+            'reloads': self.reloads,
+        }
@@ -0,0 +1,60 @@
+import random
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.aggregates import BillAggregates, DDSketch
+from api.backend import bills_repository
+from api.services import create_bill, create_bills
+
+class DDSketchTests(TestCase):
+    def test_quantiles_within_relative_accuracy(self):
+        rng = random.Random(7)
+        values = sorted(rng.lognormvariate(3, 1) for _ in range(20000))
+        sketch = DDSketch(0.01)
+        for value in values:
+            sketch.add(value)
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q), exact, delta=exact * 0.011)
+
+    def test_remove_and_merge(self):
+        sketch, other = DDSketch(), DDSketch()
+        for value in (-5, 0, 10, 20):
+            sketch.add(value)
+        other.add(30)
+        sketch.merge(other)
+        sketch.remove(30)
+        sketch.remove(-5)
+        self.assertEqual(sketch.count, 3)
+        self.assertAlmostEqual(sketch.quantile(1.0), 20, delta=0.2)
+        self.assertEqual(sketch.quantile(0.0), 0.0)
+        self.assertIsNone(DDSketch().quantile(0.5))
+
+class BillStatsTests(TestCase):
+    def setUp(self):
+        bills_repository.clear()
+
+    def test_upserts_replace_the_old_amounts(self):
+        create_bill('u1', electricity_bill=100, water_bill=10)
+        create_bill('u2', electricity_bill=50)
+        create_bill('u1', electricity_bill=30, water_bill=20)
+        create_bills([{'user_id': 'u3', 'electricity_bill': '20.00'}, {'user_id': 'u3', 'electricity_bill': '40.00'}])
+        response = APIClient().get(reverse('bill_stats'))
+        self.assertEqual(response.status_code, 200)
+        electricity = response.data['categories']['electricity_bill']
+        self.assertEqual(response.data['users'], 3)
+        self.assertEqual((electricity['count'], electricity['total'], electricity['mean']), (3, 120.0, 40.0))
+        self.assertAlmostEqual(electricity['p50'], 40, delta=0.4)
+        self.assertEqual(response.data['categories']['water_bill']['total'], 20.0)
+
+    def test_deletes_and_clear_are_reflected(self):
+        stats = BillAggregates()
+        stats.on_set('u1', {'user_id': 'u1', 'phone_bill': '9.99'})
+        stats.on_set('u2', {'user_id': 'u2', 'phone_bill': '0.01'})
+        stats.on_delete('u1', {'user_id': 'u1', 'phone_bill': '9.99'})
+        self.assertEqual(stats.stats()['categories']['phone_bill']['total'], 0.01)
+        stats.on_clear()
+        self.assertEqual(stats.stats()['users'], 0)
+        self.assertIsNone(stats.stats()['categories']['phone_bill']['p99'])
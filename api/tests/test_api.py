@@ -2,7 +2,7 @@ from django.test import TestCase
 from django.urls import reverse
 from rest_framework.test import APIClient
 from .factories import IntentFactory, InteractionEventFactory, GroupedIntentFactory, BillFactory
-from api.services import bills_repository, intents_repository, grouped_intents_repository, interaction_events_repository
+from api.backend import bills_repository, intents_repository, grouped_intents_repository, interaction_events_repository
 
 class APITests(TestCase):
     def setUp(self):
@@ -31,6 +31,14 @@ class APITests(TestCase):
         self.assertEqual(response.data['intent_text'], 'test intent')
         self.assertEqual(len(response.data['interaction_events']), 2)
 
+    def test_record_intent_keeps_events_that_are_not_objects(self):
+        data = {'intent_text': 'test intent', 'interaction_events': [1, 2]}
+        response = self.client.post(reverse('record_intent'), data, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['interaction_events'], [1, 2])
+        response = self.client.get(reverse('get_interactions'), {'intent_text': 'test intent'})
+        self.assertEqual(response.json(), [1, 2])
+
     def test_get_interactions(self):
         # First create an intent with interactions
         data = {
@@ -82,6 +90,14 @@ class APITests(TestCase):
         self.assertEqual(response.data['internet_bill'], '75.00')
         self.assertEqual(response.data['phone_bill'], '45.75')
 
+    def test_create_bill_rejects_invalid_amounts(self):
+        for amount in [123456789, 'lots', None]:
+            response = self.client.post(reverse('create_bill'), {'user_id': 'test_user', 'electricity_bill': amount},
+                                        format='json')
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['error'], 'electricity_bill must be a number')
+        self.assertEqual(self.client.get(reverse('get_bills'), {'user_id': 'test_user'}).status_code, 404)
+
     def test_record_intent_missing_text(self):
         data = {
             'interaction_events': [
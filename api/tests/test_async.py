@@ -0,0 +1,69 @@
+import tempfile
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from django.test import AsyncClient, TestCase, override_settings
+from django.urls import reverse
+
+from api.backend import never_blocks, grouped_intents_repository, intents_repository
+from api.repositories import InMemoryRepository, PersistentRepository
+from api.similarity import llm_cache
+
+def completion(content):
+    response = MagicMock()
+    response.choices[0].message.content = content
+    response.usage = None
+    return response
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.async_client = AsyncClient()
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+        llm_cache.clear()
+
+    async def test_record_intent_async(self):
+        response = await self.async_client.post(
+            reverse('record_intent_async'),
+            {'intent_text': 'pay my bill', 'interaction_events': [{'event_type': 'click'}]},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['intent_text'], 'pay my bill')
+
+    async def test_record_intent_async_missing_text(self):
+        response = await self.async_client.post(reverse('record_intent_async'), {}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['error'], 'intent_text is required')
+
+    async def test_get_interactions_async_missing_param(self):
+        response = await self.async_client.get(reverse('get_interactions_async'))
+        self.assertEqual(response.status_code, 400)
+
+    async def test_get_interactions_async_not_found(self):
+        response = await self.async_client.get(reverse('get_interactions_async'), {'intent_text': 'nothing'})
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(INTENT_SIMILARITY_THRESHOLD=1.01, INTENT_LLM_TIEBREAK_FLOOR=-1.0)
+    async def test_get_interactions_async_asks_the_async_client(self):
+        events = [{'event_type': 'click'}]
+        grouped_intents_repository['1'] = {'id': 1, 'intent_text': 'pay my bill', 'count': 1,
+                                           'interaction_events': events}
+        async_client = MagicMock()
+        async_client.chat.completions.create = AsyncMock(return_value=completion('pay my bill'))
+        with patch('api.similarity.get_async_client', return_value=async_client):
+            response = await self.async_client.get(reverse('get_interactions_async'), {'intent_text': 'settle invoice'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), events)
+        async_client.chat.completions.create.assert_awaited_once()
+
+class CallRepositoryTests(TestCase):
+    def test_only_the_plain_in_memory_backend_runs_on_the_event_loop(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        persistent = PersistentRepository(directory.name)
+        self.addCleanup(persistent.close)
+        bounded = InMemoryRepository(intents_max_bytes=1024)
+        self.addCleanup(bounded.close)
+        self.assertTrue(never_blocks(InMemoryRepository()))
+        self.assertFalse(never_blocks(persistent))
+        self.assertFalse(never_blocks(bounded))
@@ -0,0 +1,72 @@
+import json
+import threading
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from api.backend import grouped_intents_repository, intents_repository
+from api.batching import MicroBatcher
+from api.intent_grouping import intent_batcher
+from api.services import IntentService
+
+def completion(content):
+    response = mock.Mock()
+    response.choices = [mock.Mock()]
+    response.choices[0].message.content = content
+    return response
+
+class MicroBatcherTests(TestCase):
+    def test_concurrent_submissions_share_a_batch(self):
+        batches = []
+        batcher = MicroBatcher(lambda items: batches.append(items) or [item * 2 for item in items],
+                               window=0.5, max_batch_size=4)
+        futures = [batcher.submit(i) for i in range(4)]
+        self.assertEqual([future.result(timeout=5) for future in futures], [0, 2, 4, 6])
+        self.assertEqual(batches, [[0, 1, 2, 3]])
+        stats = batcher.stats()
+        self.assertEqual((stats['batches'], stats['max_batch_size']), (1, 4))
+
+    def test_window_flushes_partial_batches(self):
+        batcher = MicroBatcher(lambda items: items, window=0.01, max_batch_size=100)
+        self.assertEqual(batcher.submit('a').result(timeout=5), 'a')
+        self.assertGreater(batcher.stats()['max_wait_seconds'], 0)
+
+    def test_errors_reach_every_caller(self):
+        batcher = MicroBatcher(lambda items: [], window=0.01)
+        with self.assertRaises(RuntimeError):
+            batcher.submit('a').result(timeout=5)
+
+@override_settings(INTENT_LLM_TIEBREAK_FLOOR=0.0)
+class GroupIntentsTests(TestCase):
+    def setUp(self):
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+
+    def test_one_llm_request_groups_the_whole_batch(self):
+        with mock.patch('api.similarity.client') as client:
+            IntentService.create_intent('pay my bill', [])
+            client.chat.completions.create.return_value = completion(
+                json.dumps({'0': 'pay my bill', '1': None, '2': 1})
+            )
+            intents = [IntentService.store_intent(text, []) for text in
+                       ['settle invoice', 'open settings', 'show preferences']]
+            grouped = IntentService.group_intents(intents)
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+        self.assertEqual([group['id'] for group in grouped], [1, 2, 2])
+        self.assertEqual(grouped_intents_repository['2']['count'], 2)
+        self.assertEqual([intent['grouping_status'] for intent in intents], ['grouped'] * 3)
+
+    @override_settings(INTENT_BATCHING=True)
+    def test_group_intent_goes_through_the_batcher(self):
+        with mock.patch('api.similarity.client'):
+            barrier = threading.Barrier(3)
+            def record(text):
+                barrier.wait()
+                IntentService.create_intent(text, [])
+            threads = [threading.Thread(target=record, args=(text,)) for text in ['a b', 'c d', 'e f']]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(grouped_intents_repository), 3)
+        self.assertGreaterEqual(intent_batcher.stats()['items'], 3)
@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import bills_repository
+from api.services import create_bills, format_amount
+
+class FormatAmountTests(TestCase):
+    def test_formats_and_validates(self):
+        self.assertEqual(format_amount('12.50'), '12.50')
+        self.assertEqual(format_amount(' 7 '), '7.00')
+        self.assertEqual(format_amount(3.456), '3.46')
+        self.assertEqual(format_amount(''), '0.00')
+        for value in ['abc', 'nan', float('inf'), 1e9, None, True]:
+            with self.assertRaises(ValueError):
+                format_amount(value)
+
+class BulkBillTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        bills_repository.clear()
+
+    @override_settings(BILL_IMPORT_BATCH_SIZE=2)
+    def test_json_array_is_validated_in_one_pass(self):
+        bills = [
+            {'user_id': 'u1', 'electricity_bill': 10, 'water_bill': '2.5'},
+            {'user_id': '', 'electricity_bill': 1},
+            {'user_id': 'u2', 'phone_bill': 'lots'},
+            {'user_id': 'u3', 'internet_bill': 30},
+            {'user_id': 'u4'},
+        ]
+        response = self.client.post(reverse('create_bills_bulk'), bills, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (3, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [1, 2])
+        self.assertEqual(response.data['errors'][1]['error'], 'phone_bill must be a number')
+        self.assertEqual(bills_repository['u1']['water_bill'], '2.50')
+        self.assertEqual(bills_repository['u4']['phone_bill'], '0.00')
+
+    def test_ndjson_body(self):
+        body = '\n'.join(json.dumps({'user_id': f"u{i}", 'water_bill': i}) for i in range(5)) + '\nnot json\n'
+        response = self.client.post(reverse('create_bills_bulk'), body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data['created'], response.data['failed']), (5, 1))
+        self.assertEqual(bills_repository['u3']['water_bill'], '3.00')
+
+    def test_nothing_valid_is_a_bad_request(self):
+        response = self.client.post(reverse('create_bills_bulk'), [{'water_bill': 1}], format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(reverse('create_bills_bulk'), {'user_id': 'u1'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_rows_are_consumed_lazily(self):
+        rows = ({'user_id': f"u{i}"} for i in range(10))
+        report = create_bills(rows, batch_size=3)
+        self.assertEqual(report['created'], 10)
+        self.assertIsNotNone(report['rows_per_second'])
+
+class ImportBillsCommandTests(TestCase):
+    def setUp(self):
+        bills_repository.clear()
+
+    def test_imports_a_csv_file(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            handle.write('user_id,electricity_bill,water_bill,internet_bill,phone_bill\n')
+            handle.write('u1,10,20,30,40\n')
+            handle.write('u2,oops,0,0,0\n')
+        self.addCleanup(os.unlink, handle.name)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_bills', handle.name, batch_size=1, stdout=stdout, stderr=stderr)
+        self.assertIn('Imported 1 bills, rejected 1', stdout.getvalue())
+        self.assertIn('row 2: electricity_bill must be a number', stderr.getvalue())
+        self.assertEqual(bills_repository['u1']['phone_bill'], '40.00')
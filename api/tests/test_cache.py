@@ -0,0 +1,102 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import TestCase
+
+from api.backend import grouped_intents_repository
+from api.cache import MISSING, LRUTTLCache, SQLiteCache
+from api.services import IntentService
+from api.similarity import are_intents_similar, ask_llm_for_most_similar_intent, llm_cache, llm_client
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def completion(content):
+    response = mock.Mock()
+    response.choices = [mock.Mock()]
+    response.choices[0].message.content = content
+    return response
+
+class LRUTTLCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = LRUTTLCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertIs(cache.get('b'), MISSING)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_entries_expire_after_ttl(self):
+        clock = FakeClock()
+        cache = LRUTTLCache(ttl=10, clock=clock)
+        cache.set('a', None)
+        self.assertIsNone(cache.get('a'))
+        clock.now = 11
+        self.assertIs(cache.get('a'), MISSING)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 1, 1))
+
+class SQLiteCacheTests(TestCase):
+    def test_entries_are_shared_between_instances(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'cache.sqlite3')
+            SQLiteCache(path).set('a', 'pay my bill')
+            other = SQLiteCache(path, max_entries=1)
+            self.assertEqual(other.get('a'), 'pay my bill')
+            other.set('b', True)
+            self.assertIs(other.get('a'), MISSING)
+            self.assertEqual(other.stats()['evictions'], 1)
+
+    def test_hits_and_sets_batch_their_bookkeeping(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = SQLiteCache(os.path.join(directory, 'cache.sqlite3'), max_entries=10, touch_batch=3)
+            cache.set('a', 1)
+            statements = []
+            cache._connection().set_trace_callback(statements.append)
+            cache.set('b', 2)
+            cache.get('a')
+            cache.get('b')
+            self.assertFalse([sql for sql in statements if 'COUNT' in sql or sql.startswith('UPDATE')])
+            cache.set('c', 3)
+            cache.get('c')
+            # Hitting a third key writes the access times of all three at once
+            self.assertEqual(len([sql for sql in statements if sql.startswith('UPDATE')]), 3)
+            self.assertEqual(len(cache), 3)
+
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        grouped_intents_repository.clear()
+        llm_cache.clear()
+        llm_client.breaker.reset()
+
+    def test_similarity_verdicts_are_cached(self):
+        with mock.patch('api.similarity.client') as client:
+            client.chat.completions.create.return_value = completion('true')
+            self.assertTrue(are_intents_similar('Pay my bill', 'settle invoice'))
+            self.assertTrue(are_intents_similar('settle invoice', 'pay my bill'))
+        self.assertEqual(client.chat.completions.create.call_count, 1)
+
+    def test_new_groups_invalidate_most_similar_verdicts(self):
+        with mock.patch('api.similarity.client') as client:
+            client.chat.completions.create.return_value = completion('pay my bill')
+            IntentService.create_intent('pay my bill', [])
+            ask_llm_for_most_similar_intent('settle my invoice')
+            self.assertEqual(ask_llm_for_most_similar_intent('settle my invoice')['id'], 1)
+            self.assertEqual(client.chat.completions.create.call_count, 1)
+            IntentService.create_intent('open settings', [])
+            ask_llm_for_most_similar_intent('settle my invoice')
+        self.assertEqual(client.chat.completions.create.call_count, 2)
+
+    def test_errors_are_not_cached(self):
+        with mock.patch('api.similarity.client') as client:
+            client.chat.completions.create.side_effect = RuntimeError('upstream down')
+            self.assertFalse(are_intents_similar('a', 'b'))
+            self.assertFalse(are_intents_similar('a', 'b'))
+        self.assertEqual(client.chat.completions.create.call_count, 2 * llm_client.max_attempts)
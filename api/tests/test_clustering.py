@@ -0,0 +1,71 @@
+import io
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.backend import grouped_intents_repository, intent_assignments_repository, intents_repository, repository
+from api.clustering import TextClusterer, UnionFind
+from api.indexes import grouped_intent_indexes
+from api.matching import HashedNgramEmbedder
+
+TEXTS = ['pay my electricity bill', 'pay my electricity bills', 'open the settings', 'open settings',
+         'call customer support', 'show my profile']
+
+class TextClustererTests(TestCase):
+    def test_union_find(self):
+        sets = UnionFind(4)
+        self.assertTrue(sets.union(0, 1))
+        self.assertTrue(sets.union(2, 1))
+        self.assertFalse(sets.union(0, 2))
+        self.assertNotEqual(sets.find(3), sets.find(0))
+
+    def test_finds_similar_pairs_in_a_process_pool(self):
+        embedder = HashedNgramEmbedder()
+        vectors = {}
+        for workers in (1, 2):
+            clusterer = TextClusterer(embedder, threshold=0.75, workers=workers)
+            vectors[workers] = clusterer.embed(TEXTS)
+            self.assertEqual({(i, j) for i, j, _ in clusterer.similar_pairs(vectors[workers])}, {(0, 1), (2, 3)})
+        np.testing.assert_array_equal(vectors[1], vectors[2])
+
+    def test_leaders_do_not_chain(self):
+        # b is similar to both a and c, but a and c are not similar to each other
+        a, c = np.eye(2, dtype=np.float32)
+        b = (a + c) / np.linalg.norm(a + c)
+        clusterer = TextClusterer(HashedNgramEmbedder(), threshold=0.7, workers=1, bands=4, rows=1)
+        self.assertEqual(clusterer.leaders(np.stack([a, b, c])), [0, 0, 2])
+
+class RegroupIntentsCommandTests(TestCase):
+    def setUp(self):
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+        # Duplicates of one intent, as created by racing requests or early mistakes
+        for text in ['pay my electricity bill', 'pay my electricity bills', 'open settings', 'pay my electricity bill']:
+            intent = repository.create_intent(text, [{'timestamp': len(intents_repository), 'screen_name': text}])
+            grouped_intent = repository.create_grouped_intent(text, intent['interaction_events'])
+            intent.update(grouping_status='grouped', grouped_intent_id=grouped_intent['id'])
+            repository.set_assignment(text, str(grouped_intent['id']))
+
+    def regroup(self, *args):
+        stdout = io.StringIO()
+        call_command('regroup_intents', *args, '--workers', '1', stdout=stdout)
+        return stdout.getvalue()
+
+    def test_dry_run_reports_without_merging(self):
+        output = self.regroup('--dry-run')
+        self.assertIn("#1 'pay my electricity bill' (1) <- #2 'pay my electricity bills' (1), #4", output)
+        self.assertIn('Would merge 2 of 4 grouped intents into 1', output)
+        self.assertEqual(len(grouped_intents_repository), 4)
+
+    def test_merges_counts_events_intents_and_assignments(self):
+        self.regroup()
+        self.assertEqual(sorted(grouped_intents_repository), ['1', '3'])
+        merged = repository.get_grouped_intent('1')
+        self.assertEqual(merged['count'], 3)
+        self.assertEqual([event['timestamp'] for event in merged['interaction_events']], [0, 1, 3])
+        self.assertEqual({intent['grouped_intent_id'] for intent in intents_repository.values()}, {1, 3})
+        self.assertEqual(intent_assignments_repository['pay my electricity bills'], '1')
+        self.assertEqual(grouped_intent_indexes.texts.get('pay my electricity bill'), '1')
+        # Writers still holding a merged grouped intent land on the one it was merged into
+        self.assertEqual(repository.increment_grouped_intent({'id': 2})['count'], 4)
@@ -0,0 +1,62 @@
+import datetime
+import io
+import json
+from decimal import Decimal
+from unittest import mock, skipIf
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.test import APIClient
+from rest_framework.utils.encoders import JSONEncoder
+
+from api import codecs
+from api.backend import bills_repository
+from api.events import EventLog, EventStore
+
+def sample():
+    return {
+        'events': EventLog(EventStore(), [{'timestamp': 1, 'view_id': 2, 'screen_name': 'Bills'}]),
+        'amount': Decimal('12.50'),
+        'at': datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc),
+        'text': 'héllo',
+        7: None,
+    }
+
+class CodecTests(TestCase):
+    def test_matches_drf_encoder(self):
+        expected = json.loads(json.dumps(sample(), cls=JSONEncoder))
+        self.assertEqual(json.loads(codecs.dumps(sample())), expected)
+        with mock.patch.object(codecs, 'orjson', None):
+            self.assertEqual(json.loads(codecs.dumps(sample())), expected)
+
+    def test_oversized_integers_fall_back_to_the_stdlib(self):
+        self.assertEqual(codecs.loads(codecs.dumps({'n': 2 ** 70})), {'n': 2 ** 70})
+
+    def test_parser_rejects_malformed_json(self):
+        parser = codecs.FastJSONParser()
+        self.assertEqual(parser.parse(io.BytesIO(b'{"a": [1, 2]}')), {'a': [1, 2]})
+        for body in [b'{"a": ', b'{"a": NaN}']:
+            with self.assertRaises(ParseError):
+                parser.parse(io.BytesIO(body))
+
+@skipIf(codecs.msgpack is None, 'msgpack is not installed')
+class MessagePackNegotiationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        bills_repository.clear()
+
+    def test_msgpack_request_and_response(self):
+        body = codecs.msgpack.packb({'user_id': 'u1', 'electricity_bill': '10.5'})
+        response = self.client.post(reverse('create_bill'), body, content_type='application/msgpack',
+                                     HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(codecs.msgpack.unpackb(response.content)['electricity_bill'], '10.50')
+        # JSON stays the default
+        response = self.client.get(reverse('get_bills'), {'user_id': 'u1'})
+        self.assertEqual(response.json()['user_id'], 'u1')
+
+    def test_malformed_msgpack_is_rejected(self):
+        response = self.client.post(reverse('create_bill'), b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
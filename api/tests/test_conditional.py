@@ -0,0 +1,115 @@
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import bills_repository, grouped_intents_repository
+from api.conditional import VersionTracker, if_none_match, version_etag
+from api.intent_grouping import assign_to_group
+from api.services import IntentService, create_bill, get_bills, response_cache, response_etag
+
+def make_events(count):
+    return [{'timestamp': 1000 + i, 'view_id': i, 'action_type': 'CLICK'} for i in range(count)]
+
+class VersionTrackerTests(TestCase):
+    def test_versions_are_never_reused(self):
+        tracker = VersionTracker()
+        untouched = tracker.version('b')
+        first = tracker.bump('a')
+        self.assertGreater(first, untouched)
+        tracker.on_clear()
+        # Cleared keys move to a new generation instead of falling back to an old version
+        self.assertNotIn(tracker.version('a'), (first, untouched))
+        self.assertNotEqual(tracker.version('b'), untouched)
+
+    def test_if_none_match(self):
+        etag = version_etag('bill', 'u1', 3)
+        self.assertTrue(if_none_match(f'"other", {etag}', etag))
+        self.assertTrue(if_none_match(f"W/{etag}", etag))
+        self.assertTrue(if_none_match('*', etag))
+        self.assertFalse(if_none_match(None, etag))
+        self.assertNotEqual(version_etag('bill', 'u1', 3, [('limit', 2)]), etag)
+
+    def test_tags_from_before_a_restart_never_match(self):
+        etag = version_etag('bill', 'u1', 3)
+        with mock.patch('api.conditional._epoch', 'restarted'):
+            self.assertNotEqual(version_etag('bill', 'u1', 3), etag)
+
+class ConditionalBillTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        bills_repository.clear()
+        response_cache.clear()
+        create_bill('u1', '10.00', '20.00', '30.00', '40.00')
+
+    def test_unchanged_bill_is_not_modified(self):
+        url = reverse('get_bills')
+        response = self.client.get(url, {'user_id': 'u1'})
+        etag = response['ETag']
+        response = self.client.get(url, {'user_id': 'u1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+
+    def test_update_changes_the_etag(self):
+        url = reverse('get_bills')
+        etag = self.client.get(url, {'user_id': 'u1'})['ETag']
+        create_bill('u1', '11.00', '20.00', '30.00', '40.00')
+        response = self.client.get(url, {'user_id': 'u1'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['electricity_bill'], '11.00')
+
+    def test_missing_bill_is_not_found_whatever_the_tag(self):
+        url = reverse('get_bills')
+        self.assertEqual(self.client.get(url, {'user_id': 'u1'}, HTTP_IF_NONE_MATCH='*').status_code, 304)
+        # The tag a missing user's bill would have
+        for tag in ('*', response_etag('bill', 'u2')):
+            response = self.client.get(url, {'user_id': 'u2'}, HTTP_IF_NONE_MATCH=tag)
+            self.assertEqual(response.status_code, 404)
+
+    def test_write_during_a_read_never_caches_the_old_body_under_the_new_tag(self):
+        url = reverse('get_bills')
+
+        def read_then_write(user_id):
+            bill = get_bills(user_id)
+            create_bill('u1', '11.00', '20.00', '30.00', '40.00')
+            return bill
+
+        with mock.patch('api.views.get_bills', side_effect=read_then_write):
+            self.assertEqual(self.client.get(url, {'user_id': 'u1'}).json()['electricity_bill'], '10.00')
+        self.assertEqual(self.client.get(url, {'user_id': 'u1'}).json()['electricity_bill'], '11.00')
+
+    def test_encoded_body_is_reused(self):
+        url = reverse('get_bills')
+        first = self.client.get(url, {'user_id': 'u1'})
+        hits = response_cache.hits
+        second = self.client.get(url, {'user_id': 'u1'})
+        self.assertEqual(response_cache.hits, hits + 1)
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['Content-Type'], first['Content-Type'])
+
+class ConditionalInteractionsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        grouped_intents_repository.clear()
+        grouped_intents_repository['1'] = {'id': 1, 'intent_text': 'pay my bill', 'count': 1,
+                                           'interaction_events': make_events(5)}
+
+    def test_pages_have_their_own_etags(self):
+        url = reverse('get_interactions')
+        full = self.client.get(url, {'intent_text': 'pay my bill'})['ETag']
+        page = self.client.get(url, {'intent_text': 'pay my bill', 'limit': 2})['ETag']
+        self.assertNotEqual(full, page)
+        response = self.client.get(url, {'intent_text': 'pay my bill', 'limit': 2}, HTTP_IF_NONE_MATCH=page)
+        self.assertEqual(response.status_code, 304)
+
+    def test_grouping_into_the_intent_changes_the_etag(self):
+        url = reverse('get_interactions')
+        etag = self.client.get(url, {'intent_text': 'pay my bill'})['ETag']
+        assign_to_group({'id': 99, 'intent_text': 'pay my bill', 'interaction_events': []},
+                        grouped_intents_repository['1'])
+        response = self.client.get(url, {'intent_text': 'pay my bill'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
@@ -0,0 +1,57 @@
+import json
+
+from django.test import TestCase
+from rest_framework.utils.encoders import JSONEncoder
+
+from api.events import EventLog, EventStore
+
+def make_event(i):
+    return {'timestamp': 1700000000000 + i, 'view_id': i % 7, 'view_resource_name': f"button_{i % 3}",
+            'screen_name': 'Bills', 'action_type': 'CLICK'}
+
+class EventLogTests(TestCase):
+    def setUp(self):
+        self.store = EventStore(chunk_size=4)
+
+    def test_round_trips_across_chunks(self):
+        events = [make_event(i) for i in range(10)]
+        log = EventLog(self.store, events[:3])
+        other = EventLog(self.store, [make_event(99)])
+        log.extend(events[3:])
+        self.assertEqual(len(log), 10)
+        self.assertEqual(log, events)
+        self.assertEqual(log[5], events[5])
+        self.assertEqual(log[-1], events[-1])
+        self.assertEqual(log[3:6], events[3:6])
+        self.assertEqual(log.column('view_resource_name'), [event['view_resource_name'] for event in events])
+        self.assertEqual(other, [make_event(99)])
+        # Five distinct strings, however many events
+        self.assertEqual(len(self.store.interner), 5)
+
+    def test_events_outside_the_schema_are_kept_verbatim(self):
+        events = [
+            {'event_type': 'click', 'timestamp': '2024-01-01T00:00:00Z'},
+            {'timestamp': 5, 'action_type': 'SCROLL'},
+            {'view_id': None},
+        ]
+        log = EventLog(self.store, events)
+        log.append(make_event(1))
+        self.assertEqual(log.tolist(), events + [make_event(1)])
+        self.assertEqual(log.column('timestamp'), ['2024-01-01T00:00:00Z', 5, None, make_event(1)['timestamp']])
+
+    def test_events_that_are_not_objects_are_kept_verbatim(self):
+        events = [1, 'tap', None, [2, 3], make_event(0)]
+        log = EventLog(self.store, events)
+        self.assertEqual(log.tolist(), events)
+        self.assertEqual(log.column('timestamp'), [None, None, None, None, make_event(0)['timestamp']])
+
+    def test_rows_are_materialized_by_the_json_encoder(self):
+        log = EventLog(self.store, [make_event(0)])
+        self.assertEqual(json.loads(json.dumps({'events': log}, cls=JSONEncoder)), {'events': [make_event(0)]})
+
+    def test_columns_are_compact(self):
+        store = EventStore()
+        log = EventLog(store, (make_event(i) for i in range(1000)))
+        self.assertEqual(len(log), 1000)
+        # 1 byte presence mask, two int64 and three uint32 columns per row
+        self.assertLess(store.nbytes(), 1000 * 40)
@@ -0,0 +1,76 @@
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import grouped_intents_repository, intents_repository, repository
+from api.grouping import GroupingPipeline
+from api.intent_grouping import grouping_pipeline, resume_pending_grouping
+
+class GroupingPipelineTests(TestCase):
+    def test_rejects_items_when_queue_is_full(self):
+        release = threading.Event()
+        handled = []
+        pipeline = GroupingPipeline(lambda item: (release.wait(), handled.append(item)), workers=1, max_queue=1)
+        self.assertTrue(pipeline.submit(1))
+        # Wait for the worker to take the first item off the queue
+        while pipeline.stats()['queued']:
+            pass
+        self.assertTrue(pipeline.submit(2))
+        self.assertFalse(pipeline.submit(3))
+        release.set()
+        pipeline.join()
+        self.assertEqual(handled, [1, 2])
+        self.assertEqual(pipeline.stats()['rejected'], 1)
+
+    def test_handler_errors_are_counted(self):
+        pipeline = GroupingPipeline(lambda item: 1 / 0, workers=1)
+        pipeline.submit(1)
+        pipeline.join()
+        self.assertEqual(pipeline.stats()['failed'], 1)
+
+@override_settings(INTENT_GROUPING_MODE='async', INTENT_LLM_TIEBREAK=False)
+class AsyncGroupingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+
+    def test_record_intent_is_acknowledged_before_grouping(self):
+        data = {'intent_text': 'pay my bill', 'interaction_events': [{'event_type': 'click'}]}
+        with mock.patch('api.intent_grouping.find_most_similar_intent', return_value=None) as find:
+            gate = threading.Event()
+            find.side_effect = lambda text: gate.wait() and None
+            response = self.client.post(reverse('record_intent'), data, format='json')
+            self.assertEqual(response.status_code, 202)
+            self.assertEqual(response.data['grouping_status'], 'pending')
+
+            poll = self.client.get(reverse('get_intent', args=[response.data['id']]))
+            self.assertEqual(poll.data['grouping_status'], 'pending')
+            gate.set()
+            grouping_pipeline.join()
+
+        poll = self.client.get(reverse('get_intent', args=[response.data['id']]))
+        self.assertEqual(poll.data['grouping_status'], 'grouped')
+        self.assertEqual(poll.data['grouped_intent_id'], 1)
+        self.assertEqual(grouped_intents_repository['1']['count'], 1)
+
+    def test_get_intent_not_found(self):
+        response = self.client.get(reverse('get_intent', args=[42]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_intents_recovered_as_pending_are_grouped(self):
+        intent = repository.create_intent('pay my bill', [{'event_type': 'click'}])
+        with mock.patch('api.intent_grouping.find_most_similar_intent', return_value=None), \
+                mock.patch.object(repository, 'take_recovered_pending', return_value=[intent['id']]):
+            self.assertEqual(resume_pending_grouping(), 1)
+            deadline = time.monotonic() + 5
+            while repository.get_intent(intent['id'])['grouping_status'] == 'pending' \
+                    and time.monotonic() < deadline:
+                time.sleep(0.01)
+            grouping_pipeline.join()
+        self.assertEqual(repository.get_intent(intent['id'])['grouping_status'], 'grouped')
+        self.assertEqual(grouped_intents_repository['1']['count'], 1)
@@ -0,0 +1,160 @@
+import asyncio
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import grouped_intents_repository, intents_repository
+from api.llm import CircuitBreaker, LLMUnavailable, ResilientLLMClient
+from api.services import IntentService
+from api.similarity import find_most_similar_intent, llm_cache, llm_client
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class FakeCompletions:
+    """Answers after the given delays in call order, raising exceptions instead of answering"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _next(self):
+        with self._lock:
+            outcome = self.outcomes[min(self.calls, len(self.outcomes) - 1)]
+            self.calls += 1
+        return outcome
+
+    def create(self, timeout=None, **kwargs):
+        delay, result = self._next()
+        time.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise TimeoutError('request timed out')
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+def fake_client(*outcomes):
+    client = mock.MagicMock()
+    client.chat.completions = FakeCompletions(*outcomes)
+    return client
+
+class CircuitBreakerTests(TestCase):
+    def test_opens_after_consecutive_failures_and_probes_once(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+        breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        clock.now = 10
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        clock.now = 20
+        self.assertTrue(breaker.allow())
+        breaker.record_success()
+        self.assertEqual(breaker.stats(), {'state': 'closed', 'consecutive_failures': 0, 'opened': 2, 'rejected': 2})
+
+class ResilientLLMClientTests(TestCase):
+    def test_hedge_answers_when_the_first_attempt_is_slow(self):
+        client = fake_client((1.0, 'slow'), (0.0, 'fast'))
+        resilient = ResilientLLMClient(lambda: client, timeout=2.0, hedge_after=0.05)
+        self.assertEqual(resilient.create(model='m'), 'fast')
+        self.assertEqual(resilient.stats()['hedges'], 1)
+
+    def test_failures_are_retried_within_the_deadline(self):
+        client = fake_client((0.0, RuntimeError('boom')), (0.0, 'ok'))
+        resilient = ResilientLLMClient(lambda: client, timeout=1.0, hedge_after=None)
+        self.assertEqual(resilient.create(model='m'), 'ok')
+        self.assertEqual((resilient.retries, resilient.errors), (1, 1))
+
+    def test_deadline_is_enforced_and_trips_the_breaker(self):
+        client = fake_client((1.0, 'late'))
+        resilient = ResilientLLMClient(lambda: client, timeout=0.05, hedge_after=None,
+                                       breaker=CircuitBreaker(failure_threshold=1))
+        started = time.monotonic()
+        with self.assertRaises(LLMUnavailable):
+            resilient.create(model='m')
+        self.assertLess(time.monotonic() - started, 0.5)
+        with self.assertRaisesRegex(LLMUnavailable, 'breaker'):
+            resilient.create(model='m')
+        self.assertEqual(client.chat.completions.calls, 1)
+        self.assertEqual(resilient.stats()['breaker']['state'], 'open')
+
+    def test_deadline_starts_when_the_attempt_gets_a_thread(self):
+        client = fake_client((0.4, 'ok'))
+        resilient = ResilientLLMClient(lambda: client, timeout=0.5, hedge_after=None, max_workers=1)
+        resilient._executor.submit(time.sleep, 0.2)
+        # Queued 0.2s, then answers 0.4s after starting: within the deadline
+        self.assertEqual(resilient.create(model='m'), 'ok')
+
+    def test_saturated_pool_does_not_trip_the_breaker(self):
+        client = fake_client((0.0, 'ok'))
+        resilient = ResilientLLMClient(lambda: client, timeout=0.05, hedge_after=None, max_workers=1,
+                                       breaker=CircuitBreaker(failure_threshold=1))
+        release = threading.Event()
+        self.addCleanup(release.set)
+        resilient._executor.submit(release.wait)
+        with self.assertRaisesRegex(LLMUnavailable, 'no worker free'):
+            resilient.create(model='m')
+        release.set()
+        # The queued attempt was cancelled instead of running late
+        self.assertEqual(resilient.create(model='m'), 'ok')
+        self.assertEqual(client.chat.completions.calls, 1)
+        stats = resilient.stats()
+        self.assertEqual((stats['saturated'], stats['timeouts']), (1, 0))
+        self.assertEqual(stats['breaker']['state'], 'closed')
+
+    def test_async_hedge(self):
+        async def create(timeout=None, **kwargs):
+            await asyncio.sleep(1.0 if calls.pop(0) else 0)
+            return 'answer'
+
+        calls = [True, False]
+        client = mock.MagicMock()
+        client.chat.completions.create = create
+        resilient = ResilientLLMClient(None, lambda: client, timeout=2.0, hedge_after=0.05)
+        self.assertEqual(asyncio.run(resilient.acreate(model='m')), 'answer')
+        self.assertEqual(resilient.hedges, 1)
+
+@override_settings(INTENT_SIMILARITY_THRESHOLD=1.01, INTENT_LLM_TIEBREAK_FLOOR=0.3)
+class LocalFallbackTests(TestCase):
+    def setUp(self):
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+        llm_cache.clear()
+        self.addCleanup(llm_client.breaker.reset)
+
+    def test_open_breaker_falls_back_to_the_closest_group(self):
+        with mock.patch('api.similarity.client') as client:
+            IntentService.create_intent('pay my electricity bill', [])
+            for _ in range(llm_client.breaker.failure_threshold):
+                llm_client.breaker.record_failure()
+            self.assertEqual(find_most_similar_intent('pay electricity bill')['id'], 1)
+            IntentService.create_intent('pay the electricity bill', [])
+        client.chat.completions.create.assert_not_called()
+        self.assertEqual(len(grouped_intents_repository), 1)
+        self.assertGreaterEqual(llm_client.stats()['fallbacks']['most_similar'], 2)
+
+    def test_status_endpoint_reports_breaker_state(self):
+        response = APIClient().get(reverse('llm_status'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['breaker']['state'], 'closed')
+        self.assertIn('fallbacks', response.data)
+        self.assertIn('mean_batch_size', response.data['batching'])
+        self.assertIn('max_wait_seconds', response.data['batching'])
+        self.assertIn('prompt_tokens', response.data['usage'])
+        self.assertLessEqual({'hits', 'misses', 'evictions'}, set(response.data['cache']))
@@ -0,0 +1,80 @@
+import io
+import json
+import logging
+import threading
+
+from django.test import TestCase
+
+from api.logs import SAMPLED, BackgroundQueueHandler, JSONFormatter, SamplingFilter
+
+def make_record(msg, *args, lineno=1, extra=None, exc_info=None):
+    record = logging.LogRecord('api.services', logging.INFO, '/app/api/services.py', lineno, msg, args, exc_info)
+    for key, value in (extra or {}).items():
+        setattr(record, key, value)
+    return record
+
+class BlockingStream(io.StringIO):
+    """Stream whose writes wait until released, to keep the writer thread busy"""
+
+    def __init__(self):
+        super().__init__()
+        self.writing = threading.Event()
+        self.release = threading.Event()
+
+    def write(self, text):
+        self.writing.set()
+        self.release.wait(5)
+        return super().write(text)
+
+class SamplingFilterTests(TestCase):
+    def test_keeps_one_in_rate_per_call_site(self):
+        sampler = SamplingFilter(rate=100)
+        kept = [record for record in (make_record('hot', extra=SAMPLED) for _ in range(250)) if sampler.filter(record)]
+        self.assertEqual(len(kept), 3)
+        self.assertEqual(kept[0].sample_rate, 100)
+        # Other call sites have their own count, and unmarked records always pass
+        self.assertTrue(sampler.filter(make_record('hot', lineno=2, extra=SAMPLED)))
+        self.assertTrue(all(sampler.filter(make_record('created')) for _ in range(5)))
+
+class JSONFormatterTests(TestCase):
+    def test_structured_and_capped(self):
+        formatter = JSONFormatter(max_length=20)
+        entry = json.loads(formatter.format(make_record('candidates: %s', ['x' * 50], extra={'intent_id': 7})))
+        self.assertEqual(entry['level'], 'INFO')
+        self.assertEqual(entry['logger'], 'api.services')
+        self.assertTrue(entry['message'].startswith("candidates: ['xxxxx"))
+        self.assertIn('more characters]', entry['message'])
+        self.assertEqual(entry['intent_id'], 7)
+        self.assertNotIn('sampled', entry)
+
+    def test_exceptions_are_included(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            import sys
+            record = make_record('failed', exc_info=sys.exc_info())
+        entry = json.loads(JSONFormatter().format(record))
+        self.assertIn('ValueError: boom', entry['exception'])
+
+class BackgroundQueueHandlerTests(TestCase):
+    def test_records_are_written_by_the_background_thread(self):
+        stream = io.StringIO()
+        handler = BackgroundQueueHandler(stream)
+        handler.setFormatter(JSONFormatter())
+        handler.handle(make_record('Created new grouped intent with ID %s', 3))
+        handler.close()
+        self.assertEqual(json.loads(stream.getvalue())['message'], 'Created new grouped intent with ID 3')
+
+    def test_full_queue_drops_instead_of_blocking(self):
+        stream = BlockingStream()
+        handler = BackgroundQueueHandler(stream, queue_size=1)
+        handler.setFormatter(JSONFormatter())
+        handler.handle(make_record('first'))
+        self.assertTrue(stream.writing.wait(5))
+        # The writer is stuck on the first record: one more fits in the queue, the rest are dropped
+        for i in range(3):
+            handler.handle(make_record('more %d', i))
+        self.assertEqual(handler.dropped, 2)
+        stream.release.set()
+        handler.close()
+        self.assertEqual([json.loads(line)['message'] for line in stream.getvalue().splitlines()], ['first', 'more 0'])
@@ -0,0 +1,146 @@
+from unittest import mock
+
+import numpy as np
+from django.test import TestCase, override_settings
+
+from api.backend import grouped_intents_repository, intent_assignments_repository, intents_repository
+from api.indexes import assignments_by_group, shortlist_candidates
+from api.matching import BM25Index, EmbeddingIndex, HashedNgramEmbedder, NormalizedTextIndex, normalize_text
+from api.services import IntentService
+from api.similarity import ask_llm_for_most_similar_intent, find_most_similar_intent, llm_cache, llm_usage
+
+class HashedNgramEmbedderTests(TestCase):
+    def test_vectors_are_normalized_and_deterministic(self):
+        embedder = HashedNgramEmbedder(dim=128)
+        vector = embedder.embed('pay my bill')
+        self.assertAlmostEqual(float(np.linalg.norm(vector)), 1.0, places=5)
+        np.testing.assert_array_equal(vector, HashedNgramEmbedder(dim=128).embed('pay my bill'))
+
+    def test_similar_texts_score_higher(self):
+        embedder = HashedNgramEmbedder()
+        target = embedder.embed('pay my electricity bill')
+        close = float(target @ embedder.embed('pay electricity bill'))
+        far = float(target @ embedder.embed('show my profile'))
+        self.assertGreater(close, far)
+
+class NormalizedTextIndexTests(TestCase):
+    def test_normalize_text_folds_case_whitespace_and_punctuation(self):
+        self.assertEqual(normalize_text('  Pay my BILL! '), 'pay my bill')
+        self.assertEqual(normalize_text('pay\tmy  bill?'), 'pay my bill')
+
+    def test_lookup_ignores_formatting(self):
+        index = NormalizedTextIndex()
+        index.add('1', 'Pay my bill')
+        index.add('2', 'pay my bill ')
+        self.assertEqual(index.get('PAY MY BILL.'), '1')
+        index.remove('1', 'Pay my bill')
+        self.assertIsNone(index.get('pay my bill'))
+
+class EmbeddingIndexTests(TestCase):
+    def setUp(self):
+        self.index = EmbeddingIndex(HashedNgramEmbedder(dim=64), initial_capacity=2)
+
+    def test_query_returns_nearest_and_grows(self):
+        for key, text in [('1', 'pay my bill'), ('2', 'open settings'), ('3', 'transfer money')]:
+            self.index.add(key, text)
+        self.assertEqual(len(self.index), 3)
+        key, score = self.index.query('pay my bill')
+        self.assertEqual(key, '1')
+        self.assertAlmostEqual(score, 1.0, places=5)
+        self.assertEqual([k for k, _ in self.index.top_k('transfer money', 2)][0], '3')
+
+    def test_remove_keeps_remaining_rows_addressable(self):
+        self.index.add('1', 'pay my bill')
+        self.index.add('2', 'open settings')
+        self.index.remove('1')
+        self.assertEqual(self.index.query('open settings')[0], '2')
+        self.index.clear()
+        self.assertIsNone(self.index.query('open settings'))
+
+class BM25IndexTests(TestCase):
+    def test_ranks_by_shared_rare_tokens(self):
+        index = BM25Index()
+        index.add('1', 'pay my electricity bill')
+        index.add('2', 'pay my water bill')
+        index.add('3', 'open settings')
+        self.assertEqual(index.top_k('electricity bill', 3)[0][0], '1')
+        self.assertEqual({key for key, _ in index.top_k('pay bill', 3)}, {'1', '2'})
+
+    def test_remove_and_replace_update_postings(self):
+        index = BM25Index()
+        index.add('1', 'pay my bill')
+        index.add('1', 'open settings')
+        self.assertEqual(index.top_k('bill', 5), [])
+        index.remove('1')
+        self.assertEqual(len(index), 0)
+        self.assertEqual(index.top_k('settings', 5), [])
+
+class ShortlistTests(TestCase):
+    def setUp(self):
+        grouped_intents_repository.clear()
+        llm_cache.clear()
+        texts = ['pay my electricity bill', 'pay my water bill', 'open settings'] + [f"filler intent {i}" for i in range(50)]
+        for i, text in enumerate(texts, start=1):
+            grouped_intents_repository[str(i)] = {'id': i, 'intent_text': text, 'count': 1, 'interaction_events': []}
+
+    @override_settings(INTENT_LLM_CANDIDATES=3)
+    def test_only_top_k_candidates_reach_the_llm(self):
+        self.assertEqual(shortlist_candidates('pay electricity', 1), ['pay my electricity bill'])
+        with mock.patch('api.similarity.client') as client:
+            client.chat.completions.create.return_value.choices[0].message.content = 'pay my electricity bill'
+            client.chat.completions.create.return_value.usage.prompt_tokens = 42
+            self.assertEqual(ask_llm_for_most_similar_intent('settle electricity invoice')['id'], 1)
+        prompt = client.chat.completions.create.call_args.kwargs['messages'][1]['content']
+        self.assertNotIn('filler intent', prompt)
+        self.assertEqual(llm_usage.stats()['recent'][-1]['candidates_sent'], 3)
+        self.assertEqual(llm_usage.stats()['recent'][-1]['prompt_tokens'], 42)
+
+@override_settings(INTENT_LLM_TIEBREAK=False)
+class FindMostSimilarIntentTests(TestCase):
+    def setUp(self):
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+
+    def test_close_intents_join_the_same_group_without_llm(self):
+        with mock.patch('api.similarity.client') as client:
+            IntentService.create_intent('pay my electricity bill', [])
+            IntentService.create_intent('pay electricity bill', [])
+            IntentService.create_intent('show my profile', [])
+        client.chat.completions.create.assert_not_called()
+        self.assertEqual(len(grouped_intents_repository), 2)
+        self.assertEqual(grouped_intents_repository['1']['count'], 2)
+
+    def test_repeat_texts_resolve_without_llm(self):
+        with mock.patch('api.similarity.client') as client:
+            IntentService.create_intent('Pay my bill', [])
+            self.assertEqual(find_most_similar_intent('pay my bill ')['id'], 1)
+        client.chat.completions.create.assert_not_called()
+
+    def test_assignments_remember_matched_texts(self):
+        with mock.patch('api.similarity.client') as client:
+            IntentService.create_intent('pay my electricity bill', [])
+            IntentService.create_intent('Pay electricity bill!', [])
+        self.assertEqual(intent_assignments_repository['pay electricity bill'], '1')
+        with mock.patch('api.indexes.grouped_intent_indexes.embeddings') as embeddings:
+            self.assertEqual(IntentService.get_interactions('pay electricity bill'), [])
+        embeddings.query.assert_not_called()
+        grouped_intents_repository.clear()
+        self.assertEqual(intent_assignments_repository, {})
+
+    def test_deleted_groups_drop_only_their_assignments(self):
+        for key, text in [('1', 'pay my bill'), ('2', 'open settings')]:
+            grouped_intents_repository[key] = {'id': int(key), 'intent_text': text, 'count': 1,
+                                               'interaction_events': []}
+        intent_assignments_repository.update({'pay bill': '1', 'pay the bill': '1', 'settings': '2'})
+        intent_assignments_repository['pay the bill'] = '2'
+        self.assertEqual(sorted(assignments_by_group.assigned_to('2')), ['pay the bill', 'settings'])
+        del grouped_intents_repository['1']
+        self.assertEqual(intent_assignments_repository, {'pay the bill': '2', 'settings': '2'})
+        self.assertEqual(assignments_by_group.assigned_to('1'), [])
+
+    def test_index_follows_direct_repository_writes(self):
+        grouped_intents_repository['7'] = {'id': 7, 'intent_text': 'open settings', 'count': 1, 'interaction_events': []}
+        self.assertEqual(find_most_similar_intent('open the settings')['id'], 7)
+        del grouped_intents_repository['7']
+        grouped_intents_repository['8'] = {'id': 8, 'intent_text': 'pay my bill', 'count': 1, 'interaction_events': []}
+        self.assertIsNone(find_most_similar_intent('open the settings'))
@@ -0,0 +1,97 @@
+import threading
+from unittest import mock
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.metrics import MetricsRegistry, registry
+from api.similarity import are_intents_similar, llm_cache, llm_client
+
+def completion(content, prompt_tokens=0, completion_tokens=0):
+    response = mock.Mock()
+    response.choices = [mock.Mock()]
+    response.choices[0].message.content = content
+    response.usage.prompt_tokens = prompt_tokens
+    response.usage.completion_tokens = completion_tokens
+    return response
+
+def sample(text, line_prefix):
+    """Value of the sample line starting with line_prefix, or None"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return None
+
+class MetricsRegistryTests(TestCase):
+    def test_counters_are_exact_across_threads(self):
+        counter = MetricsRegistry().counter('hits_total', 'Hits', ['kind'])
+
+        def work():
+            for _ in range(10000):
+                counter.labels('a').inc()
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(counter.labels('a').value(), 80000)
+        # Arrays of finished threads were folded into the total
+        self.assertEqual(counter.labels('a').value(), 80000)
+        self.assertEqual(counter.labels('a')._cells._cells, [])
+
+    def test_prometheus_text_format(self):
+        metrics = MetricsRegistry()
+        histogram = metrics.histogram('latency_seconds', 'Latency', ['view'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 5):
+            histogram.labels('home').observe(value)
+        metrics.gauge('items', 'Items', lambda: {('bills',): 3}, ['collection'])
+        text = metrics.render()
+        self.assertIn('# TYPE latency_seconds histogram', text)
+        self.assertEqual(sample(text, 'latency_seconds_bucket{view="home",le="0.1"}'), 1)
+        self.assertEqual(sample(text, 'latency_seconds_bucket{view="home",le="1"}'), 2)
+        self.assertEqual(sample(text, 'latency_seconds_bucket{view="home",le="+Inf"}'), 3)
+        self.assertEqual(sample(text, 'latency_seconds_count{view="home"}'), 3)
+        self.assertAlmostEqual(sample(text, 'latency_seconds_sum{view="home"}'), 5.55)
+        self.assertEqual(sample(text, 'items{collection="bills"}'), 3)
+        with self.assertRaises(ValueError):
+            metrics.counter('items', 'Again')
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        llm_cache.clear()
+        llm_client.breaker.reset()
+
+    def metrics(self):
+        response = self.client.get(reverse('metrics'))
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        return response.content.decode()
+
+    def test_request_durations_by_url_name(self):
+        prefix = 'luma_http_request_duration_seconds_count{view="health_check",method="GET",status="200"}'
+        before = sample(self.metrics(), prefix) or 0
+        self.client.get(reverse('health_check'))
+        self.assertEqual(sample(self.metrics(), prefix), before + 1)
+        self.assertIsNotNone(sample(self.metrics(), 'luma_repository_items{collection="grouped_intents"}'))
+
+    def test_llm_calls_record_latency_tokens_and_outcomes(self):
+        text = self.metrics()
+        calls = sample(text, 'luma_llm_call_duration_seconds_count{operation="similar",outcome="ok"}') or 0
+        tokens = sample(text, 'luma_llm_tokens_total{operation="similar",kind="prompt"}') or 0
+        errors = sample(text, 'luma_llm_errors_total{operation="similar",error="RuntimeError"}') or 0
+        matched = sample(text, 'luma_intent_matches_total{operation="similar",source="llm",outcome="matched"}') or 0
+        with mock.patch('api.similarity.client') as client:
+            client.chat.completions.create.return_value = completion('true', 40, 1)
+            self.assertTrue(are_intents_similar('pay my bill', 'settle my invoice'))
+            client.chat.completions.create.side_effect = RuntimeError('down')
+            are_intents_similar('open settings', 'close the app')
+        text = self.metrics()
+        self.assertEqual(sample(text, 'luma_llm_call_duration_seconds_count{operation="similar",outcome="ok"}'), calls + 1)
+        self.assertEqual(sample(text, 'luma_llm_tokens_total{operation="similar",kind="prompt"}'), tokens + 40)
+        self.assertEqual(sample(text, 'luma_llm_errors_total{operation="similar",error="RuntimeError"}'), errors + 1)
+        self.assertEqual(
+            sample(text, 'luma_intent_matches_total{operation="similar",source="llm",outcome="matched"}'), matched + 1
+        )
+        self.assertEqual(registry.get('luma_llm_errors_total').labels('similar', 'RuntimeError').value(), errors + 1)
@@ -0,0 +1,80 @@
+import json
+
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import grouped_intents_repository
+from api.pagination import decode_cursor, encode_cursor, fingerprint, paginate_events, resume_position
+
+def make_events(count):
+    return [{'timestamp': 1000 + i // 2, 'view_id': i, 'action_type': 'CLICK'} for i in range(count)]
+
+class PaginateEventsTests(TestCase):
+    def test_pages_cover_every_event_once(self):
+        events = make_events(7)
+        seen, cursor = [], None
+        while True:
+            page, cursor = paginate_events(events, cursor, 3)
+            seen.extend(event['view_id'] for event in page)
+            if cursor is None:
+                break
+        self.assertEqual(seen, list(range(7)))
+
+    def test_cursor_round_trip_and_validation(self):
+        self.assertEqual(decode_cursor(encode_cursor('2024-01-01T00:00:00Z', 4)), ('2024-01-01T00:00:00Z', 4))
+        for cursor in ['not a cursor', encode_cursor(1, -1), encode_cursor(1, 'x')]:
+            with self.assertRaises(ValueError):
+                decode_cursor(cursor)
+
+    def test_rebuilt_history_rejects_the_cursor(self):
+        events = [{'timestamp': 1000 + i, 'view_id': i} for i in range(6)]
+        _, cursor = paginate_events(events, None, 4)
+        self.assertEqual(resume_position(events, cursor), 4)
+        # An older event was merged in front, shifting every position by one
+        rebuilt = [{'timestamp': 999, 'view_id': -1}] + events
+        for changed in (rebuilt, events[:3]):
+            with self.assertRaisesRegex(ValueError, 'Stale cursor'):
+                resume_position(changed, cursor)
+
+    def test_events_that_are_not_objects(self):
+        events = [{'timestamp': 1}, 'raw', [2, 3], None]
+        page, cursor = paginate_events(events, None, 2)
+        self.assertEqual(cursor, encode_cursor(fingerprint('raw'), 1))
+        self.assertEqual(paginate_events(events, cursor, 2), ([[2, 3], None], None))
+
+class GetInteractionsPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        grouped_intents_repository.clear()
+        grouped_intents_repository['1'] = {'id': 1, 'intent_text': 'pay my bill', 'count': 1,
+                                           'interaction_events': make_events(5)}
+
+    def test_limit_and_cursor(self):
+        url = reverse('get_interactions')
+        response = self.client.get(url, {'intent_text': 'pay my bill', 'limit': 2})
+        self.assertEqual([event['view_id'] for event in response.data['results']], [0, 1])
+        response = self.client.get(url, {'intent_text': 'pay my bill', 'limit': 10,
+                                         'cursor': response.data['next_cursor']})
+        self.assertEqual([event['view_id'] for event in response.data['results']], [2, 3, 4])
+        self.assertIsNone(response.data['next_cursor'])
+
+    def test_bad_limit_and_cursor(self):
+        url = reverse('get_interactions')
+        self.assertEqual(self.client.get(url, {'intent_text': 'pay my bill', 'limit': 'x'}).status_code, 400)
+        response = self.client.get(url, {'intent_text': 'pay my bill', 'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(INTERACTIONS_STREAM_CHUNK_SIZE=2)
+    def test_stream_sends_ndjson_chunks(self):
+        response = self.client.get(reverse('get_interactions'), {'intent_text': 'pay my bill', 'stream': 'true'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 3)
+        events = [json.loads(line) for line in b''.join(chunks).decode().splitlines()]
+        self.assertEqual(events, make_events(5))
+
+    def test_stream_not_found(self):
+        grouped_intents_repository.clear()
+        response = self.client.get(reverse('get_interactions'), {'intent_text': 'pay my bill', 'stream': '1'})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,87 @@
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import grouped_intents_repository, intents_repository
+from api.events import EventLog, EventStore
+from api.indexes import interaction_paths
+from api.paths import PathTrie, StepTable
+
+def session(*screens):
+    return [{'screen_name': screen, 'view_resource_name': f"{screen.lower()}_button", 'action_type': 'CLICK'}
+            for screen in screens]
+
+class PathTrieTests(TestCase):
+    def test_sessions_share_prefixes_and_rank_paths(self):
+        trie = PathTrie(StepTable())
+        for _ in range(3):
+            trie.add(session('Home', 'Bills', 'Pay'))
+        trie.add(session('Home', 'Bills'))
+        trie.add(EventLog(EventStore(), session('Home', 'Settings')))
+        trie.add([])
+        self.assertEqual(trie.sessions, 5)
+        # Root plus Home, Bills, Pay and Settings
+        self.assertEqual(len(trie), 5)
+
+        best, second, third = trie.top_paths(3)
+        self.assertEqual(best['count'], 3)
+        self.assertEqual([step['screen_name'] for step in best['steps']], ['Home', 'Bills', 'Pay'])
+        self.assertEqual([step['count'] for step in best['steps']], [5, 4, 3])
+        self.assertEqual(best['steps'][0], {'screen_name': 'Home', 'view_resource_name': 'home_button',
+                                            'action_type': 'CLICK', 'count': 5})
+        # Ties go to the path seen first
+        self.assertEqual([step['screen_name'] for step in second['steps']], ['Home', 'Bills'])
+        self.assertEqual([step['screen_name'] for step in third['steps']], ['Home', 'Settings'])
+
+    def test_top_list_stays_exact_and_larger_k_scans(self):
+        trie = PathTrie(StepTable(), top=2)
+        for screen, times in [('A', 1), ('B', 2), ('C', 3), ('A', 4)]:
+            for _ in range(times):
+                trie.add(session(screen))
+        self.assertEqual([(path['count'], path['steps'][0]['screen_name']) for path in trie.top_paths(2)],
+                         [(5, 'A'), (3, 'C')])
+        self.assertEqual([path['count'] for path in trie.top_paths(5)], [5, 3, 2])
+
+    def test_depth_limit_and_merge(self):
+        steps = StepTable()
+        trie, other = PathTrie(steps, max_depth=2), PathTrie(steps, max_depth=2)
+        trie.add(session('Home', 'Bills', 'Pay'))
+        other.add(session('Home', 'Bills'))
+        other.add(session('Support'))
+        trie.merge(other)
+        self.assertEqual(trie.sessions, 3)
+        self.assertEqual([(path['count'], len(path['steps'])) for path in trie.top_paths(2)], [(2, 2), (1, 1)])
+
+class InteractionPathsAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+
+    def record(self, events):
+        self.client.post(reverse('record_intent'), {'intent_text': 'pay my bill', 'interaction_events': events},
+                         format='json')
+
+    def test_get_interactions_returns_top_paths(self):
+        self.record(session('Home', 'Bills'))
+        self.record(session('Home', 'Bills', 'Pay'))
+        self.record(session('Home', 'Bills', 'Pay'))
+        self.assertEqual(len(grouped_intents_repository), 1)
+        # The grouped intent keeps the events of the first session
+        self.assertEqual(len(grouped_intents_repository['1']['interaction_events']), 2)
+
+        response = self.client.get(reverse('get_interactions'), {'intent_text': 'pay my bill', 'paths': 1})
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['sessions'], 3)
+        self.assertEqual(body['paths'][0]['count'], 2)
+        self.assertEqual([step['screen_name'] for step in body['paths'][0]['steps']], ['Home', 'Bills', 'Pay'])
+
+        response = self.client.get(reverse('get_interactions'), {'intent_text': 'pay my bill', 'paths': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_deleted_grouped_intents_drop_their_paths(self):
+        self.record(session('Home'))
+        self.assertIsNotNone(interaction_paths.get('1'))
+        del grouped_intents_repository['1']
+        self.assertIsNone(interaction_paths.get('1'))
@@ -0,0 +1,91 @@
+import os
+import tempfile
+import threading
+from unittest import mock
+
+from django.test import TestCase
+
+from api.persistence import CorruptLog, LogFailed, WriteAheadLog
+
+class WriteAheadLogTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def segments(self):
+        return sorted(os.path.join(self.directory, name) for name in os.listdir(self.directory))
+
+    def test_records_are_replayed_in_order(self):
+        wal = WriteAheadLog(self.directory)
+        for i in range(3):
+            wal.wait_durable(wal.append(['intent', i, {'text': f'intent {i}'}]))
+        wal.rotate()
+        wal.append(['assign', 'pay', '1'])
+        wal.close()
+        reopened = WriteAheadLog(self.directory)
+        self.assertEqual(list(reopened.replay(after_lsn=1)), [
+            (2, ['intent', 1, {'text': 'intent 1'}]), (3, ['intent', 2, {'text': 'intent 2'}]), (4, ['assign', 'pay', '1'])
+        ])
+        self.assertEqual(reopened.append(['assign', 'open', '2']), 5)
+
+    def test_torn_tail_is_truncated(self):
+        wal = WriteAheadLog(self.directory)
+        wal.append(['assign', 'pay', '1'])
+        wal.append(['assign', 'open', '2'])
+        wal.close()
+        path, = self.segments()
+        size = os.path.getsize(path)
+        with open(path, 'r+b') as file:
+            file.truncate(size - 3)
+        reopened = WriteAheadLog(self.directory)
+        self.assertEqual([lsn for lsn, _ in reopened.replay()], [1])
+        self.assertLess(os.path.getsize(path), size - 3)
+        self.assertEqual(reopened.append(['assign', 'open', '2']), 2)
+
+    def test_damage_before_the_last_segment_raises(self):
+        wal = WriteAheadLog(self.directory)
+        wal.append(['assign', 'pay', '1'])
+        wal.rotate()
+        wal.append(['assign', 'open', '2'])
+        wal.close()
+        first = self.segments()[0]
+        with open(first, 'r+b') as file:
+            file.seek(-2, os.SEEK_END)
+            file.write(b'!!')
+        with self.assertRaises(CorruptLog):
+            list(WriteAheadLog(self.directory).replay())
+
+    def test_failed_write_refuses_later_records(self):
+        wal = WriteAheadLog(self.directory)
+        wal.wait_durable(wal.append(['assign', 'pay', '1']))
+        lsn = wal.append(['assign', 'open', '2'])
+        with mock.patch('api.persistence.os.fsync', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                wal.wait_durable(lsn)
+        with self.assertRaises(LogFailed):
+            wal.wait_durable(lsn)
+        with self.assertRaises(LogFailed):
+            wal.append(['assign', 'bills', '3'])
+        wal.close()
+        # Nothing follows the failed write, so the log is still a prefix of what was applied
+        self.assertEqual([lsn for lsn, _ in WriteAheadLog(self.directory).replay()], [1, 2])
+
+    def test_concurrent_writers_share_fsyncs(self):
+        wal = WriteAheadLog(self.directory, sync='group', commit_delay=0.01)
+        barrier = threading.Barrier(8)
+
+        def write(i):
+            barrier.wait()
+            for j in range(10):
+                wal.wait_durable(wal.append(['assign', f'{i}-{j}', '1']))
+
+        threads = [threading.Thread(target=write, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(wal.appended, 80)
+        self.assertLess(wal.syncs, 80)
+        wal.close()
+        self.assertEqual(len(list(WriteAheadLog(self.directory).replay())), 80)
@@ -0,0 +1,106 @@
+import random
+
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from api.backend import grouped_intents_repository, intents_repository
+from api.indexes import intent_ranking
+from api.ranking import IndexedMaxHeap, IntentRanking
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+class IndexedMaxHeapTests(TestCase):
+    def test_top_matches_sorting_under_updates_and_removals(self):
+        rng = random.Random(0)
+        heap, counts = IndexedMaxHeap(), {}
+        for step in range(2000):
+            key = rng.randrange(50)
+            if rng.random() < 0.1:
+                heap.remove(key)
+                counts.pop(key, None)
+            else:
+                counts[key] = heap.add(key, rng.randint(-3, 5))
+            if step % 100 == 0:
+                expected = sorted(counts.values(), reverse=True)[:10]
+                self.assertEqual([count for _, count in heap.top(10)], expected)
+        self.assertEqual(len(heap), len(counts))
+        self.assertEqual(dict(heap.top(len(counts))), counts)
+
+    def test_ties_go_to_the_key_added_first(self):
+        heap = IndexedMaxHeap()
+        for key in 'abc':
+            heap.set(key, 1)
+        heap.set('c', 2)
+        self.assertEqual(heap.top(3), [('c', 2), ('a', 1), ('b', 1)])
+
+class IntentRankingTests(TestCase):
+    def test_hits_leave_windows_as_buckets_expire(self):
+        clock = FakeClock()
+        ranking = IntentRanking({'hour': (3600, 60)}, clock)
+        ranking.on_set('1', {'count': 1})
+        ranking.hit('1', 1)
+        clock.now = 1800
+        for count in range(2, 5):
+            ranking.hit('2', count)
+        self.assertEqual(ranking.top(2), [('2', 4), ('1', 1)])
+        self.assertEqual(ranking.top(2, 'hour'), [('2', 3), ('1', 1)])
+        clock.now = 3600
+        self.assertEqual(ranking.top(2, 'hour'), [('2', 3)])
+        clock.now = 5400
+        self.assertEqual(ranking.top(2, 'hour'), [])
+        # All-time counts never expire
+        self.assertEqual(ranking.top(2), [('2', 4), ('1', 1)])
+        with self.assertRaises(KeyError):
+            ranking.top(1, 'week')
+
+    def test_merged_and_deleted_grouped_intents(self):
+        ranking = IntentRanking({'day': (86400, 24)}, FakeClock())
+        for key, hits in [('1', 1), ('2', 2), ('3', 3)]:
+            for count in range(1, hits + 1):
+                ranking.hit(key, count)
+        ranking.merge('1', ['2'])
+        ranking.on_delete('2', {})
+        self.assertEqual(ranking.top(3), [('1', 3), ('3', 3)])
+        self.assertEqual(ranking.top(3, 'day'), [('1', 3), ('3', 3)])
+        ranking.on_delete('3', {})
+        self.assertEqual(ranking.top(3, 'day'), [('1', 3)])
+
+class TopIntentsAPITests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+
+    def record(self, intent_text):
+        self.client.post(reverse('record_intent'), {'intent_text': intent_text, 'interaction_events': []},
+                         format='json')
+
+    def test_top_intents_all_time_and_in_a_window(self):
+        for text, times in [('pay my bill', 3), ('check my balance', 1), ('update my address', 2)]:
+            for _ in range(times):
+                self.record(text)
+        self.assertEqual(len(grouped_intents_repository), 3)
+
+        response = self.client.get(reverse('top_intents'), {'n': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'window': 'all', 'intents': [
+            {'id': 1, 'intent_text': 'pay my bill', 'count': 3},
+            {'id': 3, 'intent_text': 'update my address', 'count': 2},
+        ]})
+        response = self.client.get(reverse('top_intents'), {'n': 5, 'window': 'hour'})
+        self.assertEqual([intent['count'] for intent in response.json()['intents']], [3, 2, 1])
+
+        self.assertEqual(self.client.get(reverse('top_intents'), {'n': 0}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('top_intents'), {'window': 'year'}).status_code, 400)
+
+    def test_cleared_grouped_intents_leave_the_ranking(self):
+        self.record('pay my bill')
+        grouped_intents_repository.clear()
+        self.assertEqual(intent_ranking.top(5), [])
+        self.assertEqual(intent_ranking.top(5, 'day'), [])
@@ -0,0 +1,225 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase
+
+from api.repositories import InMemoryRepository, ORMRepository, PersistentRepository, SQLiteRepository, build_repository
+from api.stores import StoreListener
+
+class RecordingListener(StoreListener):
+    def __init__(self):
+        self.keys = []
+        self.replaced = []
+
+    def on_set(self, key, value):
+        self.keys.append(key)
+
+    def on_replace(self, key, old, new):
+        self.replaced.append((key, old, new))
+
+class RepositoryContract:
+    """Behaviour every repository backend must provide"""
+
+    def make_repository(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.repository = self.make_repository()
+
+    def test_bills_are_upserted(self):
+        bill = {'user_id': 'u1', 'electricity_bill': '1.00', 'water_bill': '2.00',
+                'internet_bill': '3.00', 'phone_bill': '4.00'}
+        self.repository.save_bill(bill)
+        self.repository.save_bills([dict(bill, phone_bill='5.00')])
+        self.assertEqual(self.repository.get_bill('u1'), dict(bill, phone_bill='5.00'))
+        self.assertIsNone(self.repository.get_bill('u2'))
+
+    def test_bill_listeners_see_replaced_bills(self):
+        bill = {'user_id': 'u1', 'electricity_bill': '1.00', 'water_bill': '2.00',
+                'internet_bill': '3.00', 'phone_bill': '4.00'}
+        self.repository.save_bill(bill)
+        listener = RecordingListener()
+        self.repository.subscribe_bills(listener)
+        self.repository.save_bills([dict(bill, phone_bill='5.00'), dict(bill, user_id='u2')])
+        self.assertEqual(listener.keys, ['u1', 'u2'])
+        self.assertEqual(listener.replaced, [('u1', bill, dict(bill, phone_bill='5.00'))])
+
+    def test_intents_round_trip(self):
+        events = [{'timestamp': 1, 'view_id': 2, 'view_resource_name': 'pay_button',
+                   'screen_name': 'Bills', 'action_type': 'CLICK'}]
+        intent = self.repository.create_intent('pay my bill', events)
+        intent['grouping_status'] = 'grouped'
+        self.repository.update_intent(intent)
+        stored = self.repository.get_intent(intent['id'])
+        self.assertEqual(stored['interaction_events'], events)
+        self.assertEqual(stored['grouping_status'], 'grouped')
+
+    def test_events_that_are_not_objects_round_trip(self):
+        events = [{'timestamp': 1, 'view_id': 2, 'view_resource_name': 'pay_button',
+                   'screen_name': 'Bills', 'action_type': 'CLICK'}, 'raw', [1, 2], None]
+        intent = self.repository.create_intent('pay my bill', events)
+        self.assertEqual(list(self.repository.get_intent(intent['id'])['interaction_events']), events)
+
+    def test_grouped_intents_notify_listeners_and_count(self):
+        listener = RecordingListener()
+        self.repository.subscribe(listener)
+        version = self.repository.grouped_intents_version
+        grouped_intent = self.repository.create_grouped_intent('pay my bill', [])
+        key = str(grouped_intent['id'])
+        self.assertEqual(listener.keys, [key])
+        self.assertNotEqual(self.repository.grouped_intents_version, version)
+        self.repository.increment_grouped_intent(grouped_intent)
+        self.assertEqual(self.repository.get_grouped_intent(key)['count'], 2)
+        self.repository.set_assignment('pay the bill', key)
+        self.assertEqual(self.repository.get_assignment('pay the bill'), key)
+
+    def test_grouped_intents_are_merged(self):
+        listener = RecordingListener()
+        self.repository.subscribe(listener)
+        events = [{'timestamp': i, 'view_id': i, 'view_resource_name': 'pay_button', 'screen_name': 'Bills',
+                   'action_type': 'CLICK'} for i in range(3)]
+        keys = [str(self.repository.create_grouped_intent(text, events[i:i + 1])['id'])
+                for i, text in enumerate(['pay my bill', 'pay my bills', 'pay the bill'])]
+        self.repository.increment_grouped_intent(self.repository.get_grouped_intent(keys[2]))
+        intent = self.repository.create_intent('pay the bill', events)
+        intent.update(grouping_status='grouped', grouped_intent_id=int(keys[2]))
+        self.repository.update_intent(intent)
+        self.repository.set_assignment('pay the bill', keys[2])
+        self.repository.merge_grouped_intents({keys[0]: keys[1:]})
+        merged = self.repository.get_grouped_intent(keys[0])
+        self.assertEqual(merged['count'], 4)
+        self.assertEqual(merged['interaction_events'], events)
+        self.assertEqual(self.repository.get_intent(intent['id'])['grouped_intent_id'], int(keys[0]))
+        self.assertEqual(self.repository.get_assignment('pay the bill'), keys[0])
+        self.assertEqual(self.repository.sizes()['grouped_intents'], 1)
+        self.assertEqual([key for key, _, _ in self.repository.grouped_intent_summaries()], keys[:1])
+        self.assertEqual(list(self.repository.intent_groups()), [('pay the bill', int(keys[0]))])
+
+    def test_merges_change_the_grouped_intents_version(self):
+        keys = [str(self.repository.create_grouped_intent(text, [])['id']) for text in ['pay my bill', 'pay my bills']]
+        version = self.repository.grouped_intents_version
+        self.repository.merge_grouped_intents({keys[0]: keys[1:]})
+        self.assertNotEqual(self.repository.grouped_intents_version, version)
+
+class InMemoryRepositoryTests(RepositoryContract, TestCase):
+    def make_repository(self):
+        return InMemoryRepository()
+
+class PersistentRepositoryTests(RepositoryContract, TestCase):
+    def make_repository(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return PersistentRepository(self.directory.name, event_chunk_size=4)
+
+    def reopen(self):
+        self.repository.close()
+        return PersistentRepository(self.directory.name, event_chunk_size=4)
+
+    def populate(self):
+        events = [{'timestamp': i, 'view_id': i, 'view_resource_name': 'pay_button', 'screen_name': 'Bills',
+                   'action_type': 'CLICK'} for i in range(3)] + [{'unexpected': True}]
+        intent = self.repository.create_intent('pay my bill', events)
+        grouped_intent = self.repository.create_grouped_intent('pay my bill', events)
+        self.repository.increment_grouped_intent(grouped_intent)
+        intent.update(grouping_status='grouped', grouped_intent_id=grouped_intent['id'])
+        self.repository.update_intent(intent)
+        self.repository.set_assignment('pay my bill', str(grouped_intent['id']))
+        self.repository.save_bill({'user_id': 'u1', 'electricity_bill': '1.00', 'water_bill': '2.00',
+                                   'internet_bill': '3.00', 'phone_bill': '4.00'})
+        return intent, events
+
+    def assertRestored(self, restored, intent, events):
+        self.assertEqual(restored.get_intent(intent['id']), {**intent, 'interaction_events': events})
+        self.assertEqual(restored.get_grouped_intent('1')['count'], 2)
+        self.assertEqual(restored.get_grouped_intent('1')['interaction_events'], events)
+        self.assertEqual(restored.get_assignment('pay my bill'), '1')
+        self.assertEqual(restored.get_bill('u1')['phone_bill'], '4.00')
+        self.assertEqual(restored.sizes(), self.repository.sizes())
+
+    def test_log_is_replayed_after_restart(self):
+        intent, events = self.populate()
+        restored = self.reopen()
+        self.assertRestored(restored, intent, events)
+        # Ids continue where the previous process stopped
+        self.assertEqual(restored.create_intent('open settings', [])['id'], intent['id'] + 1)
+
+    def test_intents_pending_grouping_are_recovered(self):
+        intent, _ = self.populate()
+        pending = self.repository.create_intent('open settings', [])
+        self.assertEqual(self.repository.take_recovered_pending(), [])
+        restored = self.reopen()
+        self.addCleanup(restored.close)
+        self.assertEqual(restored.take_recovered_pending(), [pending['id']])
+        # Each id is handed out once
+        self.assertEqual(restored.take_recovered_pending(), [])
+
+    def test_snapshot_and_log_tail_are_loaded(self):
+        intent, events = self.populate()
+        lsn = self.repository.snapshot()
+        later = self.repository.create_intent('open settings', events[:1])
+        restored = self.reopen()
+        self.assertRestored(restored, intent, events)
+        self.assertEqual(restored.get_intent(later['id'])['interaction_events'], events[:1])
+        self.assertEqual(restored.wal.last_lsn, lsn + 1)
+        # Appending to chunks restored from the snapshot keeps earlier rows intact
+        restored.create_intent('close the app', events)
+        self.assertEqual(restored.get_intent(intent['id'])['interaction_events'], events)
+
+    def test_merges_survive_restarts(self):
+        intent, events = self.populate()
+        other = self.repository.create_grouped_intent('pay my bills', events[:1])
+        self.repository.merge_grouped_intents({'1': [str(other['id'])]})
+        self.repository.snapshot()
+        restored = self.reopen()
+        self.assertEqual(restored.get_grouped_intent('1')['interaction_events'], events + events[:1])
+        self.assertEqual(restored.increment_grouped_intent(other)['count'], 4)
+
+    def test_snapshots_are_taken_in_the_background(self):
+        self.repository.snapshot_every = 5
+        self.populate()
+        self.repository.snapshot()  # waits for the background snapshot, then takes another
+        self.assertEqual(len(os.listdir(os.path.join(self.directory.name, 'wal'))), 0)
+        self.assertEqual(len([name for name in os.listdir(self.directory.name) if name.endswith('.snap')]), 1)
+
+class SQLiteRepositoryTests(RepositoryContract, TestCase):
+    def make_repository(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        return SQLiteRepository(os.path.join(self.directory.name, 'luma.sqlite3'))
+
+    def test_groups_written_by_other_processes_are_synced(self):
+        listener = RecordingListener()
+        self.repository.subscribe(listener)
+        other = SQLiteRepository(self.repository.path)
+        other.create_grouped_intent('open settings', [])
+        self.repository.sync()
+        self.assertEqual(listener.keys, ['1'])
+
+class ORMRepositoryTests(RepositoryContract, TestCase):
+    def make_repository(self):
+        return ORMRepository()
+
+    def test_subscribing_does_not_query_the_database(self):
+        self.repository.create_grouped_intent('open settings', [])
+        bill = {'user_id': 'u1', 'electricity_bill': '1.00', 'water_bill': '2.00',
+                'internet_bill': '3.00', 'phone_bill': '4.00'}
+        self.repository.save_bill(bill)
+        repository = ORMRepository()
+        listener, bills = RecordingListener(), RecordingListener()
+        # Services subscribe at import time, possibly before the tables are migrated
+        with self.assertNumQueries(0):
+            repository.subscribe(listener)
+            repository.subscribe_bills(bills)
+        repository.sync()
+        self.assertEqual(listener.keys, ['1'])
+        # Writes replay the stored bills to new listeners before notifying them
+        repository.save_bill(dict(bill, phone_bill='5.00'))
+        self.assertEqual((bills.keys, len(bills.replaced)), (['u1'], 1))
+
+    def test_requires_a_persistent_database(self):
+        with mock.patch.dict(settings.DATABASES['default'], NAME=':memory:'):
+            with self.assertRaises(ImproperlyConfigured):
+                build_repository({'BACKEND': 'orm'})
@@ -0,0 +1,194 @@
+import os
+import tempfile
+import time
+
+from django.test import TestCase
+
+from api.codecs import dumps, loads
+from api.events import EventLog, EventStore
+from api.repositories import InMemoryRepository, PersistentRepository
+from api.spill import SegmentStore
+from api.stores import RetainedStore
+from api.tests.test_repositories import RecordingListener, RepositoryContract
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def make_store(spill, clock, **kwargs):
+    return RetainedStore(spill, dumps, loads, lambda value: 100, shards=1, clock=clock, **kwargs)
+
+class RetainedStoreTests(TestCase):
+    def setUp(self):
+        self.spill = SegmentStore()
+        self.addCleanup(self.spill.close)
+        self.clock = FakeClock()
+
+    def test_least_recently_used_entries_spill_and_reload(self):
+        store = make_store(self.spill, self.clock, max_bytes=300)
+        listener = RecordingListener()
+        store.subscribe(listener)
+        for key in range(3):
+            store[key] = {'id': key}
+        self.assertEqual(store[0], {'id': 0})
+        store[3] = {'id': 3}
+        # 1 was used least recently
+        self.assertEqual(store.stats()['spilled'], 1)
+        self.assertEqual(store.evictions['lru'], 1)
+        version = store.version
+        self.assertEqual(store.get(1), {'id': 1})
+        self.assertEqual(store.reloads, 1)
+        # Reloading is not a change
+        self.assertEqual(store.version, version)
+        self.assertEqual(listener.keys, [0, 1, 2, 3])
+        self.assertEqual(store.stats()['resident'], 3)
+
+    def test_idle_entries_expire_and_unevictable_ones_stay(self):
+        store = make_store(self.spill, self.clock, ttl=10, evictable=lambda value: not value['pending'])
+        store[1] = {'pending': False}
+        store[2] = {'pending': True}
+        self.clock.now = 5
+        store.touch(1, store[1])
+        self.clock.now = 12
+        store.sweep()
+        self.assertEqual(store.evictions['ttl'], 0)
+        self.clock.now = 16
+        store.sweep()
+        self.assertEqual(store.evictions['ttl'], 1)
+        self.assertEqual(store.stats()['resident'], 1)
+
+    def test_idle_entries_expire_without_being_touched(self):
+        store = RetainedStore(self.spill, dumps, loads, lambda value: 100, ttl=0.05, sweep_interval=0.01)
+        self.addCleanup(store.close)
+        store[1] = {'id': 1}
+        deadline = time.monotonic() + 5
+        while store.evictions['ttl'] == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(store.stats()['spilled'], 1)
+        self.assertEqual(store[1], {'id': 1})
+
+    def test_spilled_entries_are_part_of_the_mapping(self):
+        store = make_store(self.spill, self.clock, max_bytes=100)
+        for key in range(4):
+            store[key] = {'id': key}
+        self.assertEqual(store.stats()['spilled'], 3)
+        self.assertEqual(len(store), 4)
+        self.assertIn(0, store)
+        self.assertEqual(sorted(store.keys()), [0, 1, 2, 3])
+        self.assertEqual(dict(store.items()), {key: {'id': key} for key in range(4)})
+        # Iteration decodes spilled entries without reloading them
+        self.assertEqual(store.stats()['spilled'], 3)
+        del store[0]
+        self.assertNotIn(0, store)
+        self.assertIsNone(store.get(0))
+        store.clear()
+        self.assertEqual(len(store), 0)
+        self.assertEqual(self.spill.stats()['live_bytes'], 0)
+
+    def test_compute_and_transform_fault_spilled_entries_in(self):
+        store = make_store(self.spill, self.clock, max_bytes=100)
+        listener = RecordingListener()
+        store.subscribe(listener)
+        for key in range(3):
+            store[key] = {'count': key}
+        self.assertEqual(store.stats()['spilled'], 2)
+        self.assertEqual(store.compute(0, lambda value: {'count': value['count'] + 10}), {'count': 10})
+        store.transform([0, 1, 2], lambda values: {0: {'count': values[0]['count'] + values[1]['count']}})
+        self.assertEqual(dict(store.items()), {0: {'count': 11}})
+        self.assertEqual(len(store), 1)
+        self.assertEqual(listener.replaced, [(0, {'count': 10}, {'count': 11})])
+        with self.assertRaises(KeyError):
+            store.compute(5, lambda value: value)
+
+class BoundedEventStoreTests(TestCase):
+    def test_spilled_chunks_read_back_equal(self):
+        spill = SegmentStore()
+        self.addCleanup(spill.close)
+        store = EventStore(chunk_size=4)
+        store.bound(0, spill)
+        events = [{'timestamp': i, 'view_id': i, 'view_resource_name': f"button_{i % 3}", 'screen_name': 'Bills',
+                   'action_type': 'CLICK', 'extra': i} for i in range(30)]
+        log = EventLog(store, events)
+        self.assertGreater(store.stats()['spilled_chunks'], 0)
+        self.assertEqual(list(log), events)
+        self.assertGreater(store.reloads, 0)
+
+        unbounded = EventStore(chunk_size=4)
+        EventLog(unbounded, events)
+        self.assertEqual(store.export(len(store)), unbounded.export(len(unbounded)))
+
+class BoundedInMemoryRepositoryTests(RepositoryContract, TestCase):
+    """The repository contract holds while nearly everything is spilled"""
+
+    def make_repository(self):
+        repository = InMemoryRepository(event_chunk_size=2, intents_max_bytes=1, events_max_bytes=1)
+        self.addCleanup(repository.close)
+        return repository
+
+    def test_intents_spill_and_group_counts_stay_exact(self):
+        events = [{'timestamp': i, 'view_id': i, 'view_resource_name': 'pay_button', 'screen_name': 'Bills',
+                   'action_type': 'CLICK'} for i in range(5)]
+        grouped_intent = self.repository.create_grouped_intent('pay my bill', events)
+        intents = []
+        for _ in range(10):
+            intent = self.repository.create_intent('pay my bill', events)
+            intent.update(grouping_status='grouped', grouped_intent_id=grouped_intent['id'])
+            self.repository.update_intent(intent)
+            self.repository.increment_grouped_intent(self.repository.get_grouped_intent(str(grouped_intent['id'])))
+            intents.append(intent)
+        stats = self.repository.retention_stats()
+        self.assertGreater(stats['intents']['spilled'], 0)
+        self.assertGreater(stats['spill']['bytes_written'], 0)
+        self.assertEqual(self.repository.get_grouped_intent(str(grouped_intent['id']))['count'], 11)
+        for intent in intents:
+            stored = self.repository.get_intent(intent['id'])
+            self.assertEqual(stored['grouping_status'], 'grouped')
+            self.assertEqual(list(stored['interaction_events']), events)
+        self.assertEqual(self.repository.sizes()['intents'], 10)
+
+class BoundedPersistentRepositoryTests(TestCase):
+    def test_spilled_state_survives_snapshot_and_restart(self):
+        path = tempfile.mkdtemp()
+        events = [{'timestamp': i, 'view_id': i, 'view_resource_name': 'pay_button', 'screen_name': 'Bills',
+                   'action_type': 'CLICK'} for i in range(3)]
+        repository = PersistentRepository(path, sync='none', snapshot_every=5, event_chunk_size=2,
+                                          intents_max_bytes=1, events_max_bytes=1)
+        ids = []
+        for index in range(8):
+            intent = repository.create_intent(f"intent {index}", events)
+            intent['grouping_status'] = 'grouped'
+            repository.update_intent(intent)
+            ids.append(intent['id'])
+        repository.snapshot()
+        repository.close()
+
+        reopened = PersistentRepository(path, sync='none', event_chunk_size=2, intents_max_bytes=1,
+                                        events_max_bytes=1)
+        self.addCleanup(reopened.close)
+        for index, intent_id in enumerate(ids):
+            stored = reopened.get_intent(intent_id)
+            self.assertEqual(stored['intent_text'], f"intent {index}")
+            self.assertEqual(list(stored['interaction_events']), events)
+
+class SegmentStoreTests(TestCase):
+    def test_stores_sharing_a_directory_keep_their_own_segments(self):
+        parent = tempfile.mkdtemp()
+        first, second = SegmentStore(parent), SegmentStore(parent)
+        self.addCleanup(second.close)
+        location = first.put(b'first')
+        second.put(b'second')
+        self.assertNotEqual(first.directory, second.directory)
+        self.assertEqual(first.get(location), b'first')
+        first.close()
+        self.assertEqual(os.listdir(parent), [os.path.basename(second.directory)])
+
+    def test_directories_of_exited_processes_are_removed(self):
+        parent = tempfile.mkdtemp()
+        # No process has this pid (pid_max is at most 2 ** 22)
+        os.mkdir(os.path.join(parent, 'luma-spill-99999999-abc'))
+        store = SegmentStore(parent)
+        self.addCleanup(store.close)
+        self.assertEqual(os.listdir(parent), [os.path.basename(store.directory)])
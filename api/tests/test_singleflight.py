@@ -0,0 +1,112 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from api.backend import grouped_intents_repository, intents_repository
+from api.services import IntentService
+from api.similarity import llm_cache, llm_flights
+from api.singleflight import FlightAborted, SingleFlight
+from api.tests.test_llm import fake_client
+from api.tests.test_async import completion
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError('condition not reached')
+        time.sleep(0.001)
+
+class SingleFlightTests(TestCase):
+    def test_concurrent_calls_share_one_run(self):
+        flights = SingleFlight()
+        release = threading.Event()
+        runs = []
+
+        def work(value):
+            runs.append(value)
+            release.wait(5)
+            return value * 2
+
+        with ThreadPoolExecutor(5) as pool:
+            futures = [pool.submit(flights.do, 'key', work, 21) for _ in range(5)]
+            wait_for(lambda: flights.stats()['coalesced'] == 4)
+            release.set()
+            outcomes = [future.result() for future in futures]
+        self.assertEqual(runs, [21])
+        self.assertEqual(sorted(leader for _, leader in outcomes), [False] * 4 + [True])
+        self.assertEqual({result for result, _ in outcomes}, {42})
+        self.assertEqual(flights.stats(), {'leaders': 1, 'coalesced': 4, 'in_flight': 0})
+        # Landed flights are not cached
+        self.assertEqual(flights.do('key', lambda: 'again'), ('again', True))
+
+    def test_errors_are_shared(self):
+        flights = SingleFlight()
+        release = threading.Event()
+
+        def fail():
+            release.wait(5)
+            raise ValueError('upstream down')
+
+        with ThreadPoolExecutor(3) as pool:
+            futures = [pool.submit(flights.do, 'key', fail) for _ in range(3)]
+            wait_for(lambda: flights.stats()['coalesced'] == 2)
+            release.set()
+            for future in futures:
+                with self.assertRaises(ValueError):
+                    future.result()
+
+    def test_async_callers_and_threads_share_flights(self):
+        flights = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'answer'
+
+        async def main():
+            leader = asyncio.ensure_future(flights.ado('key', work))
+            await asyncio.sleep(0)
+            thread_follower = asyncio.get_running_loop().run_in_executor(None, flights.do, 'key', None)
+            return await asyncio.gather(leader, flights.ado('key', work), thread_follower)
+
+        self.assertEqual(asyncio.run(main()), [('answer', True), ('answer', False), ('answer', False)])
+        self.assertEqual(len(calls), 1)
+
+    def test_cancelled_leader_releases_followers(self):
+        flights = SingleFlight()
+
+        async def main():
+            leader = asyncio.ensure_future(flights.ado('key', asyncio.sleep, 5))
+            await asyncio.sleep(0)
+            follower = asyncio.ensure_future(flights.ado('key', asyncio.sleep, 5))
+            await asyncio.sleep(0)
+            leader.cancel()
+            with self.assertRaises(FlightAborted):
+                await follower
+
+        asyncio.run(main())
+        self.assertEqual(flights.stats()['in_flight'], 0)
+
+@override_settings(INTENT_SIMILARITY_THRESHOLD=1.01, INTENT_LLM_TIEBREAK_FLOOR=-1.0)
+class CoalescedLookupTests(TestCase):
+    def setUp(self):
+        intents_repository.clear()
+        grouped_intents_repository.clear()
+        llm_cache.clear()
+        grouped_intents_repository['1'] = {'id': 1, 'intent_text': 'pay my bill', 'count': 1,
+                                           'interaction_events': [{'event_type': 'click'}]}
+
+    def test_identical_lookups_make_one_llm_request(self):
+        client = fake_client((0.2, completion('pay my bill')))
+        before = llm_flights.stats()['coalesced']
+        with mock.patch('api.similarity.client', client), ThreadPoolExecutor(8) as pool:
+            results = list(pool.map(IntentService.get_interactions, ['Settle invoice'] + ['settle invoice!'] * 7))
+        self.assertEqual(results, [[{'event_type': 'click'}]] * 8)
+        # Normalization makes the texts identical lookups
+        self.assertEqual(client.chat.completions.calls, 1)
+        self.assertEqual(llm_flights.stats()['coalesced'] - before, 7)
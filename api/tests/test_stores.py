@@ -0,0 +1,72 @@
+import threading
+
+from django.test import TestCase
+
+from api.repositories import InMemoryRepository
+from api.stores import ShardedStore, StoreListener
+
+class ShardedStoreTests(TestCase):
+    def test_behaves_like_a_dict_and_notifies_listeners(self):
+        events = []
+
+        class Listener(StoreListener):
+            def on_set(self, key, value):
+                events.append(('set', key))
+
+            def on_delete(self, key, value):
+                events.append(('delete', key))
+
+            def on_clear(self):
+                events.append(('clear',))
+
+        store = ShardedStore(shards=4)
+        store.subscribe(Listener())
+        store['a'] = 1
+        store.update({'b': 2})
+        self.assertEqual((len(store), store.get('a'), 'b' in store), (2, 1, True))
+        self.assertEqual(store.pop('a'), 1)
+        store.clear()
+        self.assertEqual(events, [('set', 'a'), ('set', 'b'), ('delete', 'a'), ('clear',)])
+        self.assertEqual(store.version, 4)
+
+    def test_copy_on_write_readers_keep_their_snapshot(self):
+        store = ShardedStore(copy_on_write=True)
+        store['1'] = {'count': 1}
+        held = store['1']
+        snapshot = store.snapshot()
+        versions = (store.version, store.identity_version)
+        store.compute('1', lambda current: {**current, 'count': current['count'] + 1})
+        self.assertEqual((store.version, store.identity_version), (versions[0] + 1, versions[1]))
+        store['2'] = {'count': 1}
+        self.assertEqual(held['count'], 1)
+        self.assertEqual(list(snapshot), ['1'])
+        self.assertEqual(store['1']['count'], 2)
+
+    def test_allocate_id_skips_used_keys_and_restarts_after_clear(self):
+        store = ShardedStore()
+        store['1'] = {}
+        self.assertEqual(store.allocate_id(str), 2)
+        store.clear()
+        self.assertEqual(store.allocate_id(str), 1)
+
+class ConcurrentRepositoryTests(TestCase):
+    def test_no_duplicate_ids_or_lost_increments(self):
+        repository = InMemoryRepository()
+        grouped_intent = repository.create_grouped_intent('pay my bill', [])
+        threads, per_thread = 8, 500
+        barrier = threading.Barrier(threads)
+
+        def worker():
+            barrier.wait()
+            for _ in range(per_thread):
+                repository.create_intent('pay my bill', [])
+                repository.increment_grouped_intent(grouped_intent)
+
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        self.assertEqual(len(repository.intents), threads * per_thread)
+        self.assertEqual(sorted(repository.intents), list(range(1, threads * per_thread + 1)))
+        self.assertEqual(repository.get_grouped_intent('1')['count'], 1 + threads * per_thread)
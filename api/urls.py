@@ -1,16 +1,32 @@
 from django.urls import path
 from .views import (
     health_check,
+    llm_status,
+    metrics_view,
     record_intent,
+    get_intent_view,
+    top_intents_view,
     get_interactions,
     get_bills_view,
-    create_bill_view
+    create_bill_view,
+    create_bills_bulk_view,
+    bill_stats_view,
+    record_intent_async,
+    get_interactions_async
 )
 
 urlpatterns = [
     path('health/', health_check, name='health_check'),
+    path('llm/status/', llm_status, name='llm_status'),
+    path('metrics/', metrics_view, name='metrics'),
     path('record_intent/', record_intent, name='record_intent'),
+    path('intents/top/', top_intents_view, name='top_intents'),
+    path('intents/<int:intent_id>/', get_intent_view, name='get_intent'),
     path('get_interactions/', get_interactions, name='get_interactions'),
     path('get_bills/', get_bills_view, name='get_bills'),
     path('create_bill/', create_bill_view, name='create_bill'),
+    path('bills/bulk/', create_bills_bulk_view, name='create_bills_bulk'),
+    path('bills/stats/', bill_stats_view, name='bill_stats'),
+    path('async/record_intent/', record_intent_async, name='record_intent_async'),
+    path('async/get_interactions/', get_interactions_async, name='get_interactions_async'),
 ] 
\ No newline at end of file
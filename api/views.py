@@ -1,12 +1,68 @@
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .services import get_bills, create_bill, IntentService
+from .cache import MISSING
+from .codecs import dumps, loads
+from .conditional import if_none_match
+from .metrics import registry
+from .intent_grouping import intent_batcher
+from .repositories import GROUPING_PENDING
+from .services import (
+    get_bills, create_bill, create_bills, IntentService, get_bill_stats, response_cache, response_etag,
+)
+from .similarity import llm_cache, llm_client, llm_flights, llm_usage
+
+class EncodedResponse(Response):
+    """
+    Response whose encoded body is cached under its version ETag, so
+    repeated reads of an unchanged resource skip serialization.
+    """
+
+    @property
+    def rendered_content(self):
+        etag = self.headers.get('ETag')
+        renderer = getattr(self, 'accepted_renderer', None)
+        # The browsable API embeds request details, so only plain encodings are cached
+        if response_cache is None or etag is None or renderer is None or renderer.format == 'api':
+            return super().rendered_content
+        key = f"{etag}:{self.accepted_media_type}"
+        content = response_cache.get(key)
+        if content is MISSING:
+            content = super().rendered_content
+            response_cache.set(key, content)
+            return content
+        charset = renderer.charset
+        self['Content-Type'] = f"{self.accepted_media_type}; charset={charset}" if charset else self.accepted_media_type
+        return content
+
+def _not_modified(request, etag):
+    """304 response when the client already holds the representation tagged etag"""
+    if etag and if_none_match(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+    return None
 
 @api_view(['GET'])
 def health_check(request):
     return Response({'status': 'healthy'})
 
+@api_view(['GET'])
+def llm_status(request):
+    return Response({
+        **llm_client.stats(),
+        'single_flight': llm_flights.stats(),
+        'batching': intent_batcher.stats(),
+        'usage': llm_usage.stats(),
+        'cache': llm_cache.stats(),
+    })
+
+@require_GET
+def metrics_view(request):
+    """Prometheus text exposition of every registered metric"""
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 @api_view(['POST'])
 def record_intent(request):
     intent_text = request.data.get('intent_text')
@@ -15,32 +71,128 @@ def record_intent(request):
     if not intent_text:
         return Response({'error': 'intent_text is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    intent = IntentService.create_intent(intent_text, interaction_events)
+    intent = IntentService.record_intent(intent_text, interaction_events)
+    # Grouping still runs in the background when the intent is pending
+    if intent['grouping_status'] == GROUPING_PENDING:
+        return Response(dict(intent), status=status.HTTP_202_ACCEPTED)
     return Response(intent, status=status.HTTP_201_CREATED)
 
+@api_view(['GET'])
+def get_intent_view(request, intent_id):
+    intent = IntentService.get_intent(intent_id)
+    if not intent:
+        return Response({'error': 'Intent not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    return Response(intent)
+
+def _ndjson_chunks(events, chunk_size):
+    """Serialize events as newline-delimited JSON, chunk_size events per chunk"""
+    lines = []
+    for event in events:
+        lines.append(dumps(event))
+        if len(lines) >= chunk_size:
+            yield b'\n'.join(lines) + b'\n'
+            lines = []
+    if lines:
+        yield b'\n'.join(lines) + b'\n'
+
 @api_view(['GET'])
 def get_interactions(request):
     intent_text = request.query_params.get('intent_text')
     if not intent_text:
         return Response({'error': 'intent_text is required'}, status=status.HTTP_400_BAD_REQUEST)
-    
-    interactions = IntentService.get_interactions(intent_text)
-    if not interactions:
+
+    cursor = request.query_params.get('cursor')
+    limit = request.query_params.get('limit')
+    grouped_intent = IntentService.find_grouped_intent(intent_text)
+    if not grouped_intent or not grouped_intent['interaction_events']:
         return Response({'error': 'No interactions found for this intent'}, status=status.HTTP_404_NOT_FOUND)
-    
-    return Response(interactions)
+
+    paths = request.query_params.get('paths')
+    if paths is not None:
+        try:
+            k = int(paths)
+        except ValueError:
+            k = 0
+        if k < 1:
+            return Response({'error': 'paths must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        k = min(k, getattr(settings, 'INTERACTIONS_MAX_PAGE_SIZE', 1000))
+        etag, grouped_intent = IntentService.tag_grouped_intent(grouped_intent, [('paths', k)])
+        not_modified = _not_modified(request, etag)
+        if not_modified is not None:
+            return not_modified
+        return EncodedResponse(IntentService.get_interaction_paths(grouped_intent, k),
+                               headers={'ETag': etag} if etag else None)
+
+    if request.query_params.get('stream', '').lower() in ('1', 'true'):
+        try:
+            events = IntentService.stream_interactions(grouped_intent, cursor)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        chunk_size = getattr(settings, 'INTERACTIONS_STREAM_CHUNK_SIZE', 500)
+        return StreamingHttpResponse(_ndjson_chunks(events, chunk_size), content_type='application/x-ndjson')
+
+    paginated = limit is not None or cursor is not None
+    if paginated:
+        max_limit = getattr(settings, 'INTERACTIONS_MAX_PAGE_SIZE', 1000)
+        try:
+            limit = int(limit) if limit is not None else max_limit
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, max_limit)
+
+    etag, grouped_intent = IntentService.tag_grouped_intent(grouped_intent, [('cursor', cursor), ('limit', limit)])
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    headers = {'ETag': etag} if etag else None
+    if paginated:
+        try:
+            page = IntentService.get_interactions_page(grouped_intent, cursor, limit)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return EncodedResponse(page, headers=headers)
+
+    return EncodedResponse(grouped_intent['interaction_events'], headers=headers)
+
+@api_view(['GET'])
+def top_intents_view(request):
+    try:
+        n = int(request.query_params.get('n', 10))
+    except ValueError:
+        n = 0
+    if n < 1:
+        return Response({'error': 'n must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+    n = min(n, getattr(settings, 'TRENDING_MAX_N', 100))
+    window = request.query_params.get('window', 'all')
+    try:
+        intents = IntentService.top_intents(n, None if window == 'all' else window)
+    except KeyError:
+        return Response({'error': f"Unknown window '{window}'"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'window': window, 'intents': intents})
 
 @api_view(['GET'])
 def get_bills_view(request):
     user_id = request.query_params.get('user_id')
     if not user_id:
         return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-    
+
+    # The version is read before the bill, so a concurrent write can make the
+    # body newer than its tag but never pair an old body with a new tag
+    etag = response_etag('bill', user_id)
     bills = get_bills(user_id)
     if not bills:
         return Response({'error': 'No bills found for this user'}, status=status.HTTP_404_NOT_FOUND)
-    
-    return Response(bills)
+
+    # Only an existing bill can match, so '*' or a guessed tag of a missing user is a 404
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    return EncodedResponse(bills, headers={'ETag': etag} if etag else None)
 
 @api_view(['POST'])
 def create_bill_view(request):
@@ -48,11 +200,86 @@ def create_bill_view(request):
     if not user_id:
         return Response({'error': 'user_id is required'}, status=status.HTTP_400_BAD_REQUEST)
     
-    bill = create_bill(
-        user_id=user_id,
-        electricity_bill=request.data.get('electricity_bill', 0),
-        water_bill=request.data.get('water_bill', 0),
-        internet_bill=request.data.get('internet_bill', 0),
-        phone_bill=request.data.get('phone_bill', 0)
-    )
+    try:
+        bill = create_bill(
+            user_id=user_id,
+            electricity_bill=request.data.get('electricity_bill', 0),
+            water_bill=request.data.get('water_bill', 0),
+            internet_bill=request.data.get('internet_bill', 0),
+            phone_bill=request.data.get('phone_bill', 0)
+        )
+    except ValueError as error:
+        # Amounts that are not numbers, or too large for the bill columns
+        return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
     return Response(bill, status=status.HTTP_201_CREATED)
+
+@api_view(['GET'])
+def bill_stats_view(request):
+    return Response(get_bill_stats())
+
+def _ndjson_rows(stream):
+    """Parse an NDJSON request body line by line; unparsable lines become None and are reported as invalid"""
+    for line in stream:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield loads(line)
+        except ValueError:
+            yield None
+
+@api_view(['POST'])
+def create_bills_bulk_view(request):
+    if request.content_type.split(';')[0].strip() in ('application/x-ndjson', 'application/jsonl'):
+        # Read straight from the request stream so large uploads are never held in memory
+        rows = _ndjson_rows(request.stream or [])
+    else:
+        rows = request.data.get('bills') if isinstance(request.data, dict) else request.data
+        if not isinstance(rows, list):
+            return Response({'error': 'Expected a JSON array of bills or NDJSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+    report = create_bills(rows)
+    if not report['created'] and report['failed']:
+        return Response(report, status=status.HTTP_400_BAD_REQUEST)
+    return Response(report, status=status.HTTP_201_CREATED)
+
+# Native async views for ASGI deployments. DRF's @api_view is sync-only, so
+# these are plain Django views. They encode through api.codecs like the DRF
+# views do, which materializes columnar event logs through tolist().
+
+def _json_response(data, status=200):
+    return HttpResponse(dumps(data), content_type='application/json', status=status)
+
+async def record_intent_async(request):
+    if request.method != 'POST':
+        return _json_response({'error': 'Method not allowed'}, status=405)
+    try:
+        data = loads(request.body or b'{}')
+    except ValueError:
+        return _json_response({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+    intent_text = data.get('intent_text')
+    interaction_events = data.get('interaction_events', [])
+    if not intent_text:
+        return _json_response({'error': 'intent_text is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    intent = await IntentService.record_intent_async(intent_text, interaction_events)
+    if intent['grouping_status'] == GROUPING_PENDING:
+        return _json_response(dict(intent), status=status.HTTP_202_ACCEPTED)
+    return _json_response(intent, status=status.HTTP_201_CREATED)
+
+# csrf_exempt() wraps views in a sync function on Django 4.2, so set the flag directly
+record_intent_async.csrf_exempt = True
+
+async def get_interactions_async(request):
+    if request.method != 'GET':
+        return _json_response({'error': 'Method not allowed'}, status=405)
+    intent_text = request.GET.get('intent_text')
+    if not intent_text:
+        return _json_response({'error': 'intent_text is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    interactions = await IntentService.get_interactions_async(intent_text)
+    if not interactions:
+        return _json_response({'error': 'No interactions found for this intent'}, status=status.HTTP_404_NOT_FOUND)
+
+    return _json_response(interactions)
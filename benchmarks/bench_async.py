@@ -0,0 +1,83 @@
+"""
+Compare sync and async throughput of get_interactions when every request
+needs an LLM round trip.
+
+Starts a local fake OpenAI server, then drives the sync DRF view from a
+fixed pool of worker threads (like a threaded WSGI worker) and the native
+async view from a single event loop (like one ASGI worker) with the same
+number of requests.
+
+    python -m benchmarks.bench_async [--requests 400] [--threads 16] [--latency 0.2]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sync vs async get_interactions throughput')
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--threads', type=int, default=16, help='sync worker threads')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake LLM latency in seconds')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(latency=args.latency).start()
+    os.environ['OPENAI_BASE_URL'] = server.base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'luma.settings')
+
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.test import AsyncClient, Client
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    logging.disable(logging.INFO)
+    # Never match locally, always ask the LLM to break the tie
+    settings.INTENT_SIMILARITY_THRESHOLD = 1.01
+    settings.INTENT_LLM_TIEBREAK_FLOOR = -1.0
+    settings.ALLOWED_HOSTS = ['*']
+
+    from api.services import grouped_intents_repository, llm_cache
+    for i in range(1, 51):
+        grouped_intents_repository[str(i)] = {
+            'id': i, 'intent_text': f"intent {i}", 'count': 1, 'interaction_events': [{'event_type': 'click'}]
+        }
+
+    def sync_request(i):
+        response = Client().get('/api/get_interactions/', {'intent_text': f"sync query {i}"})
+        assert response.status_code == 200, response.status_code
+
+    llm_cache.clear()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(sync_request, range(args.requests)))
+    sync_elapsed = time.perf_counter() - started
+
+    async def run_async():
+        client = AsyncClient()
+
+        async def async_request(i):
+            response = await client.get('/api/async/get_interactions/', {'intent_text': f"async query {i}"})
+            assert response.status_code == 200, response.status_code
+
+        await asyncio.gather(*(async_request(i) for i in range(args.requests)))
+
+    llm_cache.clear()
+    started = time.perf_counter()
+    asyncio.run(run_async())
+    async_elapsed = time.perf_counter() - started
+    server.stop()
+
+    print(f"{args.requests} requests, fake LLM latency {args.latency * 1000:.0f} ms")
+    print(f"sync  ({args.threads} threads): {args.requests / sync_elapsed:8.1f} req/s  ({sync_elapsed:.2f} s)")
+    print(f"async (1 event loop): {args.requests / async_elapsed:8.1f} req/s  ({async_elapsed:.2f} s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Encode and decode cost of record_intent payloads under each codec.
+
+Request bodies carrying realistic interaction_events batches are rendered
+and parsed with DRF's stock JSON renderer/parser, the orjson-backed ones
+from api.codecs and (when installed) MessagePack, going through the same
+renderer/parser classes the views use.
+
+    python -m benchmarks.bench_codecs [--events 200] [--batches 500]
+"""
+import argparse
+import io
+import json
+import os
+import time
+
+from benchmarks.bench_events import request_bodies
+
+
+def payloads(batches, events):
+    """record_intent bodies of `events` interaction events each"""
+    for i, body in enumerate(request_bodies(batches * events, events)):
+        yield {'intent_text': f"pay my bill {i}", 'interaction_events': json.loads(body)}
+
+
+def timed(function, items):
+    started = time.perf_counter()
+    results = [function(item) for item in items]
+    return results, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON vs orjson vs MessagePack payload codecs')
+    parser.add_argument('--events', type=int, default=200, help='interaction events per request')
+    parser.add_argument('--batches', type=int, default=500, help='requests to encode and decode')
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'luma.settings')
+    import django
+    django.setup()
+    from rest_framework.parsers import JSONParser
+    from rest_framework.renderers import JSONRenderer
+    from api import codecs
+
+    data = list(payloads(args.batches, args.events))
+    codec_pairs = [('DRF json', JSONRenderer(), JSONParser()),
+                   ('orjson', codecs.FastJSONRenderer(), codecs.FastJSONParser())]
+    if codecs.msgpack is not None:
+        codec_pairs.append(('msgpack', codecs.MessagePackRenderer(), codecs.MessagePackParser()))
+    else:
+        print('msgpack is not installed; skipping MessagePack')
+
+    print(f"{args.batches} requests of {args.events} events")
+    baseline = None
+    for name, renderer, body_parser in codec_pairs:
+        encoded, encode_time = timed(renderer.render, data)
+        decoded, decode_time = timed(lambda body: body_parser.parse(io.BytesIO(body)), encoded)
+        assert decoded == data
+        total = encode_time + decode_time
+        baseline = baseline or total
+        size = sum(len(body) for body in encoded) / len(encoded)
+        print(f"{name:10s} encode {encode_time / args.batches * 1e6:8.1f} us  "
+              f"decode {decode_time / args.batches * 1e6:8.1f} us  "
+              f"{size / 1024:6.1f} KiB/request  {baseline / total:5.1f}x")
+
+
+if __name__ == '__main__':
+    main()
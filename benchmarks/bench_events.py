@@ -0,0 +1,89 @@
+"""
+Memory used by interaction events stored as dicts versus columnar EventLogs.
+
+Events are parsed from JSON the way request bodies are, so every dict owns
+its own string objects. They are stored as lists of dicts (the old layout),
+as one EventLog per intent and as a single EventLog (one large grouped
+intent), and the heap growth of each is measured with tracemalloc.
+
+    python -m benchmarks.bench_events [--events 1000000] [--per-intent 10]
+"""
+import argparse
+import gc
+import json
+import random
+import time
+import tracemalloc
+
+from api.events import EventLog, EventStore
+
+SCREENS = ['Home', 'Bills', 'Settings', 'Profile', 'Payments', 'Support']
+ACTIONS = ['CLICK', 'LONG_CLICK', 'SCROLL', 'TEXT_CHANGED', 'FOCUS']
+
+
+def request_bodies(events, per_intent, seed=0):
+    """JSON request bodies of per_intent events each"""
+    rng = random.Random(seed)
+    timestamp = 1_700_000_000_000
+    for start in range(0, events, per_intent):
+        batch = []
+        for _ in range(min(per_intent, events - start)):
+            timestamp += rng.randint(1, 5000)
+            screen = rng.choice(SCREENS)
+            batch.append({
+                'timestamp': timestamp,
+                'view_id': rng.randint(1, 2_000_000),
+                'view_resource_name': f"{screen.lower()}_button_{rng.randint(0, 40)}",
+                'screen_name': screen,
+                'action_type': rng.choice(ACTIONS),
+            })
+        yield json.dumps(batch)
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Dict vs columnar interaction event memory')
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--per-intent', type=int, default=10, help='events per intent')
+    args = parser.parse_args()
+
+    bodies = list(request_bodies(args.events, args.per_intent))
+
+    def as_dicts():
+        return [json.loads(body) for body in bodies]
+
+    def as_columns():
+        store = EventStore()
+        return [EventLog(store, json.loads(body)) for body in bodies]
+
+    def as_one_log():
+        log = EventLog(EventStore())
+        for body in bodies:
+            log.extend(json.loads(body))
+        return log
+
+    print(f"{args.events:,} events, {args.per_intent} per intent")
+    _, dict_bytes, dict_time = measure(as_dicts)
+    logs, column_bytes, column_time = measure(as_columns)
+    log, single_bytes, single_time = measure(as_one_log)
+    assert sum(len(log) for log in logs) == len(log) == args.events
+    for name, size, elapsed in [('dicts', dict_bytes, dict_time),
+                                ('EventLog per intent', column_bytes, column_time),
+                                ('single EventLog', single_bytes, single_time)]:
+        print(f"{name:20s} {size / 2 ** 20:8.1f} MiB  {size / args.events:6.1f} B/event  "
+              f"{dict_bytes / size:5.1f}x  built in {elapsed:.2f} s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""
+Memory and top-k query time of a grouped intent's sessions kept as a
+PathTrie versus raw event lists.
+
+Sessions walk a small screen graph the way users of one flow do: most
+follow a few common routes, some wander. Each session is parsed from JSON
+like a request body and kept as a list of event dicts (what appending
+every session to the grouped intent would store), as columnar EventLogs,
+and as one PathTrie. The top-k query counts complete paths: over the raw
+sessions that means scanning them all, while the trie answers from its
+ranked paths.
+
+    python -m benchmarks.bench_paths [--sessions 100000] [--k 10]
+"""
+import argparse
+import json
+import random
+import time
+from collections import Counter
+
+from api.events import EventLog, EventStore
+from api.paths import STEP_FIELDS, PathTrie, StepTable
+from benchmarks.bench_events import measure
+
+# Screen -> screens reachable from it; sessions end at screens without exits or at random
+FLOW = {
+    'Home': ['Bills', 'Bills', 'Bills', 'Payments', 'Settings', 'Support'],
+    'Bills': ['BillDetail', 'BillDetail', 'Payments', 'Home'],
+    'BillDetail': ['Payments', 'Payments', 'Support', 'Bills'],
+    'Payments': ['PaymentMethod', 'Confirm', 'Confirm'],
+    'PaymentMethod': ['Confirm', 'Payments'],
+    'Settings': ['Profile', 'Notifications', 'Home'],
+    'Profile': ['Settings'],
+    'Notifications': ['Settings'],
+    'Support': ['Chat', 'Home'],
+    'Chat': [],
+    'Confirm': [],
+}
+ACTIONS = ['CLICK'] * 18 + ['SCROLL', 'TEXT_CHANGED']
+
+
+def session_bodies(count, seed=0, max_length=20):
+    rng = random.Random(seed)
+    timestamp = 1_700_000_000_000
+    for _ in range(count):
+        screen, events = 'Home', []
+        while True:
+            timestamp += rng.randint(1, 5000)
+            exits = FLOW[screen]
+            following = rng.choice(exits) if exits else None
+            events.append({
+                'timestamp': timestamp,
+                'view_id': rng.randint(1, 2_000_000),
+                'view_resource_name': f"{(following or screen).lower()}_button",
+                'screen_name': screen,
+                'action_type': rng.choice(ACTIONS),
+            })
+            if following is None or len(events) == max_length or rng.random() < 0.1:
+                break
+            screen = following
+        yield json.dumps(events)
+
+
+def raw_top_paths(sessions, k):
+    counts = Counter(tuple(tuple(event.get(field) for field in STEP_FIELDS) for event in events) for events in sessions)
+    return counts.most_common(k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PathTrie vs raw interaction sessions')
+    parser.add_argument('--sessions', type=int, default=100_000)
+    parser.add_argument('--k', type=int, default=10, help='paths per query')
+    parser.add_argument('--queries', type=int, default=100, help='trie queries timed')
+    args = parser.parse_args()
+
+    bodies = list(session_bodies(args.sessions))
+
+    def as_dicts():
+        return [json.loads(body) for body in bodies]
+
+    def as_columns():
+        store = EventStore()
+        return [EventLog(store, json.loads(body)) for body in bodies]
+
+    def as_trie():
+        trie = PathTrie(StepTable(), top=args.k)
+        for body in bodies:
+            trie.add(json.loads(body))
+        return trie
+
+    sessions, dict_bytes, dict_time = measure(as_dicts)
+    _, column_bytes, column_time = measure(as_columns)
+    trie, trie_bytes, trie_time = measure(as_trie)
+    events = sum(map(len, sessions))
+    print(f"{args.sessions:,} sessions, {events:,} events, {len(trie):,} trie nodes")
+    print(f"{'event dicts':12s} {dict_bytes / 2 ** 20:9.1f} MiB  build {dict_time:6.2f} s")
+    print(f"{'event logs':12s} {column_bytes / 2 ** 20:9.1f} MiB  build {column_time:6.2f} s")
+    print(f"{'path trie':12s} {trie_bytes / 2 ** 20:9.1f} MiB  build {trie_time:6.2f} s  "
+          f"({dict_bytes / trie_bytes:.0f}x smaller than dicts)")
+
+    started = time.perf_counter()
+    expected = raw_top_paths(sessions, args.k)
+    raw_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        paths = trie.top_paths(args.k)
+    trie_query = (time.perf_counter() - started) / args.queries
+    assert [path['count'] for path in paths] == [count for _, count in expected]
+    print(f"top {args.k} paths: raw scan {raw_time * 1000:9.2f} ms, trie {trie_query * 1000:7.3f} ms "
+          f"({raw_time / trie_query:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Write overhead and recovery time of the persistent in-memory repository.
+
+Writes: concurrent create_intent calls against InMemoryRepository and
+PersistentRepository with each WAL sync mode; 'group' shares one fsync
+between the writers waiting at the same time, 'always' fsyncs every record.
+
+Recovery: a repository of --intents intents is written, then reopened
+from the write-ahead log alone and from a snapshot plus --tail log records.
+
+    python -m benchmarks.bench_persistence [--writes 5000] [--threads 8] [--intents 1000000]
+"""
+import argparse
+import gc
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_events import request_bodies
+
+
+def event_batches(count, per_intent):
+    return [json.loads(body) for body in request_bodies(count * per_intent, per_intent)]
+
+
+def write(repository, batches, threads):
+    """Seconds to create one intent per batch from `threads` threads"""
+    barrier = threading.Barrier(threads + 1)
+
+    def work(offset):
+        barrier.wait()
+        for i in range(offset, len(batches), threads):
+            repository.create_intent(f"pay my bill {i}", batches[i])
+
+    workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - started
+
+
+def size_of(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(directory) for name in names)
+
+
+def timed_open(path, **options):
+    from api.repositories import PersistentRepository
+    gc.collect()
+    started = time.perf_counter()
+    repository = PersistentRepository(path, **options)
+    return repository, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description='WAL write overhead and recovery time')
+    parser.add_argument('--writes', type=int, default=5000, help='intents created per write benchmark')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent writers')
+    parser.add_argument('--intents', type=int, default=1_000_000, help='intents in the recovery benchmark')
+    parser.add_argument('--events', type=int, default=5, help='interaction events per intent')
+    parser.add_argument('--tail', type=int, default=10000, help='log records written after the snapshot')
+    parser.add_argument('--dir', help='directory for the data files (default: a temporary directory)')
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'luma.settings')
+    import django
+    django.setup()
+    from api.repositories import InMemoryRepository, PersistentRepository
+
+    root = tempfile.mkdtemp(dir=args.dir)
+    try:
+        batches = event_batches(args.writes, args.events)
+        print(f"{args.writes} intents of {args.events} events from {args.threads} threads")
+        baseline = write(InMemoryRepository(), batches, args.threads)
+        print(f"{'memory':14s} {args.writes / baseline:9.0f} writes/s")
+        for sync in ('none', 'group', 'always'):
+            path = os.path.join(root, f"writes-{sync}")
+            repository = PersistentRepository(path, sync=sync, snapshot_every=0)
+            elapsed = write(repository, batches, args.threads)
+            repository.close()
+            print(f"{'wal ' + sync:14s} {args.writes / elapsed:9.0f} writes/s  {elapsed / baseline:5.1f}x time  "
+                  f"{repository.wal.syncs:6d} fsyncs")
+            shutil.rmtree(path)
+
+        path = os.path.join(root, 'recovery')
+        batches = event_batches(1000, args.events)
+        print(f"\nrecovery of {args.intents} intents of {args.events} events")
+        repository = PersistentRepository(path, sync='none', snapshot_every=0)
+        started = time.perf_counter()
+        for i in range(args.intents):
+            repository.create_intent(f"pay my bill {i}", batches[i % len(batches)])
+        repository.close()
+        print(f"populate        {time.perf_counter() - started:7.2f} s   log {size_of(path) / 2 ** 20:7.1f} MiB")
+        del repository
+
+        repository, elapsed = timed_open(path, snapshot_every=0)
+        print(f"log replay      {elapsed:7.2f} s")
+        started = time.perf_counter()
+        repository.snapshot()
+        snapshot_time = time.perf_counter() - started
+        for i in range(args.tail):
+            repository.create_intent(f"open settings {i}", batches[i % len(batches)])
+        repository.close()
+        snapshot_size = sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path) if name.endswith('.snap'))
+        print(f"snapshot write  {snapshot_time:7.2f} s   snapshot {snapshot_size / 2 ** 20:7.1f} MiB")
+        del repository
+
+        repository, elapsed = timed_open(path, snapshot_every=0)
+        print(f"snapshot + tail {elapsed:7.2f} s   ({args.tail} log records)")
+        assert len(repository.intents) == args.intents + args.tail
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
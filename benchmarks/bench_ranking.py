@@ -0,0 +1,64 @@
+"""
+Top-n grouped intents by count: sorting every grouped intent per query
+versus the IndexedMaxHeap that IntentRanking keeps up to date.
+
+Counts follow a Zipf-like distribution, as intent popularity does. The
+heap is built with one update per recorded intent (what IntentService
+does on every grouped intent increment), then both are queried.
+
+    python -m benchmarks.bench_ranking [--groups 100000] [--hits 1000000] [--n 10]
+"""
+import argparse
+import random
+import time
+
+from api.ranking import IndexedMaxHeap, SlidingWindowCounter
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Sorted scan vs indexed heap for top-n grouped intents')
+    parser.add_argument('--groups', type=int, default=100_000)
+    parser.add_argument('--hits', type=int, default=1_000_000, help='recorded intents')
+    parser.add_argument('--n', type=int, default=10)
+    parser.add_argument('--queries', type=int, default=100)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    weights = [1 / (rank + 1) for rank in range(args.groups)]
+    hits = [str(key) for key in rng.choices(range(args.groups), weights, k=args.hits)]
+    counts = {str(key): 0 for key in range(args.groups)}
+    heap = IndexedMaxHeap()
+    window = SlidingWindowCounter(3600, 60)
+
+    started = time.perf_counter()
+    for key in hits:
+        counts[key] += 1
+    dict_time = time.perf_counter() - started
+    started = time.perf_counter()
+    for key in hits:
+        heap.add(key)
+    heap_time = time.perf_counter() - started
+    started = time.perf_counter()
+    # Hits spread over two hours, so half of them expire from the window again
+    for i, key in enumerate(hits):
+        window.add(key, 1, i * 7200 / len(hits))
+    window_time = time.perf_counter() - started
+    print(f"{args.groups:,} grouped intents, {args.hits:,} hits")
+    print(f"update per hit: dict {dict_time / args.hits * 1e6:.2f} us, heap {heap_time / args.hits * 1e6:.2f} us, "
+          f"hour window {window_time / args.hits * 1e6:.2f} us")
+
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        expected = sorted(counts.items(), key=lambda item: item[1], reverse=True)[:args.n]
+    sort_query = (time.perf_counter() - started) / args.queries
+    started = time.perf_counter()
+    for _ in range(args.queries):
+        top = heap.top(args.n)
+    heap_query = (time.perf_counter() - started) / args.queries
+    assert [count for _, count in top] == [count for _, count in expected]
+    print(f"top {args.n}: sort {sort_query * 1000:8.2f} ms, heap {heap_query * 1000:7.3f} ms "
+          f"({sort_query / heap_query:.0f}x faster)")
+
+
+if __name__ == '__main__':
+    main()
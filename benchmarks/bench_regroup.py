@@ -0,0 +1,86 @@
+"""
+Wall time and merge quality of IntentService.regroup_intents (the
+regroup_intents management command) at a million intents.
+
+Synthetic intents are phrased from --bases distinct intents, each written
+several ways (plurals, filler words, punctuation, a typo). Bases are made
+of words from a synthetic vocabulary, so distinct bases are not similar
+under the embedder and every merge can be checked. Every base has one
+grouped intent, and --duplicates of them get a second one for a variant,
+as racing requests or early mistakes would create. Intents follow a Zipf
+distribution over the bases and are spread over their base's grouped
+intents. The report compares the merges found in a dry run with the
+known duplicates.
+
+    python -m benchmarks.bench_regroup [--intents 1000000] [--bases 20000] [--workers 4]
+"""
+import argparse
+import os
+import random
+import time
+
+SYLLABLES = ['ka', 'lo', 'mi', 'ra', 'te', 'su', 'no', 'vi', 'da', 'pe', 'zu', 'ho', 'ri', 'ba', 'ne', 'to']
+
+
+def base_intents(count, rng, words=4):
+    vocabulary = [''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    return [' '.join(rng.choice(vocabulary) for _ in range(words)) for _ in range(count)]
+
+
+def variants(text, rng):
+    words = text.split()
+    typo = list(text)
+    position = rng.randrange(1, len(typo) - 1)
+    typo[position], typo[position + 1] = typo[position + 1], typo[position]
+    return [text, text.capitalize() + '.', 'please ' + text, text + 's', ''.join(typo),
+            ' '.join(words[:1] + ['all'] + words[1:])]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline regrouping of a million intents')
+    parser.add_argument('--intents', type=int, default=1_000_000)
+    parser.add_argument('--bases', type=int, default=20000, help='distinct intents')
+    parser.add_argument('--duplicates', type=float, default=0.1, help='share of bases with a duplicate group')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'luma.settings')
+    import django
+    django.setup()
+    from api.services import IntentService, repository
+
+    rng = random.Random(args.seed)
+    bases = base_intents(args.bases, rng)
+    phrasings = [variants(text, rng) for text in bases]
+
+    started = time.perf_counter()
+    groups = []
+    duplicate_of = {}
+    for base, text in enumerate(bases):
+        groups.append([repository.create_grouped_intent(text, [])['id']])
+        if rng.random() < args.duplicates:
+            duplicate = repository.create_grouped_intent(rng.choice(phrasings[base][1:]), [])['id']
+            groups[base].append(duplicate)
+            duplicate_of[str(duplicate)] = str(groups[base][0])
+    weights = [1 / (rank + 1) for rank in range(args.bases)]
+    chosen = rng.choices(range(args.bases), weights, k=args.intents)
+    for base in chosen:
+        intent = repository.create_intent(rng.choice(phrasings[base]), [])
+        intent.update(grouping_status='grouped', grouped_intent_id=rng.choice(groups[base]))
+    print(f"populated {args.intents} intents, {len(duplicate_of)} duplicate groups of {args.bases} "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    report = IntentService.regroup_intents(dry_run=True, workers=args.workers)
+    merged = {merged['id']: merge['into']['id'] for merge in report['merges'] for merged in merge['merged']}
+    found = sum(1 for key, into in duplicate_of.items() if merged.get(key) == into)
+    print(f"{report['intents']} intents, {report['texts']} distinct texts, {report['comparisons']} comparisons")
+    print('timings: ' + ', '.join(f"{phase} {seconds:.2f}s" for phase, seconds in report['timings'].items())
+          + f", total {report['elapsed_seconds']:.2f}s")
+    print(f"merged {len(merged)} groups: {found} of {len(duplicate_of)} known duplicates found, "
+          f"{len(merged) - found} other merges")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Memory of an InMemoryRepository holding grouped intents with and without
+retention bounds, and the cost of reading back spilled intents.
+
+Intents are recorded the way the grouping worker leaves them: created
+with their events, then marked grouped (only grouped intents can be
+evicted). The bounded repository keeps intents_max_bytes of intents and
+events_max_bytes of event chunks in memory and spills the rest; reads are
+then timed for recently used intents (in memory) and for old ones (read
+back from the spill segments).
+
+    python -m benchmarks.bench_retention [--intents 200000] [--budget-mib 16]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from benchmarks.bench_events import measure, request_bodies
+
+
+def fill(repository, bodies):
+    for index, body in enumerate(bodies):
+        intent = repository.create_intent(f"intent {index}", json.loads(body))
+        intent.update(grouping_status='grouped', grouped_intent_id=1)
+        repository.update_intent(intent)
+    return repository
+
+
+def read_time(repository, ids):
+    started = time.perf_counter()
+    for intent_id in ids:
+        list(repository.get_intent(intent_id)['interaction_events'])
+    return (time.perf_counter() - started) / len(ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bounded vs unbounded in-memory repository')
+    parser.add_argument('--intents', type=int, default=200_000)
+    parser.add_argument('--per-intent', type=int, default=10, help='events per intent')
+    parser.add_argument('--budget-mib', type=float, default=16, help='memory budget of intents and of events each')
+    parser.add_argument('--reads', type=int, default=10_000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'luma.settings')
+    import django
+    django.setup()
+    from api.repositories import InMemoryRepository
+
+    bodies = list(request_bodies(args.intents * args.per_intent, args.per_intent))
+    budget = int(args.budget_mib * 2 ** 20)
+
+    unbounded, unbounded_bytes, unbounded_time = measure(lambda: fill(InMemoryRepository(), bodies))
+    bounded, bounded_bytes, bounded_time = measure(lambda: fill(
+        InMemoryRepository(intents_max_bytes=budget, events_max_bytes=budget), bodies))
+    print(f"{args.intents:,} intents, {args.intents * args.per_intent:,} events, budget {args.budget_mib:g} MiB each")
+    print(f"{'unbounded':10s} {unbounded_bytes / 2 ** 20:9.1f} MiB  fill {unbounded_time:6.2f} s")
+    print(f"{'bounded':10s} {bounded_bytes / 2 ** 20:9.1f} MiB  fill {bounded_time:6.2f} s  "
+          f"({unbounded_bytes / bounded_bytes:.1f}x smaller)")
+    stats = bounded.retention_stats()
+    print(f"spilled {stats['intents']['spilled']:,} intents, {stats['interaction_events']['spilled_chunks']:,} "
+          f"event chunks, {stats['spill']['disk_bytes'] / 2 ** 20:.1f} MiB on disk")
+
+    rng = random.Random(0)
+    count = min(args.reads, args.intents // 10)
+    recent = [rng.randint(args.intents - count + 1, args.intents) for _ in range(count)]
+    old = [rng.randint(1, args.intents // 2) for _ in range(count)]
+    print(f"read recent intent: unbounded {read_time(unbounded, recent) * 1e6:7.1f} us, "
+          f"bounded {read_time(bounded, recent) * 1e6:7.1f} us")
+    print(f"read old intent:    unbounded {read_time(unbounded, old) * 1e6:7.1f} us, "
+          f"bounded {read_time(bounded, old) * 1e6:7.1f} us (spilled)")
+    bounded.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Multithreaded stress benchmark for the in-memory stores.
+
+Every thread allocates ids and increments grouped-intent counts while
+other threads read them, once against ShardedStore and once against a
+single-lock copy-on-write dict (the naive alternative). Correctness is
+checked afterwards: ids must be unique and no increment may be lost.
+
+    python -m benchmarks.bench_stores [--ops 20000] [--threads 1,2,4,8]
+"""
+import argparse
+import random
+import threading
+import time
+
+from api.stores import AtomicCounter, ShardedStore
+
+
+class GlobalLockStore:
+    """Baseline: one lock for every write, whole-dict copy-on-write"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        self.ids = AtomicCounter()
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            data = dict(self._data)
+            data[key] = value
+            self._data = data
+
+    def get(self, key, default=None):
+        return self._data.get(key, default)
+
+    def compute(self, key, update):
+        with self._lock:
+            data = dict(self._data)
+            data[key] = value = update(data[key])
+            self._data = data
+        return value
+
+    def values(self):
+        return list(self._data.values())
+
+
+def run(store, threads: int, ops: int, keys: int = 1000, write_ratio: float = 0.2):
+    for key in range(keys):
+        store[str(key)] = {'id': key, 'count': 0}
+    allocated = [[] for _ in range(threads)]
+    increments = [0] * threads
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(index):
+        rng = random.Random(index)
+        barrier.wait()
+        for _ in range(ops):
+            key = str(rng.randrange(keys))
+            if rng.random() < write_ratio:
+                store.compute(key, lambda current: {**current, 'count': current['count'] + 1})
+                allocated[index].append(store.ids.next())
+                increments[index] += 1
+            else:
+                store.get(key)
+
+    pool = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in pool:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    ids = [i for chunk in allocated for i in chunk]
+    assert len(ids) == len(set(ids)), 'duplicate ids allocated'
+    assert sum(value['count'] for value in store.values()) == sum(increments), 'lost increments'
+    return threads * ops / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ops', type=int, default=20000, help='operations per thread')
+    parser.add_argument('--threads', default='1,2,4,8', help='comma separated thread counts')
+    args = parser.parse_args()
+
+    print(f"{'threads':>8} {'sharded ops/s':>15} {'global lock ops/s':>18}")
+    for threads in (int(value) for value in args.threads.split(',')):
+        sharded = run(ShardedStore(shards=16, copy_on_write=True), threads, args.ops)
+        baseline = run(GlobalLockStore(), threads, args.ops)
+        print(f"{threads:>8} {sharded:>15,.0f} {baseline:>18,.0f}")
+    print('ids unique and no increments lost in every run')
+
+
+if __name__ == '__main__':
+    main()
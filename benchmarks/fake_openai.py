@@ -0,0 +1,179 @@
+"""
+Local stand-in for the OpenAI chat completions API.
+
+Serves POST /v1/chat/completions with configurable latency, jitter, error
+rate and rate-limit (429) rate so benchmarks can exercise the LLM code paths without network
+access or cost. Point the services at it with OPENAI_BASE_URL.
+
+    python -m benchmarks.fake_openai --port 8089 --latency 0.3 --error-rate 0.01 --rate-limit-rate 0.01
+"""
+import argparse
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from typing import Optional
+
+_AVAILABLE_RE = re.compile(r'available intents: (.*)')
+
+
+def answer(messages) -> str:
+    """Deterministic reply shaped like what the services expect from the real model"""
+    prompt = messages[-1]['content'] if messages else ''
+    match = _AVAILABLE_RE.search(prompt)
+    if match:
+        # Most-similar query: pick the first (best shortlisted) candidate
+        return match.group(1).split(', ')[0].strip()
+    if 'New intents:' in prompt:
+        # Batched grouping: every new intent gets a group of its own
+        return '{}'
+    return 'true'
+
+
+class FakeOpenAIServer:
+    """Minimal asyncio HTTP/1.1 server with keep-alive, run on a background thread"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, latency: float = 0.2, jitter: float = 0.0,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.requests = 0
+        self.errors = 0
+        self.rate_limited = 0
+        self._random = random.Random(seed)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b'\r\n', b'\n', b''):
+                        break
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                status, payload = await self._respond(request_line.decode('latin-1'), body)
+                data = json.dumps(payload).encode()
+                keep_alive = headers.get('connection', '').lower() != 'close'
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Shutdown with idle keep-alive connections; finishing normally keeps
+            # asyncio from logging the cancelled handler as an error
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, request_line: str, body: bytes):
+        self.requests += 1
+        if not request_line.startswith('POST') or '/chat/completions' not in request_line:
+            return '404 Not Found', {'error': {'message': 'not found'}}
+        delay = self.latency + self._random.uniform(0, self.jitter)
+        await asyncio.sleep(delay)
+        roll = self._random.random()
+        if roll < self.error_rate:
+            self.errors += 1
+            return '500 Internal Server Error', {'error': {'message': 'injected failure', 'type': 'server_error'}}
+        if roll < self.error_rate + self.rate_limit_rate:
+            self.rate_limited += 1
+            return '429 Too Many Requests', {'error': {'message': 'injected rate limit', 'type': 'rate_limit_error'}}
+        request = json.loads(body or b'{}')
+        content = answer(request.get('messages', []))
+        prompt_tokens = sum(len(message.get('content', '').split()) for message in request.get('messages', []))
+        return '200 OK', {
+            'id': f"chatcmpl-fake-{self.requests}",
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'gpt-3.5-turbo'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop',
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': len(content.split()),
+                'total_tokens': prompt_tokens + len(content.split()),
+            },
+        }
+
+    def stats(self) -> dict:
+        return {'requests': self.requests, 'errors': self.errors, 'rate_limited': self.rate_limited}
+
+    def _run(self) -> None:
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=2048)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _shutdown(self) -> None:
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        asyncio.get_running_loop().stop()
+
+    def start(self) -> 'FakeOpenAIServer':
+        self._thread = threading.Thread(target=self._run, name='fake-openai', daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None and self._loop.is_running():
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+            self._thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fake OpenAI chat completions server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='base response latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.0, help='extra random latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of requests answered with 429')
+    args = parser.parse_args()
+    server = FakeOpenAIServer(args.host, args.port, args.latency, args.jitter, args.error_rate,
+                              args.rate_limit_rate).start()
+    print(f"Fake OpenAI listening on {server.base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+"""
+End-to-end load test of the HTTP API against a local fake OpenAI server.
+
+Starts the fake OpenAI server and the Django app on a threaded WSGI server
+(or targets an already running deployment with --target), seeds grouped
+intents and bills, then drives record_intent, get_interactions, get_bills
+and create_bill from concurrent keep-alive connections with a weighted
+endpoint mix. Intent texts are paraphrases of a fixed vocabulary drawn
+from a Zipf distribution, so a few intents are hot and most are rare, and
+user ids are skewed the same way.
+
+Throughput, status counts and p50/p95/p99 latency per endpoint are written
+as JSON. Pass --baseline with an earlier report to flag regressions; the
+exit status is 1 when any endpoint regressed by more than --tolerance.
+
+    python -m benchmarks.loadtest [--duration 30] [--concurrency 16] [--latency 0.2] \\
+        [--mix record_intent=15,get_interactions=50,get_bills=25,create_bill=10] \\
+        [--output report.json] [--baseline previous.json]
+
+The in-process server shares the GIL with the load generator; run against a
+real deployment (started with OPENAI_BASE_URL pointing at
+`python -m benchmarks.fake_openai`) for absolute numbers.
+"""
+import argparse
+import bisect
+import datetime
+import http.client
+import itertools
+import json
+import logging
+import math
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlencode, urlsplit
+
+from benchmarks.fake_openai import FakeOpenAIServer
+
+ENDPOINTS = ('record_intent', 'get_interactions', 'get_bills', 'create_bill')
+DEFAULT_MIX = 'record_intent=15,get_interactions=50,get_bills=25,create_bill=10'
+
+VERBS = ['pay', 'check', 'view', 'download', 'dispute', 'set up autopay for', 'change the due date of', 'split']
+OBJECTS = ['electricity bill', 'water bill', 'internet bill', 'phone bill', 'last statement',
+           'overdue balance', 'gas bill', 'credit card bill']
+PHRASINGS = ['{}', 'how do I {}', 'I want to {}', 'help me {}', 'where can I {}', '{} please']
+SCREENS = ['Home', 'Bills', 'Settings', 'Profile', 'Payments', 'Support']
+ACTIONS = ['CLICK', 'LONG_CLICK', 'SCROLL', 'TEXT_CHANGED', 'FOCUS']
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix = {}
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name!r}")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+class Zipf:
+    """Sample ranks 0..n-1 with probability proportional to 1 / (rank + 1) ** s"""
+
+    def __init__(self, n: int, s: float, rng: random.Random):
+        self._cumulative = list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(n)))
+        self._rng = rng
+
+    def sample(self) -> int:
+        return bisect.bisect_left(self._cumulative, self._rng.random() * self._cumulative[-1])
+
+
+class Workload:
+    """Request factory for one worker: weighted endpoint mix over skewed intents and users"""
+
+    def __init__(self, mix: Dict[str, float], users: int, zipf_s: float, seed: int):
+        self._rng = random.Random(seed)
+        self._endpoints = list(mix)
+        self._weights = list(itertools.accumulate(mix.values()))
+        # The popularity order of the intents does not depend on the seed, so all workers agree on it
+        self.intents = [f"{verb} my {obj}" for verb in VERBS for obj in OBJECTS]
+        random.Random(0).shuffle(self.intents)
+        self._intent_ranks = Zipf(len(self.intents), zipf_s, self._rng)
+        self._user_ranks = Zipf(users, zipf_s, self._rng)
+        self._timestamp = 1_700_000_000_000
+
+    def intent_text(self) -> str:
+        intent = self.intents[self._intent_ranks.sample()]
+        return self._rng.choice(PHRASINGS).format(intent)
+
+    def user_id(self) -> str:
+        return f"user-{self._user_ranks.sample()}"
+
+    def events(self) -> List[dict]:
+        events = []
+        for _ in range(self._rng.randint(5, 30)):
+            self._timestamp += self._rng.randint(1, 5000)
+            screen = self._rng.choice(SCREENS)
+            events.append({
+                'timestamp': self._timestamp,
+                'view_id': self._rng.randint(1, 2_000_000),
+                'view_resource_name': f"{screen.lower()}_button_{self._rng.randint(0, 40)}",
+                'screen_name': screen,
+                'action_type': self._rng.choice(ACTIONS),
+            })
+        return events
+
+    def bill(self, user_id: Optional[str] = None) -> dict:
+        bill = {'user_id': user_id or self.user_id()}
+        for category in ('electricity_bill', 'water_bill', 'internet_bill', 'phone_bill'):
+            bill[category] = f"{self._rng.uniform(5, 250):.2f}"
+        return bill
+
+    def request(self, endpoint: Optional[str] = None):
+        """(endpoint, method, path, body) of the next request"""
+        if endpoint is None:
+            endpoint = self._endpoints[bisect.bisect_left(self._weights, self._rng.random() * self._weights[-1])]
+        if endpoint == 'record_intent':
+            body = {'intent_text': self.intent_text(), 'interaction_events': self.events()}
+            return endpoint, 'POST', '/api/record_intent/', body
+        if endpoint == 'get_interactions':
+            return endpoint, 'GET', '/api/get_interactions/?' + urlencode({'intent_text': self.intent_text()}), None
+        if endpoint == 'get_bills':
+            return endpoint, 'GET', '/api/get_bills/?' + urlencode({'user_id': self.user_id()}), None
+        return endpoint, 'POST', '/api/create_bill/', self.bill()
+
+
+class Connection:
+    """Keep-alive HTTP connection that reconnects after failures"""
+
+    def __init__(self, target: str, timeout: float):
+        parts = urlsplit(target)
+        self._factory = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        self._host, self._port, self._timeout = parts.hostname, parts.port, timeout
+        self._connection = None
+
+    def send(self, method: str, path: str, body: Optional[dict]) -> int:
+        if self._connection is None:
+            self._connection = self._factory(self._host, self._port, timeout=self._timeout)
+        headers = {'Accept': 'application/json'}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        try:
+            self._connection.request(method, path, payload, headers)
+            response = self._connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+
+def percentile(ordered: List[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list"""
+    if not ordered:
+        return None
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+def summarize(samples: List[tuple], elapsed: float) -> dict:
+    """samples are (status, seconds) pairs; status 0 means the request failed before a response"""
+    latencies = sorted(seconds * 1000 for _, seconds in samples)
+    statuses = Counter(str(status) for status, _ in samples)
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for status, _ in samples if status == 0 or status >= 500),
+        'statuses': dict(sorted(statuses.items())),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            **{name: round(percentile(latencies, q), 3) if latencies else None
+               for name, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99), ('max', 1.0))},
+        },
+    }
+
+
+def run_load(target: str, mix: Dict[str, float], concurrency: int, duration: Optional[float],
+             requests: Optional[int], users: int, zipf_s: float, seed: int, timeout: float):
+    """Drive target from `concurrency` workers; returns per-endpoint samples and the elapsed time"""
+    samples: Dict[str, List[tuple]] = defaultdict(list)
+    lock = threading.Lock()
+    issued = itertools.count()
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def worker(index: int) -> None:
+        workload = Workload(mix, users, zipf_s, seed + index)
+        connection = Connection(target, timeout)
+        local = defaultdict(list)
+        while True:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if requests is not None and next(issued) >= requests:
+                break
+            endpoint, method, path, body = workload.request()
+            sent = time.perf_counter()
+            try:
+                status = connection.send(method, path, body)
+            except (OSError, http.client.HTTPException):
+                status = 0
+            local[endpoint].append((status, time.perf_counter() - sent))
+        connection.close()
+        with lock:
+            for endpoint, values in local.items():
+                samples[endpoint].extend(values)
+
+    threads = [threading.Thread(target=worker, args=(i,), name=f"load-{i}") for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
+
+
+def seed_data(target: str, users: int, intents: int, seed: int, timeout: float) -> None:
+    """Create the hottest grouped intents and a bill for every user before measuring"""
+    workload = Workload({'record_intent': 1}, users, 1.0, seed)
+    connection = Connection(target, timeout)
+    for intent in workload.intents[:intents]:
+        connection.send('POST', '/api/record_intent/', {'intent_text': intent, 'interaction_events': workload.events()})
+    for user in range(users):
+        connection.send('POST', '/api/create_bill/', workload.bill(f"user-{user}"))
+    connection.close()
+
+
+def start_app(base_url: str):
+    """Serve the Django app on a threaded WSGI server; returns (server, url)"""
+    os.environ['OPENAI_BASE_URL'] = base_url
+    os.environ.setdefault('OPENAI_API_KEY', 'sk-fake')
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'luma.settings')
+    import django
+    django.setup()
+    from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+    from django.core.wsgi import get_wsgi_application
+
+    class QuietHandler(WSGIRequestHandler):
+        def setup(self):
+            super().setup()
+            # Headers and body are written separately; without this Nagle's
+            # algorithm and delayed ACKs add ~40 ms to every keep-alive response
+            self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietHandler, allow_reuse_address=True)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, name='app-server', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def compare(report: dict, baseline: dict, tolerance: float) -> List[str]:
+    """Endpoints whose p95 latency grew, or throughput fell, by more than tolerance"""
+    regressions = []
+    for endpoint, current in report['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(endpoint)
+        if not previous:
+            continue
+        old_p95, new_p95 = previous['latency_ms']['p95'], current['latency_ms']['p95']
+        if old_p95 and new_p95 and new_p95 > old_p95 * (1 + tolerance):
+            regressions.append(f"{endpoint}: p95 {old_p95:.1f} ms -> {new_p95:.1f} ms")
+        old_rps, new_rps = previous['throughput_rps'], current['throughput_rps']
+        if old_rps and new_rps is not None and new_rps < old_rps * (1 - tolerance):
+            regressions.append(f"{endpoint}: throughput {old_rps:.1f} -> {new_rps:.1f} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API load test with a fake OpenAI backend')
+    parser.add_argument('--target', help='base URL of a running deployment (default: start one in-process)')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds to run (ignored with --requests)')
+    parser.add_argument('--requests', type=int, help='stop after this many requests instead')
+    parser.add_argument('--concurrency', type=int, default=16, help='concurrent keep-alive connections')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='endpoint weights, e.g. ' + DEFAULT_MIX)
+    parser.add_argument('--users', type=int, default=1000, help='distinct bill user ids')
+    parser.add_argument('--seed-intents', type=int, default=20, help='grouped intents created before measuring')
+    parser.add_argument('--zipf', type=float, default=1.1, help='skew of intent and user popularity')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--timeout', type=float, default=30.0, help='per-request timeout in seconds')
+    parser.add_argument('--latency', type=float, default=0.2, help='fake LLM latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='extra random fake LLM latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of LLM calls failing with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='fraction of LLM calls failing with 429')
+    parser.add_argument('--output', default='loadtest-report.json', help='where to write the JSON report')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative regression')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    fake, app = None, None
+    target = args.target
+    if target is None:
+        fake = FakeOpenAIServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                                rate_limit_rate=args.rate_limit_rate, seed=args.seed).start()
+        app, target = start_app(fake.base_url)
+        logging.disable(logging.WARNING)
+
+    seed_data(target, args.users, args.seed_intents, args.seed, args.timeout)
+    duration = None if args.requests else args.duration
+    samples, elapsed = run_load(target, mix, args.concurrency, duration, args.requests,
+                                args.users, args.zipf, args.seed, args.timeout)
+
+    report = {
+        'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+        'config': {key: value for key, value in vars(args).items() if key not in ('output', 'baseline')},
+        'elapsed_seconds': round(elapsed, 3),
+        'overall': summarize([sample for values in samples.values() for sample in values], elapsed),
+        'endpoints': {endpoint: summarize(samples[endpoint], elapsed) for endpoint in ENDPOINTS if endpoint in samples},
+    }
+    if fake is not None:
+        from api.services import llm_client
+        report['fake_openai'] = fake.stats()
+        report['llm_client'] = llm_client.stats()
+        app.shutdown()
+        fake.stop()
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"{report['overall']['requests']} requests in {elapsed:.1f} s, {args.concurrency} connections")
+    print(f"{'endpoint':18s} {'req/s':>8s} {'errors':>7s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for endpoint, summary in [*report['endpoints'].items(), ('overall', report['overall'])]:
+        latency = summary['latency_ms']
+        print(f"{endpoint:18s} {summary['throughput_rps']:8.1f} {summary['errors']:7d} "
+              f"{latency['p50']:8.1f} {latency['p95']:8.1f} {latency['p99']:8.1f}")
+    print(f"Report written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+
+
+if __name__ == '__main__':
+    main()
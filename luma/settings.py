@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -42,7 +44,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so request durations include the time spent in other middleware
+    'api.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Hashes an ETag from the body of GET responses that carry none and answers If-None-Match with 304
+    'django.middleware.http.ConditionalGetMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -123,3 +129,173 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Intent matching
+# https://platform.openai.com/docs/guides/embeddings/which-distance-function-should-i-use
+
+# Dotted path to the class used to embed intent texts for the in-process index
+INTENT_EMBEDDER = 'api.matching.HashedNgramEmbedder'
+
+# Cosine similarity at or above which a grouped intent is matched without the LLM
+INTENT_SIMILARITY_THRESHOLD = 0.75
+
+# Ask the LLM to break ties when the best score falls in
+# [INTENT_LLM_TIEBREAK_FLOOR, INTENT_SIMILARITY_THRESHOLD)
+INTENT_LLM_TIEBREAK = True
+INTENT_LLM_TIEBREAK_FLOOR = 0.45
+
+# Cache of LLM verdicts. Use 'sqlite' to share entries between worker processes.
+LLM_CACHE = {
+    'BACKEND': 'memory',
+    'MAX_ENTRIES': 4096,
+    'TTL': 3600,
+    'PATH': BASE_DIR / 'llm_cache.sqlite3',
+}
+
+# 'sync' groups intents inside record_intent; 'async' acknowledges with 202 and
+# groups on a background worker pool fed by a bounded queue
+INTENT_GROUPING_MODE = 'sync'
+INTENT_GROUPING_WORKERS = 4
+INTENT_GROUPING_QUEUE_SIZE = 1000
+
+# Collect concurrent grouping work for up to INTENT_BATCH_WINDOW seconds (or
+# INTENT_BATCH_MAX_SIZE intents) and resolve it with a single LLM request
+INTENT_BATCHING = False
+INTENT_BATCH_WINDOW = 0.02
+INTENT_BATCH_MAX_SIZE = 32
+
+# Number of shortlisted grouped intents (BM25, topped up by embeddings) sent to the LLM
+INTENT_LLM_CANDIDATES = 20
+
+# Interaction sessions are counted per grouped intent in a prefix trie of
+# (screen_name, view_resource_name, action_type) steps, served by
+# get_interactions?paths=<k>. Sessions are cut to MAX_DEPTH steps, and the TOP
+# most frequent paths of each grouped intent are kept ready.
+INTERACTION_PATHS = {
+    'MAX_DEPTH': 50,
+    'TOP': 10,
+}
+
+# Sliding windows of GET /api/intents/top/?window=<name>: name -> (span in
+# seconds, buckets). Counts leave a window a bucket at a time, so a window is
+# exact to span / buckets seconds. TRENDING_MAX_N caps n.
+TRENDING_WINDOWS = {
+    'hour': (3600, 60),
+    'day': (86400, 96),
+}
+TRENDING_MAX_N = 100
+
+# Storage backend for bills, intents and grouped intents:
+#   {'BACKEND': 'memory'}                       process-local dicts (default); interaction events
+#                                               are stored in columnar chunks of EVENT_CHUNK_SIZE rows.
+#                                               With PERSIST_DIR set, writes go to a write-ahead log
+#                                               there (fsynced per WAL_SYNC: 'group', 'always' or
+#                                               'none') and a snapshot is taken every SNAPSHOT_EVERY
+#                                               log records; startup reloads both.
+#                                               INTENTS_MAX_BYTES and INTENTS_TTL (seconds unused)
+#                                               bound the intents kept in memory, EVENTS_MAX_BYTES
+#                                               the event chunks; the rest is spilled to segment
+#                                               files in SPILL_DIR (default: the temporary directory;
+#                                               each worker process uses a subdirectory of its own)
+#                                               and read back on access. None means unbounded
+#   {'BACKEND': 'sqlite', 'PATH': <file>}       SQLite file in WAL mode shared by all workers
+#   {'BACKEND': 'orm'}                          Django ORM on the api models; needs DATABASES to
+#                                               point at a persistent database on which
+#                                               `manage.py migrate` has run (not ':memory:')
+REPOSITORY = {
+    'BACKEND': 'memory',
+    'PERSIST_DIR': os.getenv('LUMA_DATA_DIR'),
+    'WAL_SYNC': 'group',
+    'SNAPSHOT_EVERY': 100000,
+    'INTENTS_MAX_BYTES': None,
+    'INTENTS_TTL': None,
+    'EVENTS_MAX_BYTES': None,
+    'SPILL_DIR': os.getenv('LUMA_SPILL_DIR'),
+}
+
+# HTTP connection pool of the AsyncOpenAI client used by the async views
+OPENAI_HTTP_POOL = {
+    'MAX_CONNECTIONS': 100,
+    'MAX_KEEPALIVE_CONNECTIONS': 100,
+    'KEEPALIVE_EXPIRY': 30,
+    'TIMEOUT': 30,
+}
+
+# Every LLM request must answer within TIMEOUT seconds. A second attempt is
+# started when the first is slower than HEDGE_AFTER seconds (None disables
+# hedging) or fails, up to MAX_ATTEMPTS. After BREAKER_FAILURES failed
+# requests in a row the breaker opens for BREAKER_RESET seconds and matching
+# falls back to the local embedding index. Attempts run on MAX_WORKERS
+# threads; their deadline starts once they get one, and requests left
+# waiting TIMEOUT seconds for a thread fall back without tripping the breaker.
+LLM_CLIENT = {
+    'TIMEOUT': 10.0,
+    'HEDGE_AFTER': 2.0,
+    'MAX_ATTEMPTS': 2,
+    'MAX_WORKERS': 32,
+    'BREAKER_FAILURES': 5,
+    'BREAKER_RESET': 30.0,
+}
+
+# get_interactions pagination: largest accepted `limit`, and events per chunk
+# of the NDJSON response sent for `stream=true`
+INTERACTIONS_MAX_PAGE_SIZE = 1000
+INTERACTIONS_STREAM_CHUNK_SIZE = 500
+
+# Bulk bill imports (POST /api/bills/bulk/ and manage.py import_bills) write
+# in batches of this many rows and report at most BILL_IMPORT_MAX_ERRORS
+# rejected rows individually
+BILL_IMPORT_BATCH_SIZE = 5000
+BILL_IMPORT_MAX_ERRORS = 100
+
+# Relative error of the p50/p95/p99 reported by GET /api/bills/stats/
+BILL_STATS_RELATIVE_ACCURACY = 0.01
+
+# Encoded bodies of bill and interaction responses, cached under their
+# version ETags (in-memory REPOSITORY only; other backends are not cached)
+RESPONSE_CACHE = {
+    'ENABLED': True,
+    'MAX_ENTRIES': 10000,
+    'TTL': 3600,
+}
+
+# Request/response codecs: JSON through orjson (DRF's stdlib encoder when it
+# is not installed), plus application/msgpack when msgpack is installed
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.codecs.FastJSONRenderer',
+        *(['api.codecs.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.codecs.FastJSONParser',
+        *(['api.codecs.MessagePackParser'] if find_spec('msgpack') else []),
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+# Logging goes through a bounded queue to a background writer thread, which
+# formats records as JSON lines cut to max_length characters per field.
+# Per-request messages logged with extra=api.logs.SAMPLED are kept 1 in
+# `rate` per call site; warnings and errors are never sampled.
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'sample': {'()': 'api.logs.SamplingFilter', 'rate': 100},
+    },
+    'formatters': {
+        'json': {'()': 'api.logs.JSONFormatter', 'max_length': 2000},
+    },
+    'handlers': {
+        'background': {
+            '()': 'api.logs.BackgroundQueueHandler',
+            'stream': 'ext://sys.stderr',
+            'queue_size': 10000,
+            'formatter': 'json',
+            'filters': ['sample'],
+        },
+    },
+    'root': {'handlers': ['background'], 'level': 'INFO'},
+}